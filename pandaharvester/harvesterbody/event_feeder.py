@@ -45,7 +45,7 @@ class EventFeeder(AgentBase):
                 else:
                     scattered = False
                 # get plugin
-                messenger = self.pluginFactory.get_plugin(queueConfig.messenger)
+                messenger = self.pluginFactory.get_plugin(queueConfig.messenger, config_id=queueConfig.configID)
                 # loop over all workers
                 for workSpec in workSpecList:
                     tmpLog = core_utils.make_logger(_logger, 'workerID={0}'.format(workSpec.workerID),
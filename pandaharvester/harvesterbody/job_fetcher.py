@@ -56,7 +56,6 @@ class JobFetcher(AgentBase):
                 # convert to JobSpec
                 if len(jobs) > 0:
                     jobSpecs = []
-                    fileStatMap = dict()
                     sw_startconvert = core_utils.get_stopwatch()
                     for job in jobs:
                         timeNow = datetime.datetime.utcnow()
@@ -72,12 +71,17 @@ class JobFetcher(AgentBase):
                                                   'harvester-{0}'.format(harvester_config.master.harvester_id))
                         if queueConfig.zipPerMB is not None and jobSpec.zipPerMB is None:
                             jobSpec.zipPerMB = queueConfig.zipPerMB
+                        jobSpecs.append(jobSpec)
+                    # check status of input files in bulk
+                    lfnList = set()
+                    for jobSpec in jobSpecs:
+                        lfnList.update(jobSpec.get_input_file_attributes())
+                    fileStatMap = self.dbProxy.get_files_status(lfnList, 'input', queueConfig.ddmEndpointIn,
+                                                                'starting')
+                    for jobSpec in jobSpecs:
                         for tmpLFN, fileAttrs in iteritems(jobSpec.get_input_file_attributes()):
-                            # check file status
                             if tmpLFN not in fileStatMap:
-                                fileStatMap[tmpLFN] = self.dbProxy.get_file_status(tmpLFN, 'input',
-                                                                                   queueConfig.ddmEndpointIn,
-                                                                                   'starting')
+                                fileStatMap[tmpLFN] = dict()
                             # make file spec
                             fileSpec = FileSpec()
                             fileSpec.PandaID = jobSpec.PandaID
@@ -97,7 +101,6 @@ class JobFetcher(AgentBase):
                             fileSpec.fileType = 'input'
                             jobSpec.add_in_file(fileSpec)
                         jobSpec.trigger_propagation()
-                        jobSpecs.append(jobSpec)
                     # insert to DB
                     tmpLog.debug("Converting of {0} jobs {1}".format(len(jobs),sw_startconvert.get_elapsed_time()))
                     sw_insertdb =core_utils.get_stopwatch()
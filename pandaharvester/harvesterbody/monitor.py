@@ -3,6 +3,8 @@ import datetime
 import collections
 import random
 import itertools
+import threading
+import queue
 from future.utils import iteritems
 
 from pandaharvester.harvesterconfig import harvester_config
@@ -14,10 +16,77 @@ from pandaharvester.harvesterbody.agent_base import AgentBase
 from pandaharvester.harvestercore.pilot_errors import PilotErrors
 from pandaharvester.harvestercore.fifos import MonitorFIFO
 from pandaharvester.harvestermisc.apfmon import Apfmon
+from pandaharvester.harvestermisc.inotify_utils import get_worker_file_watcher
 
 # logger
 _logger = core_utils.setup_logger('monitor')
 
+# mark to stop pipeline stages of FIFO cycle. None is used as the mark of the end of a FIFO cycle
+_fifo_stage_stop = object()
+
+
+# pipeline stage of FIFO cycle to put active workers back to FIFO, merging small chunks
+class FifoEnqueueStage(object):
+    # constructor
+    def __init__(self, monitor_fifo, max_workers_per_chunk):
+        self.monitor_fifo = monitor_fifo
+        self.max_workers_per_chunk = max_workers_per_chunk
+        # queueName : [workSpecsList, timeNow_timestamp, fifoCheckInterval]
+        self.obj_to_enqueue_dict = collections.defaultdict(lambda: [[], 0, 0])
+        self.obj_to_enqueue_to_head_dict = collections.defaultdict(lambda: [[], 0, 0])
+
+    # process an item from the update stage. None to flush all
+    def process(self, locked_by, item, stage_stats):
+        tmpLog = core_utils.make_logger(_logger, 'id={0}'.format(locked_by), method_name='fifo_enqueue_stage')
+        sw = core_utils.get_stopwatch()
+        # list of (queueName, toHead, [workSpecsList, timeNow_timestamp, fifoCheckInterval])
+        chunksToPut = []
+        if item is None:
+            # flush all
+            for toHead, _dct in ((False, self.obj_to_enqueue_dict), (True, self.obj_to_enqueue_to_head_dict)):
+                for queueName in list(_dct):
+                    chunksToPut.append((queueName, toHead, _dct.pop(queueName)))
+        else:
+            queueName, retVal, dequeueTime = item
+            workSpecsToEnqueue, workSpecsToEnqueueToHead, timeNow_timestamp, fifoCheckInterval = retVal
+            for toHead, _dct, workSpecsList in ((False, self.obj_to_enqueue_dict, workSpecsToEnqueue),
+                                                (True, self.obj_to_enqueue_to_head_dict, workSpecsToEnqueueToHead)):
+                if not workSpecsList:
+                    continue
+                # flush the chunk if full
+                if _dct[queueName][0] and \
+                        len(_dct[queueName][0]) + len(workSpecsList) > self.max_workers_per_chunk:
+                    chunksToPut.append((queueName, toHead, _dct.pop(queueName)))
+                _dct[queueName][0].extend(workSpecsList)
+                _dct[queueName][1] = max(_dct[queueName][1], timeNow_timestamp)
+                _dct[queueName][2] = max(_dct[queueName][2], fifoCheckInterval)
+            cycleTime = time.time() - dequeueTime
+            if cycleTime > harvester_config.monitor.lockInterval:
+                tmpLog.warning('a single FIFO cycle was longer than lockInterval {0:.3f} sec'.format(cycleTime))
+            else:
+                tmpLog.debug('done a FIFO cycle {0:.3f} sec'.format(cycleTime))
+        # put to fifo
+        obj_score_list = []
+        for queueName, toHead, (workSpecsList, timeNow_timestamp, fifoCheckInterval) in chunksToPut:
+            if not workSpecsList:
+                continue
+            score = fifoCheckInterval + timeNow_timestamp
+            if toHead:
+                score -= 2**32
+            obj_score_list.append(((queueName, workSpecsList), score))
+            tmpLog.info('to put a chunk of {0} workers of {1} to FIFO{2} with score {3}'.format(
+                            len(workSpecsList), queueName, ' head' if toHead else '', score))
+        if obj_score_list:
+            try:
+                self.monitor_fifo.put_many(obj_score_list)
+                tmpLog.debug('put {0} worker chunks into FIFO'.format(len(obj_score_list)) + sw.get_elapsed_time())
+            except Exception as errStr:
+                tmpLog.error('failed to put objects to FIFO: {0}'.format(errStr))
+        stage_stats['enqueue'][1] += sw.get_elapsed_time_in_sec(precise=True)
+        if item is not None:
+            stage_stats['enqueue'][0] += 1
+        return None
+
 
 # propagate important checkpoints to panda
 class Monitor(AgentBase):
@@ -37,7 +106,7 @@ class Monitor(AgentBase):
         # init messengers
         for queueConfig in self.queueConfigMapper.get_all_queues().values():
             # just import for module initialization
-            self.pluginFactory.get_plugin(queueConfig.messenger)
+            self.pluginFactory.get_plugin(queueConfig.messenger, config_id=queueConfig.configID)
         # main
         try:
             fifoSleepTimeMilli = harvester_config.monitor.fifoSleepTimeMilli
@@ -55,13 +124,49 @@ class Monitor(AgentBase):
             fifoProtectiveDequeue = harvester_config.monitor.fifoProtectiveDequeue
         except AttributeError:
             fifoProtectiveDequeue = True
+        try:
+            fifoPipelineQueueSize = harvester_config.monitor.fifoPipelineQueueSize
+        except AttributeError:
+            fifoPipelineQueueSize = 2
+        try:
+            fifoMaxChunksPerGet = harvester_config.monitor.fifoMaxChunksPerGet
+        except AttributeError:
+            fifoMaxChunksPerGet = 5
+        try:
+            dbBulkMode = harvester_config.monitor.dbBulkMode
+        except AttributeError:
+            dbBulkMode = False
         last_DB_cycle_timestamp = 0
         monitor_fifo = self.monitor_fifo
+        fileWatcher = get_worker_file_watcher()
         sleepTime = (fifoSleepTimeMilli / 1000.0) \
                         if monitor_fifo.enabled else harvester_config.monitor.sleepTime
         adjusted_sleepTime = sleepTime
         if monitor_fifo.enabled:
             monitor_fifo.restore()
+            # pipeline of dequeue -> check -> update -> enqueue. Stage threads are kept across FIFO cycles
+            # so that plugin instances cached per thread are reused. Each stage gets plugins in its own thread
+            # and the enqueue stage uses its own FIFO not to share the connection with the main thread
+            stageStats = {'dequeue': [0, 0.0], 'check': [0, 0.0], 'update': [0, 0.0], 'enqueue': [0, 0.0]}
+            checkQueue = queue.Queue(fifoPipelineQueueSize)
+            updateQueue = queue.Queue(fifoPipelineQueueSize)
+            enqueueQueue = queue.Queue(fifoPipelineQueueSize)
+            cycleEndQueue = queue.Queue()
+            enqueueStage = FifoEnqueueStage(MonitorFIFO(), fifoMaxWorkersPerChunk)
+            stageThreads = [threading.Thread(target=self.run_fifo_stage,
+                                             args=(lockedBy, self.fifo_check_stage, checkQueue, updateQueue,
+                                                   stageStats)),
+                            threading.Thread(target=self.run_fifo_stage,
+                                             args=(lockedBy, self.fifo_update_stage, updateQueue, enqueueQueue,
+                                                   stageStats)),
+                            threading.Thread(target=self.run_fifo_stage,
+                                             args=(lockedBy, enqueueStage.process, enqueueQueue, cycleEndQueue,
+                                                   stageStats))]
+            for stageThread in stageThreads:
+                stageThread.daemon = True
+                stageThread.start()
+        else:
+            stageThreads = []
         while True:
             sw_main = core_utils.get_stopwatch()
             mainLog = self.make_logger(_logger, 'id={0}'.format(lockedBy), method_name='run')
@@ -72,33 +177,43 @@ class Monitor(AgentBase):
                 sw_db = core_utils.get_stopwatch()
                 mainLog.debug('starting run with DB')
                 mainLog.debug('getting workers to monitor')
-                workSpecsPerQueue = self.dbProxy.get_workers_to_update(harvester_config.monitor.maxWorkers,
-                                                                       harvester_config.monitor.checkInterval,
-                                                                       harvester_config.monitor.lockInterval,
-                                                                       lockedBy)
+                if dbBulkMode:
+                    getWorkersToUpdate = self.dbProxy.get_workers_to_update_bulk
+                else:
+                    getWorkersToUpdate = self.dbProxy.get_workers_to_update
+                workSpecsPerQueue = getWorkersToUpdate(harvester_config.monitor.maxWorkers,
+                                                       harvester_config.monitor.checkInterval,
+                                                       harvester_config.monitor.lockInterval,
+                                                       lockedBy)
                 mainLog.debug('got {0} queues'.format(len(workSpecsPerQueue)))
                 # loop over all workers
+                obj_score_list = []
                 for queueName, configIdWorkSpecs in iteritems(workSpecsPerQueue):
                     for configID, workSpecsList in iteritems(configIdWorkSpecs):
                         retVal = self.monitor_agent_core(lockedBy, queueName, workSpecsList, config_id=configID)
                         if monitor_fifo.enabled and retVal is not None:
                             workSpecsToEnqueue, workSpecsToEnqueueToHead, timeNow_timestamp, fifoCheckInterval = retVal
                             if workSpecsToEnqueue:
-                                mainLog.debug('putting workers to FIFO')
-                                try:
-                                    score = fifoCheckInterval + timeNow_timestamp
-                                    monitor_fifo.put((queueName, workSpecsToEnqueue), score)
-                                    mainLog.info('put workers of {0} to FIFO with score {1}'.format(queueName, score))
-                                except Exception as errStr:
-                                    mainLog.error('failed to put object from FIFO: {0}'.format(errStr))
+                                score = fifoCheckInterval + timeNow_timestamp
+                                obj_score_list.append(((queueName, workSpecsToEnqueue), score))
+                                mainLog.info('to put workers of {0} to FIFO with score {1}'.format(queueName, score))
                             if workSpecsToEnqueueToHead:
-                                mainLog.debug('putting workers to FIFO head')
-                                try:
-                                    score = fifoCheckInterval - timeNow_timestamp
-                                    monitor_fifo.put((queueName, workSpecsToEnqueueToHead), score)
-                                    mainLog.info('put workers of {0} to FIFO with score {1}'.format(queueName, score))
-                                except Exception as errStr:
-                                    mainLog.error('failed to put object from FIFO head: {0}'.format(errStr))
+                                score = fifoCheckInterval - timeNow_timestamp
+                                obj_score_list.append(((queueName, workSpecsToEnqueueToHead), score))
+                                mainLog.info('to put workers of {0} to FIFO head with score {1}'.format(queueName, score))
+                if obj_score_list:
+                    mainLog.debug('putting workers to FIFO')
+                    try:
+                        monitor_fifo.put_many(obj_score_list)
+                        mainLog.info('put {0} worker chunks to FIFO'.format(len(obj_score_list)))
+                    except Exception as errStr:
+                        mainLog.error('failed to put objects to FIFO in bulk: {0}. Putting one by one'.format(errStr))
+                        # not to lose all chunks of the cycle
+                        for obj, score in obj_score_list:
+                            try:
+                                monitor_fifo.put(obj, score)
+                            except Exception as errStr:
+                                mainLog.error('failed to put object to FIFO: {0}'.format(errStr))
                 last_DB_cycle_timestamp = time.time()
                 if sw_db.get_elapsed_time_in_sec() > harvester_config.monitor.lockInterval:
                     mainLog.warning('a single DB cycle was longer than lockInterval ' + sw_db.get_elapsed_time())
@@ -106,21 +221,24 @@ class Monitor(AgentBase):
                     mainLog.debug('done a DB cycle' + sw_db.get_elapsed_time())
                 mainLog.debug('ended run with DB')
             elif monitor_fifo.enabled:
-                # run with workers from FIFO
+                # run with workers from FIFO through the pipeline of dequeue -> check -> update -> enqueue
                 sw = core_utils.get_stopwatch()
                 n_loops = 0
                 n_loops_hit = 0
                 last_fifo_cycle_timestamp = time.time()
-                to_break = False
                 obj_dequeued_id_list = []
-                obj_to_enqueue_dict = collections.defaultdict(lambda: [[], 0, 0])
-                obj_to_enqueue_to_head_dict = collections.defaultdict(lambda: [[], 0, 0])
-                remaining_obj_to_enqueue_dict = {}
-                remaining_obj_to_enqueue_to_head_dict = {}
                 n_chunk_peeked_stat, sum_overhead_time_stat = 0, 0.0
+                # reset number of chunks and busy time of each stage
+                for stageStat in stageStats.values():
+                    stageStat[0], stageStat[1] = 0, 0.0
                 while time.time() < last_fifo_cycle_timestamp + fifoCheckDuration:
                     sw.reset()
                     n_loops += 1
+                    # check workers of which files were written without waiting for their turn in FIFO
+                    if fileWatcher is not None:
+                        changedWorkerIDs = fileWatcher.get_changed_workers()
+                        if changedWorkerIDs:
+                            self.check_changed_workers(lockedBy, changedWorkerIDs, checkQueue)
                     retVal, overhead_time = monitor_fifo.to_check_workers()
                     if overhead_time is not None:
                         n_chunk_peeked_stat += 1
@@ -131,17 +249,39 @@ class Monitor(AgentBase):
                         mainLog.debug('FIFO size is {0}'.format(fifo_size))
                         mainLog.debug('starting run with FIFO')
                         try:
-                            obj_gotten = monitor_fifo.get(timeout=1, protective=fifoProtectiveDequeue)
+                            obj_gotten_list = monitor_fifo.get_many(fifoMaxChunksPerGet, timeout=1,
+                                                                    protective=fifoProtectiveDequeue)
                         except Exception as errStr:
-                            mainLog.error('failed to get object from FIFO: {0}'.format(errStr))
+                            mainLog.error('failed to get objects from FIFO: {0}'.format(errStr))
                         else:
-                            if obj_gotten is not None:
-                                sw_fifo = core_utils.get_stopwatch()
+                            dequeueTime = time.time()
+                            # put back chunks which are not due yet, since only the first chunk was checked
+                            obj_to_put_back_list = [obj_gotten for obj_gotten in obj_gotten_list
+                                                    if obj_gotten.score > dequeueTime]
+                            if obj_to_put_back_list:
+                                obj_gotten_list = [obj_gotten for obj_gotten in obj_gotten_list
+                                                   if obj_gotten.score <= dequeueTime]
+                                try:
+                                    if fifoProtectiveDequeue:
+                                        monitor_fifo.restore(ids=[obj_gotten.id for obj_gotten
+                                                                  in obj_to_put_back_list])
+                                    else:
+                                        monitor_fifo.put_many([(obj_gotten.item, obj_gotten.score)
+                                                               for obj_gotten in obj_to_put_back_list])
+                                except Exception as errStr:
+                                    mainLog.error('failed to put back objects to FIFO: {0}'.format(errStr))
+                            if obj_gotten_list:
+                                mainLog.debug('got {0} chunks from FIFO'.format(len(obj_gotten_list))
+                                              + sw.get_elapsed_time())
+                            else:
+                                mainLog.debug('got nothing in FIFO')
+                            stageStats['dequeue'][1] += sw.get_elapsed_time_in_sec(precise=True)
+                            for obj_gotten in obj_gotten_list:
+                                sw.reset()
                                 if fifoProtectiveDequeue:
                                     obj_dequeued_id_list.append(obj_gotten.id)
                                 queueName, workSpecsList = obj_gotten.item
-                                mainLog.debug('got a chunk of {0} workers of {1} from FIFO'.format(len(workSpecsList), queueName) + sw.get_elapsed_time())
-                                sw.reset()
+                                mainLog.debug('got a chunk of {0} workers of {1} from FIFO'.format(len(workSpecsList), queueName))
                                 configID = None
                                 for workSpecs in workSpecsList:
                                     if configID is None and len(workSpecs) > 0:
@@ -154,87 +294,37 @@ class Monitor(AgentBase):
                                             else:
                                                 workSpec.pandaid_list = []
                                             workSpec.force_update('pandaid_list')
-                                retVal = self.monitor_agent_core(lockedBy, queueName, workSpecsList, from_fifo=True,
-                                                                 config_id=configID)
-                                if retVal is not None:
-                                    workSpecsToEnqueue, workSpecsToEnqueueToHead, timeNow_timestamp, fifoCheckInterval = retVal
-                                    try:
-                                        if len(obj_to_enqueue_dict[queueName][0]) + len(workSpecsToEnqueue) <= fifoMaxWorkersPerChunk:
-                                            obj_to_enqueue_dict[queueName][0].extend(workSpecsToEnqueue)
-                                            obj_to_enqueue_dict[queueName][1] = max(obj_to_enqueue_dict[queueName][1], timeNow_timestamp)
-                                            obj_to_enqueue_dict[queueName][2] = max(obj_to_enqueue_dict[queueName][2], fifoCheckInterval)
-                                        else:
-                                            to_break = True
-                                            remaining_obj_to_enqueue_dict[queueName] = [workSpecsToEnqueue, timeNow_timestamp, fifoCheckInterval]
-                                    except Exception as errStr:
-                                        mainLog.error('failed to gather workers for FIFO: {0}'.format(errStr))
-                                        to_break = True
-                                    try:
-                                        if len(obj_to_enqueue_to_head_dict[queueName][0]) + len(workSpecsToEnqueueToHead) <= fifoMaxWorkersPerChunk:
-                                            obj_to_enqueue_to_head_dict[queueName][0].extend(workSpecsToEnqueueToHead)
-                                            obj_to_enqueue_to_head_dict[queueName][1] = max(obj_to_enqueue_to_head_dict[queueName][1], timeNow_timestamp)
-                                            obj_to_enqueue_to_head_dict[queueName][2] = max(obj_to_enqueue_to_head_dict[queueName][2], fifoCheckInterval)
-                                        else:
-                                            to_break = True
-                                            remaining_obj_to_enqueue_to_head_dict[queueName] = [workSpecsToEnqueueToHead, timeNow_timestamp, fifoCheckInterval]
-                                    except Exception as errStr:
-                                        mainLog.error('failed to gather workers for FIFO head: {0}'.format(errStr))
-                                        to_break = True
-                                    mainLog.debug('checked {0} workers from FIFO'.format(len(workSpecsList)) + sw.get_elapsed_time())
-                                else:
-                                    mainLog.debug('monitor_agent_core returned None. Skipped putting to FIFO')
-                                if sw_fifo.get_elapsed_time_in_sec() > harvester_config.monitor.lockInterval:
-                                    mainLog.warning('a single FIFO cycle was longer than lockInterval ' + sw_fifo.get_elapsed_time())
-                                else:
-                                    mainLog.debug('done a FIFO cycle' + sw_fifo.get_elapsed_time())
-                                    n_loops_hit += 1
-                                if to_break:
-                                    break
-                            else:
-                                mainLog.debug('got nothing in FIFO')
+                                stageStats['dequeue'][0] += 1
+                                stageStats['dequeue'][1] += sw.get_elapsed_time_in_sec(precise=True)
+                                # blocks while downstream stages are busy
+                                checkQueue.put((queueName, workSpecsList, configID, dequeueTime, True))
+                                n_loops_hit += 1
                     else:
                         mainLog.debug('workers in FIFO too young to check. Skipped')
                         if self.singleMode:
                             break
                         if overhead_time is not None:
-                            time.sleep(max(-overhead_time*random.uniform(0.1, 1), adjusted_sleepTime))
+                            tmpSleepTime = max(-overhead_time*random.uniform(0.1, 1), adjusted_sleepTime)
+                        else:
+                            tmpSleepTime = max(fifoCheckDuration*random.uniform(0.1, 1), adjusted_sleepTime)
+                        # wake up when files of workers are written
+                        if fileWatcher is not None:
+                            fileWatcher.wait(tmpSleepTime)
                         else:
-                            time.sleep(max(fifoCheckDuration*random.uniform(0.1, 1), adjusted_sleepTime))
+                            time.sleep(tmpSleepTime)
                 mainLog.debug('run {0} loops, including {1} FIFO cycles'.format(n_loops, n_loops_hit))
-
-                # enqueue to fifo
+                # drain the pipeline
                 sw.reset()
-                n_chunk_put = 0
-                mainLog.debug('putting worker chunks to FIFO')
-                for _dct in (obj_to_enqueue_dict, remaining_obj_to_enqueue_dict):
-                    for queueName, obj_to_enqueue in iteritems(_dct):
-                        try:
-                            workSpecsToEnqueue, timeNow_timestamp, fifoCheckInterval = obj_to_enqueue
-                            if workSpecsToEnqueue:
-                                score = fifoCheckInterval + timeNow_timestamp
-                                monitor_fifo.put((queueName, workSpecsToEnqueue), score)
-                                n_chunk_put += 1
-                                mainLog.info('put a chunk of {0} workers of {1} to FIFO with score {2}'.format(
-                                                len(workSpecsToEnqueue), queueName, score))
-                        except Exception as errStr:
-                            mainLog.error('failed to put object from FIFO: {0}'.format(errStr))
-                mainLog.debug('putting worker chunks to FIFO head')
-                for _dct in (obj_to_enqueue_to_head_dict, remaining_obj_to_enqueue_to_head_dict):
-                    for queueName, obj_to_enqueue_to_head in iteritems(_dct):
-                        try:
-                            workSpecsToEnqueueToHead, timeNow_timestamp, fifoCheckInterval = obj_to_enqueue_to_head
-                            if workSpecsToEnqueueToHead:
-                                score = fifoCheckInterval + timeNow_timestamp - 2**32
-                                monitor_fifo.put((queueName, workSpecsToEnqueueToHead), score)
-                                n_chunk_put += 1
-                                mainLog.info('put a chunk of {0} workers of {1} to FIFO with score {2}'.format(
-                                                len(workSpecsToEnqueueToHead), queueName, score))
-                        except Exception as errStr:
-                            mainLog.error('failed to put object from FIFO head: {0}'.format(errStr))
+                checkQueue.put(None)
+                cycleEndQueue.get()
+                mainLog.debug('drained the pipeline' + sw.get_elapsed_time())
                 # release protective dequeued objects
                 if fifoProtectiveDequeue and len(obj_dequeued_id_list) > 0:
                     monitor_fifo.release(ids=obj_dequeued_id_list)
-                mainLog.debug('put {0} worker chunks into FIFO'.format(n_chunk_put) + sw.get_elapsed_time())
+                for stageName in ('dequeue', 'check', 'update', 'enqueue'):
+                    mainLog.debug('stage {0} processed {1} chunks in {2:.3f} sec'.format(stageName,
+                                                                                       stageStats[stageName][0],
+                                                                                       stageStats[stageName][1]))
                 # adjust adjusted_sleepTime
                 if n_chunk_peeked_stat > 0 and sum_overhead_time_stat > sleepTime:
                     speedup_factor = (sum_overhead_time_stat - sleepTime) / (n_chunk_peeked_stat * harvester_config.monitor.checkInterval)
@@ -251,10 +341,41 @@ class Monitor(AgentBase):
             # check if being terminated
             if self.terminated(adjusted_sleepTime):
                 mainLog.debug('terminated')
+                # stop the pipeline
+                if stageThreads:
+                    checkQueue.put(_fifo_stage_stop)
+                    for stageThread in stageThreads:
+                        stageThread.join()
                 return
 
+    # send workers of which files in access points were written to the check stage of the FIFO pipeline
+    def check_changed_workers(self, lockedBy, worker_ids, check_queue):
+        tmpLog = self.make_logger(_logger, 'id={0}'.format(lockedBy), method_name='check_changed_workers')
+        sw = core_utils.get_stopwatch()
+        # lock workers in DB which are not being checked by other threads
+        workSpecsPerQueue = self.dbProxy.get_workers_to_update_bulk(len(worker_ids), 0,
+                                                                    harvester_config.monitor.lockInterval,
+                                                                    lockedBy, worker_ids=worker_ids)
+        nWorkerSets = 0
+        for queueName, configIdWorkSpecs in iteritems(workSpecsPerQueue):
+            for configID, workSpecsList in iteritems(configIdWorkSpecs):
+                nWorkerSets += len(workSpecsList)
+                # workers are locked in DB like the DB cycle, so that they are not checked as from FIFO
+                check_queue.put((queueName, workSpecsList, configID, time.time(), False))
+        tmpLog.debug('sent {0} worker sets for {1} workers with written files'.format(nWorkerSets,
+                                                                                      len(worker_ids))
+                     + sw.get_elapsed_time())
+
     # core of monitor agent to check workers in workSpecsList of queueName
     def monitor_agent_core(self, lockedBy, queueName, workSpecsList, from_fifo=False, config_id=None):
+        checkedChunks = self.check_worker_chunks(lockedBy, queueName, workSpecsList, from_fifo=from_fifo,
+                                                 config_id=config_id)
+        if checkedChunks is None:
+            return None
+        return self.update_worker_chunks(lockedBy, checkedChunks)
+
+    # check workers in workSpecsList of queueName and make jobs and workers to update
+    def check_worker_chunks(self, lockedBy, queueName, workSpecsList, from_fifo=False, config_id=None):
         tmpQueLog = self.make_logger(_logger, 'id={0} queue={1}'.format(lockedBy, queueName),
                                      method_name='run')
         # check queue
@@ -269,11 +390,8 @@ class Monitor(AgentBase):
             apfmon_status_updates = False
         tmpQueLog.debug('apfmon_status_updates: {0}'.format(apfmon_status_updates))
         # get plugins
-        monCore = self.pluginFactory.get_plugin(queueConfig.monitor)
-        messenger = self.pluginFactory.get_plugin(queueConfig.messenger)
-        # workspec chunk of active workers
-        workSpecsToEnqueue_dict = {}
-        workSpecsToEnqueueToHead_dict = {}
+        monCore = self.pluginFactory.get_plugin(queueConfig.monitor, config_id=queueConfig.configID)
+        messenger = self.pluginFactory.get_plugin(queueConfig.messenger, config_id=queueConfig.configID)
         timeNow_timestamp = time.time()
         # get fifoCheckInterval for PQ and other fifo attributes
         try:
@@ -291,10 +409,15 @@ class Monitor(AgentBase):
             fifoMaxPreemptInterval = harvester_config.monitor.fifoMaxPreemptInterval
         except AttributeError:
             fifoMaxPreemptInterval = 60
+        try:
+            dbBulkMode = harvester_config.monitor.dbBulkMode
+        except AttributeError:
+            dbBulkMode = False
         # check workers
         allWorkers = [item for sublist in workSpecsList for item in sublist]
         tmpQueLog.debug('checking {0} workers'.format(len(allWorkers)))
         tmpStat, tmpRetMap = self.check_workers(monCore, messenger, allWorkers, queueConfig, tmpQueLog, from_fifo)
+        jobsWorkersList = []
         if tmpStat:
             # loop over all worker chunks
             tmpQueLog.debug('update jobs and workers')
@@ -306,6 +429,7 @@ class Monitor(AgentBase):
                 filesToStageOutList = dict()
                 isCheckedList = []
                 mapType = workSpecs[0].mapType
+                hasUnknownStatus = False
                 # loop over workSpecs
                 for workSpec in workSpecs:
                     tmpLog = self.make_logger(_logger,
@@ -331,8 +455,9 @@ class Monitor(AgentBase):
                     iWorker += 1
                     # check status
                     if newStatus not in WorkSpec.ST_LIST:
-                        tmpLog.error('unknown status={0}'.format(newStatus))
-                        return
+                        tmpLog.error('unknown status={0}. Skipped the worker set'.format(newStatus))
+                        hasUnknownStatus = True
+                        break
                     # update worker
                     workSpec.set_status(newStatus)
                     workSpec.set_work_attributes(workAttributes)
@@ -372,6 +497,9 @@ class Monitor(AgentBase):
                         tmpQueLog.debug('apfmon_status_updates: {0} newStatus: {1} monStatus: {2} oldStatus: {3} workSpecStatus: {4}'.
                                         format(apfmon_status_updates, newStatus, monStatus, oldStatus, workSpec.status))
                         self.apfmon.update_worker(workSpec, monStatus)
+                # skip only the worker set with unknown status, not to lose other chunks
+                if hasUnknownStatus:
+                    continue
 
                 # lock workers for fifo
                 if from_fifo:
@@ -399,10 +527,62 @@ class Monitor(AgentBase):
                     tmpQueLog.debug('updating {0} jobs with {1} workers'.format(len(jobSpecs), len(workSpecs)))
                     core_utils.update_job_attributes_with_workers(mapType, jobSpecs, workSpecs,
                                                                   filesToStageOutList, eventsToUpdateList)
-                # update local database
-                tmpRet = self.dbProxy.update_jobs_workers(jobSpecs, workSpecs, lockedBy, pandaIDsList)
-                if not tmpRet:
-                    for workSpec in workSpecs:
+                jobsWorkersList.append((jobSpecs, workSpecs, pandaIDsList, eventsToUpdateList, filesToStageOutList))
+        return {'queueName': queueName,
+                'fromFifo': from_fifo,
+                'queueConfig': queueConfig,
+                'checkStatus': tmpStat,
+                'checkResults': tmpRetMap,
+                'jobsWorkersList': jobsWorkersList,
+                'timeNowTimestamp': timeNow_timestamp,
+                'fifoCheckInterval': fifoCheckInterval,
+                'forceEnqueueInterval': forceEnqueueInterval,
+                'fifoMaxPreemptInterval': fifoMaxPreemptInterval,
+                'dbBulkMode': dbBulkMode}
+
+    # update jobs and workers checked by check_worker_chunks, and get workers to enqueue to FIFO
+    def update_worker_chunks(self, lockedBy, checkedChunks):
+        queueName = checkedChunks['queueName']
+        from_fifo = checkedChunks['fromFifo']
+        queueConfig = checkedChunks['queueConfig']
+        tmpStat = checkedChunks['checkStatus']
+        tmpRetMap = checkedChunks['checkResults']
+        jobsWorkersList = checkedChunks['jobsWorkersList']
+        timeNow_timestamp = checkedChunks['timeNowTimestamp']
+        fifoCheckInterval = checkedChunks['fifoCheckInterval']
+        forceEnqueueInterval = checkedChunks['forceEnqueueInterval']
+        fifoMaxPreemptInterval = checkedChunks['fifoMaxPreemptInterval']
+        dbBulkMode = checkedChunks['dbBulkMode']
+        tmpQueLog = self.make_logger(_logger, 'id={0} queue={1}'.format(lockedBy, queueName),
+                                     method_name='run')
+        # get messenger in this thread, since the update stage runs concurrently with the check stage
+        messenger = self.pluginFactory.get_plugin(queueConfig.messenger, config_id=queueConfig.configID)
+        # workspec chunk of active workers
+        workSpecsToEnqueue_dict = {}
+        workSpecsToEnqueueToHead_dict = {}
+        if tmpStat:
+            # update local database
+            if dbBulkMode:
+                try:
+                    nWorkersPerCommit = harvester_config.monitor.nWorkersPerCommit
+                except AttributeError:
+                    nWorkersPerCommit = 100
+                tmpRetList = self.dbProxy.update_jobs_workers_bulk([(jobSpecs, workSpecs, pandaIDsList)
+                                                                    for jobSpecs, workSpecs, pandaIDsList, _, _
+                                                                    in jobsWorkersList],
+                                                                   lockedBy, nWorkersPerCommit)
+            else:
+                tmpRetList = []
+                for jobSpecs, workSpecs, pandaIDsList, _, _ in jobsWorkersList:
+                    tmpRet = self.dbProxy.update_jobs_workers(jobSpecs, workSpecs, lockedBy, pandaIDsList)
+                    tmpRetList.append([tmpRet] * len(workSpecs))
+            # loop over all worker chunks after update
+            for (jobSpecs, workSpecs, pandaIDsList, eventsToUpdateList, filesToStageOutList), tmpRets \
+                    in zip(jobsWorkersList, tmpRetList):
+                if not all(tmpRets):
+                    for workSpec, tmpRet in zip(workSpecs, tmpRets):
+                        if tmpRet:
+                            continue
                         tmpLog = self.make_logger(_logger,
                                                   'id={0} workerID={1}'.format(lockedBy, workSpec.workerID),
                                                   method_name='run')
@@ -503,6 +683,68 @@ class Monitor(AgentBase):
         tmpQueLog.debug('done')
         return retVal
 
+    # run a pipeline stage of FIFO cycle until the stop mark comes. The stage keeps draining in_queue and forwards
+    # the end mark None of each cycle to out_queue even if it fails to process items, so that upstream stages and
+    # the main loop are never blocked
+    def run_fifo_stage(self, locked_by, stage_func, in_queue, out_queue, stage_stats):
+        tmpLog = self.make_logger(_logger, 'id={0}'.format(locked_by), method_name='run_fifo_stage')
+        while True:
+            item = in_queue.get()
+            if item is _fifo_stage_stop:
+                out_queue.put(item)
+                return
+            try:
+                retVal = stage_func(locked_by, item, stage_stats)
+            except Exception:
+                core_utils.dump_error_message(tmpLog)
+                retVal = None
+            if item is None:
+                out_queue.put(None)
+            elif retVal is not None:
+                out_queue.put(retVal)
+
+    # pipeline stage of FIFO cycle to check workers with plugins
+    def fifo_check_stage(self, locked_by, item, stage_stats):
+        if item is None:
+            return None
+        tmpLog = self.make_logger(_logger, 'id={0}'.format(locked_by), method_name='fifo_check_stage')
+        queueName, workSpecsList, configID, dequeueTime, fromFifo = item
+        sw = core_utils.get_stopwatch()
+        try:
+            checkedChunks = self.check_worker_chunks(locked_by, queueName, workSpecsList, from_fifo=fromFifo,
+                                                     config_id=configID)
+        except Exception:
+            core_utils.dump_error_message(tmpLog)
+            checkedChunks = None
+        stage_stats['check'][0] += 1
+        stage_stats['check'][1] += sw.get_elapsed_time_in_sec(precise=True)
+        if checkedChunks is None:
+            tmpLog.debug('failed to check workers of {0}. Skipped putting to FIFO'.format(queueName))
+            return None
+        tmpLog.debug('checked {0} workers of {1}'.format(len(workSpecsList), queueName) + sw.get_elapsed_time())
+        return checkedChunks, dequeueTime
+
+    # pipeline stage of FIFO cycle to update jobs and workers in DB
+    def fifo_update_stage(self, locked_by, item, stage_stats):
+        if item is None:
+            return None
+        tmpLog = self.make_logger(_logger, 'id={0}'.format(locked_by), method_name='fifo_update_stage')
+        checkedChunks, dequeueTime = item
+        queueName = checkedChunks['queueName']
+        sw = core_utils.get_stopwatch()
+        try:
+            retVal = self.update_worker_chunks(locked_by, checkedChunks)
+        except Exception:
+            core_utils.dump_error_message(tmpLog)
+            retVal = None
+        stage_stats['update'][0] += 1
+        stage_stats['update'][1] += sw.get_elapsed_time_in_sec(precise=True)
+        if retVal is None:
+            tmpLog.debug('failed to update workers of {0}. Skipped putting to FIFO'.format(queueName))
+            return None
+        tmpLog.debug('updated workers of {0}'.format(queueName) + sw.get_elapsed_time())
+        return queueName, retVal, dequeueTime
+
     # wrapper for checkWorkers
     def check_workers(self, mon_core, messenger, all_workers, queue_config, tmp_log, from_fifo):
         # check timeout value
@@ -520,6 +762,8 @@ class Monitor(AgentBase):
         workersToCheck = []
         thingsToPostProcess = []
         retMap = dict()
+        # look up files in access points with snapshots during the check
+        messenger.take_snapshots(all_workers)
         for workSpec in all_workers:
             eventsRequestParams = {}
             eventsToUpdate = []
@@ -683,3 +927,5 @@ class Monitor(AgentBase):
         except Exception:
             core_utils.dump_error_message(tmp_log)
             return False, None
+        finally:
+            messenger.release_snapshots(all_workers)
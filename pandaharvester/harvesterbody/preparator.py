@@ -1,4 +1,5 @@
 import datetime
+from future.utils import iteritems
 
 from pandaharvester.harvesterconfig import harvester_config
 from pandaharvester.harvestercore import core_utils
@@ -55,7 +56,7 @@ class Preparator(AgentBase):
                     queueConfig = self.queueConfigMapper.get_queue(jobSpec.computingSite, jobSpec.configID)
                     oldSubStatus = jobSpec.subStatus
                     # get plugin
-                    preparatorCore = self.pluginFactory.get_plugin(queueConfig.preparator)
+                    preparatorCore = self.pluginFactory.get_plugin(queueConfig.preparator, config_id=queueConfig.configID)
                     if preparatorCore is None:
                         # not found
                         tmpLog.error('plugin for {0} not found'.format(jobSpec.computingSite))
@@ -118,8 +119,25 @@ class Preparator(AgentBase):
                                                                 lockedBy,
                                                                 'preparing')
             mainLog.debug('got {0} jobs to prepare'.format(len(jobsToTrigger)))
-            # loop over all jobs
+            # check status of input files in bulk
+            lfnsPerEndpoint = dict()
+            for jobSpec in jobsToTrigger:
+                configID = jobSpec.configID
+                if not core_utils.dynamic_plugin_change():
+                    configID = None
+                if not self.queueConfigMapper.has_queue(jobSpec.computingSite, configID):
+                    continue
+                ddmEndpointIn = self.queueConfigMapper.get_queue(jobSpec.computingSite, configID).ddmEndpointIn
+                lfnsPerEndpoint.setdefault(ddmEndpointIn, set())
+                for fileSpec in jobSpec.inFiles:
+                    if fileSpec.status == 'preparing':
+                        lfnsPerEndpoint[ddmEndpointIn].add(fileSpec.lfn)
             fileStatMap = dict()
+            for ddmEndpointIn, lfnList in iteritems(lfnsPerEndpoint):
+                if lfnList:
+                    fileStatMap[ddmEndpointIn] = self.dbProxy.get_files_status(lfnList, 'input', ddmEndpointIn,
+                                                                               'starting')
+            # loop over all jobs
             for jobSpec in jobsToTrigger:
                 tmpLog = self.make_logger(_logger, 'PandaID={0}'.format(jobSpec.PandaID),
                                           method_name='run')
@@ -137,7 +155,7 @@ class Preparator(AgentBase):
                     queueConfig = self.queueConfigMapper.get_queue(jobSpec.computingSite, configID)
                     oldSubStatus = jobSpec.subStatus
                     # get plugin
-                    preparatorCore = self.pluginFactory.get_plugin(queueConfig.preparator)
+                    preparatorCore = self.pluginFactory.get_plugin(queueConfig.preparator, config_id=queueConfig.configID)
                     if preparatorCore is None:
                         # not found
                         tmpLog.error('plugin for {0} not found'.format(jobSpec.computingSite))
@@ -56,7 +56,7 @@ class Stager(AgentBase):
                         continue
                     queueConfig = self.queueConfigMapper.get_queue(jobSpec.computingSite, configID)
                     # get plugin
-                    stagerCore = self.pluginFactory.get_plugin(queueConfig.stager)
+                    stagerCore = self.pluginFactory.get_plugin(queueConfig.stager, config_id=queueConfig.configID)
                     if stagerCore is None:
                         # not found
                         tmpLog.error('plugin for {0} not found'.format(jobSpec.computingSite))
@@ -119,7 +119,7 @@ class Stager(AgentBase):
                         continue
                     queueConfig = self.queueConfigMapper.get_queue(jobSpec.computingSite, configID)
                     # get plugin
-                    stagerCore = self.pluginFactory.get_plugin(queueConfig.stager)
+                    stagerCore = self.pluginFactory.get_plugin(queueConfig.stager, config_id=queueConfig.configID)
                     if stagerCore is None:
                         # not found
                         tmpLog.error('plugin for {0} not found'.format(jobSpec.computingSite))
@@ -188,7 +188,7 @@ class Stager(AgentBase):
                         continue
                     queueConfig = self.queueConfigMapper.get_queue(jobSpec.computingSite, configID)
                     # get plugin
-                    stagerCore = self.pluginFactory.get_plugin(queueConfig.stager)
+                    stagerCore = self.pluginFactory.get_plugin(queueConfig.stager, config_id=queueConfig.configID)
                     if stagerCore is None:
                         # not found
                         tmpLog.error('plugin for {0} not found'.format(jobSpec.computingSite))
@@ -41,7 +41,7 @@ class Sweeper(AgentBase):
                         mainLog.error('queue config for {0}/{1} not found'.format(queueName, configID))
                         continue
                     queueConfig = self.queueConfigMapper.get_queue(queueName, configID)
-                    sweeperCore = self.pluginFactory.get_plugin(queueConfig.sweeper)
+                    sweeperCore = self.pluginFactory.get_plugin(queueConfig.sweeper, config_id=queueConfig.configID)
                     sw.reset()
                     n_workers = len(workspec_list)
                     try:
@@ -102,8 +102,8 @@ class Sweeper(AgentBase):
                         mainLog.error('queue config for {0}/{1} not found'.format(queueName, configID))
                         continue
                     queueConfig = self.queueConfigMapper.get_queue(queueName, configID)
-                    sweeperCore = self.pluginFactory.get_plugin(queueConfig.sweeper)
-                    messenger = self.pluginFactory.get_plugin(queueConfig.messenger)
+                    sweeperCore = self.pluginFactory.get_plugin(queueConfig.sweeper, config_id=queueConfig.configID)
+                    messenger = self.pluginFactory.get_plugin(queueConfig.messenger, config_id=queueConfig.configID)
                     sw.reset()
                     n_workers = len(workspec_list)
                     # make sure workers to clean up are all terminated
@@ -122,6 +122,7 @@ class Sweeper(AgentBase):
                         core_utils.dump_error_message(mainLog)
                     mainLog.debug('made sure workers to clean up are all terminated')
                     # start cleanup
+                    workerIDsToDelete = []
                     for workspec in workspec_list:
                         tmpLog = self.make_logger(_logger, 'workerID={0}'.format(workspec.workerID),
                                                   method_name='run')
@@ -134,9 +135,12 @@ class Sweeper(AgentBase):
                             mc_tmpStat, mc_tmpOut = messenger.clean_up(workspec)
                             tmpLog.debug('messenger cleaned up with status={0} diag={1}'.format(mc_tmpStat, mc_tmpOut))
                             if tmpStat:
-                                self.dbProxy.delete_worker(workspec.workerID)
+                                workerIDsToDelete.append(workspec.workerID)
                         except Exception:
                             core_utils.dump_error_message(tmpLog)
+                    # delete workers in bulk
+                    if workerIDsToDelete:
+                        self.dbProxy.delete_workers(workerIDsToDelete)
                     mainLog.debug('done cleaning up {0} workers'.format(n_workers) + sw.get_elapsed_time())
             mainLog.debug('done all cleanup' + sw_cleanup.get_elapsed_time())
             # old-job-deletion stage
@@ -81,7 +81,7 @@ class WorkerAdjuster(object):
                     # get throttler
                     if queueName not in self.throttlerMap:
                         if hasattr(queueConfig, 'throttler'):
-                            throttler = self.pluginFactory.get_plugin(queueConfig.throttler)
+                            throttler = self.pluginFactory.get_plugin(queueConfig.throttler, config_id=queueConfig.configID)
                         else:
                             throttler = None
                         self.throttlerMap[queueName] = throttler
@@ -15,7 +15,7 @@ class WorkerMaker(object):
 
     # get plugin
     def get_plugin(self, queue_config):
-        return self.pluginFactory.get_plugin(queue_config.workerMaker)
+        return self.pluginFactory.get_plugin(queue_config.workerMaker, config_id=queue_config.configID)
 
     # make workers
     def make_workers(self, jobchunk_list, queue_config, n_ready, resource_type, maker=None):
@@ -25,7 +25,7 @@ class WorkerMaker(object):
         try:
             # get plugin
             if maker is None:
-                maker = self.pluginFactory.get_plugin(queue_config.workerMaker)
+                maker = self.pluginFactory.get_plugin(queue_config.workerMaker, config_id=queue_config.configID)
             if maker is None:
                 # not found
                 tmpLog.error('plugin for {0} not found'.format(queue_config.queueName))
@@ -68,33 +68,33 @@ class WorkerMaker(object):
     def get_num_jobs_per_worker(self, queue_config, n_workers, resource_type, maker=None):
         # get plugin
         if maker is None:
-            maker = self.pluginFactory.get_plugin(queue_config.workerMaker)
+            maker = self.pluginFactory.get_plugin(queue_config.workerMaker, config_id=queue_config.configID)
         return maker.get_num_jobs_per_worker(n_workers)
 
     # get number of workers per job
     def get_num_workers_per_job(self, queue_config, n_workers, resource_type, maker=None):
         # get plugin
         if maker is None:
-            maker = self.pluginFactory.get_plugin(queue_config.workerMaker)
+            maker = self.pluginFactory.get_plugin(queue_config.workerMaker, config_id=queue_config.configID)
         return maker.get_num_workers_per_job(n_workers)
 
     # check number of ready resources
     def num_ready_resources(self, queue_config, resource_type, maker=None):
         # get plugin
         if maker is None:
-            maker = self.pluginFactory.get_plugin(queue_config.workerMaker)
+            maker = self.pluginFactory.get_plugin(queue_config.workerMaker, config_id=queue_config.configID)
         return maker.num_ready_resources()
 
     # get upper limit on the cumulative total of workers per job
     def get_max_workers_per_job_in_total(self, queue_config, resource_type, maker=None):
         # get plugin
         if maker is None:
-            maker = self.pluginFactory.get_plugin(queue_config.workerMaker)
+            maker = self.pluginFactory.get_plugin(queue_config.workerMaker, config_id=queue_config.configID)
         return maker.get_max_workers_per_job_in_total()
 
     # get upper limit on the number of new workers per job in a cycle
     def get_max_workers_per_job_per_cycle(self, queue_config, resource_type, maker=None):
         # get plugin
         if maker is None:
-            maker = self.pluginFactory.get_plugin(queue_config.workerMaker)
+            maker = self.pluginFactory.get_plugin(queue_config.workerMaker, config_id=queue_config.configID)
         return maker.get_max_workers_per_job_per_cycle()
@@ -8,18 +8,23 @@ try:
     ssl.HAS_SNI = False
 except Exception:
     pass
+import os
 import sys
 import json
+import time
 import pickle
 import zlib
 import uuid
 import inspect
 import datetime
 import requests
+import threading
 import traceback
 from future.utils import iteritems
 # TO BE REMOVED for python2.7
 import requests.packages.urllib3
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 try:
     requests.packages.urllib3.disable_warnings()
 except Exception:
@@ -30,8 +35,19 @@ from pandaharvester.harvesterconfig import harvester_config
 from .base_communicator import BaseCommunicator
 
 
+# methods which can be safely retried since the server side is idempotent
+idempotent_methods = set(['isAlive', 'getResourceTypes', 'getJobStatisticsPerSite', 'checkJobStatus',
+                          'checkEventsAvailability', 'harvesterIsAlive', 'updateWorkers',
+                          'reportWorkerStats', 'updateServiceMetrics'])
+
+
 # connection class
 class PandaCommunicator(BaseCommunicator):
+    # latency counters per method shared by all communicators
+    latencyStats = dict()
+    latencyLock = threading.Lock()
+    latencyReportTime = time.time()
+
     # constructor
     def __init__(self):
         BaseCommunicator.__init__(self)
@@ -42,6 +58,115 @@ class PandaCommunicator(BaseCommunicator):
                 self.useInspect = True
         else:
             self.verbose = False
+        # persistent session
+        if hasattr(harvester_config.pandacon, 'keepAlive'):
+            self.keepAlive = harvester_config.pandacon.keepAlive
+        else:
+            self.keepAlive = True
+        if hasattr(harvester_config.pandacon, 'poolMaxSize'):
+            self.poolMaxSize = harvester_config.pandacon.poolMaxSize
+        else:
+            self.poolMaxSize = 4
+        if hasattr(harvester_config.pandacon, 'nRetries'):
+            self.nRetries = harvester_config.pandacon.nRetries
+        else:
+            self.nRetries = 3
+        if hasattr(harvester_config.pandacon, 'retryBackoff'):
+            self.retryBackoff = harvester_config.pandacon.retryBackoff
+        else:
+            self.retryBackoff = 1
+        if hasattr(harvester_config.pandacon, 'latencyReportInterval'):
+            self.latencyReportInterval = harvester_config.pandacon.latencyReportInterval
+        else:
+            self.latencyReportInterval = 600
+        self.session = None
+        self.sessionCertTime = None
+
+    # get modification time of the default certificate
+    def get_cert_time(self):
+        retVal = []
+        for fileName in (harvester_config.pandacon.cert_file, harvester_config.pandacon.key_file):
+            try:
+                retVal.append(os.path.getmtime(fileName))
+            except Exception:
+                retVal.append(None)
+        return tuple(retVal)
+
+    # get session which is renewed when the certificate is updated
+    def get_session(self):
+        certTime = self.get_cert_time()
+        if self.session is not None and self.sessionCertTime != certTime:
+            tmpLog = self.make_logger(method_name='get_session')
+            tmpLog.debug('renew session since certificate was updated')
+            try:
+                self.session.close()
+            except Exception:
+                pass
+            self.session = None
+        if self.session is None:
+            self.session = requests.Session()
+            # retry only when failed to connect since requests may be non-idempotent
+            retry = Retry(total=self.nRetries, connect=self.nRetries, read=0, status=0,
+                          backoff_factor=self.retryBackoff)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.poolMaxSize, max_retries=retry)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.sessionCertTime = certTime
+        return self.session
+
+    # send request with retry for idempotent methods
+    def send_request(self, path, **kwargs):
+        if self.keepAlive:
+            func = self.get_session().post
+        else:
+            kwargs['headers']['Connection'] = 'close'
+            func = requests.post
+        if path in idempotent_methods:
+            nTry = 1 + self.nRetries
+        else:
+            nTry = 1
+        for iTry in range(nTry):
+            sw = core_utils.get_stopwatch()
+            try:
+                res = func(**kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.add_latency(path, sw.get_elapsed_time_in_sec(precise=True), False)
+                if iTry + 1 >= nTry:
+                    raise
+            else:
+                self.add_latency(path, sw.get_elapsed_time_in_sec(precise=True), res.status_code == 200)
+                if res.status_code < 500 or iTry + 1 >= nTry:
+                    return res
+            time.sleep(self.retryBackoff * (2 ** iTry))
+
+    # add latency to the counters
+    def add_latency(self, path, elapsed, is_ok):
+        with self.latencyLock:
+            stats = self.latencyStats.setdefault(path, {'nCalls': 0, 'nFailed': 0, 'totalTime': 0.,
+                                                        'maxTime': 0.})
+            stats['nCalls'] += 1
+            if not is_ok:
+                stats['nFailed'] += 1
+            stats['totalTime'] += elapsed
+            stats['maxTime'] = max(stats['maxTime'], elapsed)
+            # report periodically
+            timeNow = time.time()
+            if timeNow - PandaCommunicator.latencyReportTime < self.latencyReportInterval:
+                return
+            PandaCommunicator.latencyReportTime = timeNow
+            msgList = []
+            for tmpPath in sorted(self.latencyStats):
+                tmpStats = self.latencyStats[tmpPath]
+                msgList.append('{0}:nCalls={1},nFailed={2},avg={3:.3f}s,max={4:.3f}s'.format(
+                    tmpPath, tmpStats['nCalls'], tmpStats['nFailed'],
+                    tmpStats['totalTime'] / tmpStats['nCalls'], tmpStats['maxTime']))
+        tmpLog = self.make_logger(method_name='add_latency')
+        tmpLog.debug('latency ' + ' '.join(msgList))
+
+    # get latency counters
+    def get_latency_stats(self):
+        with self.latencyLock:
+            return dict((tmpPath, dict(tmpStats)) for tmpPath, tmpStats in iteritems(self.latencyStats))
 
     # POST with http
     def post(self, path, data):
@@ -56,11 +181,11 @@ class PandaCommunicator(BaseCommunicator):
             url = '{0}/{1}'.format(harvester_config.pandacon.pandaURL, path)
             if self.verbose:
                 tmpLog.debug('exec={0} URL={1} data={2}'.format(tmpExec, url, str(data)))
-            res = requests.post(url,
-                                data=data,
-                                headers={"Accept": "application/json",
-                                         "Connection": "close"},
-                                timeout=harvester_config.pandacon.timeout)
+            res = self.send_request(path,
+                                    url=url,
+                                    data=data,
+                                    headers={"Accept": "application/json"},
+                                    timeout=harvester_config.pandacon.timeout)
             if self.verbose:
                 tmpLog.debug('exec={0} code={1} return={2}'.format(tmpExec, res.status_code, res.text))
             if res.status_code == 200:
@@ -91,13 +216,13 @@ class PandaCommunicator(BaseCommunicator):
                 cert = (harvester_config.pandacon.cert_file,
                         harvester_config.pandacon.key_file)
             sw = core_utils.get_stopwatch()
-            res = requests.post(url,
-                                data=data,
-                                headers={"Accept": "application/json",
-                                         "Connection": "close"},
-                                timeout=harvester_config.pandacon.timeout,
-                                verify=harvester_config.pandacon.ca_cert,
-                                cert=cert)
+            res = self.send_request(path,
+                                    url=url,
+                                    data=data,
+                                    headers={"Accept": "application/json"},
+                                    timeout=harvester_config.pandacon.timeout,
+                                    verify=harvester_config.pandacon.ca_cert,
+                                    cert=cert)
             if self.verbose:
                 tmpLog.debug('exec={0} code={1} {3}. return={2}'.format(tmpExec, res.status_code, res.text,
                                                                         sw.get_elapsed_time()))
@@ -129,11 +254,13 @@ class PandaCommunicator(BaseCommunicator):
             if cert is None:
                 cert = (harvester_config.pandacon.cert_file,
                         harvester_config.pandacon.key_file)
-            res = requests.post(url,
-                                files=files,
-                                timeout=harvester_config.pandacon.timeout,
-                                verify=harvester_config.pandacon.ca_cert,
-                                cert=cert)
+            res = self.send_request(path,
+                                    url=url,
+                                    files=files,
+                                    headers={},
+                                    timeout=harvester_config.pandacon.timeout,
+                                    verify=harvester_config.pandacon.ca_cert,
+                                    cert=cert)
             if self.verbose:
                 tmpLog.debug('exec={0} code={1} return={2}'.format(tmpExec, res.status_code, res.text))
             if res.status_code == 200:
@@ -16,11 +16,14 @@ import inspect
 import datetime
 import threading
 import traceback
+import collections
+import multiprocessing
 import Cryptodome.Random
 import Cryptodome.Hash.HMAC
 import Cryptodome.Cipher.AES
 from future.utils import iteritems
 from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
 from .work_spec import WorkSpec
 from .file_spec import FileSpec
@@ -192,8 +195,8 @@ def make_pool_file_catalog(jobspec_list):
     return xmlStr
 
 
-# calculate adler32
-def calc_adler32(file_name):
+# calculate adler32 without cache
+def _calc_adler32(file_name):
     val = 1
     blockSize = 32 * 1024 * 1024
     with open(file_name, 'rb') as fp:
@@ -207,6 +210,117 @@ def calc_adler32(file_name):
     return hex(val)[2:10].zfill(8).lower()
 
 
+# checksums shared by all threads. (path, inode, size, mtime): checksum
+_adler32_cache = collections.OrderedDict()
+_adler32_cache_lock = threading.Lock()
+_adler32_cache_size = 100000
+
+# process pool to calculate checksums of large files
+_adler32_pool = None
+_adler32_pool_lock = threading.Lock()
+
+
+# get key of checksum cache
+def _get_adler32_cache_key(file_name, stat_info):
+    return os.path.abspath(file_name), stat_info.st_ino, stat_info.st_size, stat_info.st_mtime
+
+
+# look up checksum cache
+def _get_cached_adler32(cache_key):
+    with _adler32_cache_lock:
+        return _adler32_cache.get(cache_key)
+
+
+# add checksum to cache
+def _set_cached_adler32(cache_key, checksum):
+    with _adler32_cache_lock:
+        _adler32_cache[cache_key] = checksum
+        while len(_adler32_cache) > _adler32_cache_size:
+            _adler32_cache.popitem(last=False)
+
+
+# get process pool to calculate checksums. None if disabled
+def _get_adler32_pool():
+    global _adler32_pool
+    try:
+        nProcesses = harvester_config.master.nChecksumProcesses
+    except AttributeError:
+        nProcesses = 2
+    if nProcesses <= 0:
+        return None
+    with _adler32_pool_lock:
+        if _adler32_pool is None:
+            # use forkserver to avoid forking the multi-threaded daemon
+            try:
+                _adler32_pool = ProcessPoolExecutor(nProcesses,
+                                                    mp_context=multiprocessing.get_context('forkserver'))
+            except (TypeError, AttributeError, ValueError):
+                _adler32_pool = ProcessPoolExecutor(nProcesses)
+        return _adler32_pool
+
+
+# calculate adler32
+def calc_adler32(file_name):
+    cacheKey = _get_adler32_cache_key(file_name, os.stat(file_name))
+    checksum = _get_cached_adler32(cacheKey)
+    if checksum is None:
+        checksum = _calc_adler32(file_name)
+        _set_cached_adler32(cacheKey, checksum)
+    return checksum
+
+
+# calculate adler32 of files in parallel. Return a dict of {file name: checksum} which doesn't contain
+# files failed to be read. Files smaller than min_size_to_fork are calculated in the calling thread
+def calc_adler32_bulk(file_names, min_size_to_fork=64 * 1024 * 1024):
+    retMap = dict()
+    cacheKeyMap = dict()
+    largeFiles = []
+    for fileName in set(file_names):
+        try:
+            statInfo = os.stat(fileName)
+        except OSError:
+            continue
+        cacheKey = _get_adler32_cache_key(fileName, statInfo)
+        checksum = _get_cached_adler32(cacheKey)
+        if checksum is not None:
+            retMap[fileName] = checksum
+            continue
+        cacheKeyMap[fileName] = cacheKey
+        if statInfo.st_size >= min_size_to_fork:
+            largeFiles.append(fileName)
+    # submit large files to the pool
+    futureMap = dict()
+    pool = _get_adler32_pool() if len(largeFiles) > 0 else None
+    if pool is not None:
+        for fileName in largeFiles:
+            try:
+                futureMap[fileName] = pool.submit(_calc_adler32, fileName)
+            except Exception:
+                break
+    # small files and files failed to be submitted
+    for fileName in cacheKeyMap:
+        if fileName in futureMap:
+            continue
+        try:
+            retMap[fileName] = _calc_adler32(fileName)
+        except Exception:
+            pass
+    for fileName, future in iteritems(futureMap):
+        try:
+            retMap[fileName] = future.result()
+        except Exception:
+            # retry in the calling thread in case the pool is broken
+            try:
+                retMap[fileName] = _calc_adler32(fileName)
+            except Exception:
+                pass
+    # update cache
+    for fileName, cacheKey in iteritems(cacheKeyMap):
+        if fileName in retMap:
+            _set_cached_adler32(cacheKey, retMap[fileName])
+    return retMap
+
+
 # get output file report
 def get_output_file_report(jobspec):
     if jobspec.outputFilesToReport is not None:
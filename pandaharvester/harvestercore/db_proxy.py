@@ -126,6 +126,16 @@ class DBProxy(object):
                 # read to avoid database lock
                 self.cur.fetchone()
         self.lockDB = False
+        # max number of items in an IN clause for bulk operations
+        if hasattr(harvester_config.db, 'maxItemsInList'):
+            self.maxItemsInList = harvester_config.db.maxItemsInList
+        else:
+            self.maxItemsInList = 500
+        # max number of workers or jobs deleted in one transaction
+        if hasattr(harvester_config.db, 'deleteBatchSize'):
+            self.deleteBatchSize = harvester_config.db.deleteBatchSize
+        else:
+            self.deleteBatchSize = 100
         # using application side lock if DB doesn't have a mechanism for exclusive access
         if harvester_config.db.engine == 'mariadb':
             self.usingAppLock = False
@@ -311,6 +321,16 @@ class DBProxy(object):
                 conLock.release()
                 self.lockDB = False
 
+    # make an IN clause with bind variables
+    def make_in_clause(self, prefix, values):
+        varNames = []
+        varMap = dict()
+        for idx, value in enumerate(values):
+            varName = ':{0}{1}'.format(prefix, idx)
+            varNames.append(varName)
+            varMap[varName] = value
+        return '({0}) '.format(','.join(varNames)), varMap
+
     # type conversion
     def type_conversion(self, attr_type):
         # remove decorator
@@ -519,36 +539,25 @@ class DBProxy(object):
             # sql to insert a file
             sqlF = "INSERT INTO {0} ({1}) ".format(fileTableName, FileSpec.column_names())
             sqlF += FileSpec.bind_values_expression()
-            # sql to delete job
-            sqlDJ = "DELETE FROM {0} ".format(jobTableName)
-            sqlDJ += "WHERE PandaID=:PandaID "
-            # sql to delete files
-            sqlDF = "DELETE FROM {0} ".format(fileTableName)
-            sqlDF += "WHERE PandaID=:PandaID "
-            # sql to delete events
-            sqlDE = "DELETE FROM {0} ".format(eventTableName)
-            sqlDE += "WHERE PandaID=:PandaID "
-            # sql to delete relations
-            sqlDR = "DELETE FROM {0} ".format(jobWorkerTableName)
-            sqlDR += "WHERE PandaID=:PandaID "
+            # sql to check existing jobs
+            sqlC = "SELECT PandaID FROM {0} ".format(jobTableName)
+            sqlC += "WHERE PandaID IN "
+            # get jobs inserted before
+            existingIDs = []
+            pandaIDs = sorted(set([jobSpec.PandaID for jobSpec in jobspec_list]))
+            for idList in core_utils.create_shards(pandaIDs, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                self.execute(sqlC + sqlIn, varMap)
+                resC = self.cur.fetchall()
+                existingIDs += [pandaID for pandaID, in resC]
+            # delete them just in case
+            if existingIDs:
+                tmpLog.debug('delete {0} existing jobs'.format(len(existingIDs)))
+                self._delete_jobs_in_batch(existingIDs)
             # loop over all jobs
             varMapsJ = []
             varMapsF = []
             for jobSpec in jobspec_list:
-                # delete job just in case
-                varMap = dict()
-                varMap[':PandaID'] = jobSpec.PandaID
-                self.execute(sqlDJ, varMap)
-                iDel = self.cur.rowcount
-                if iDel > 0:
-                    # delete files
-                    self.execute(sqlDF, varMap)
-                    # delete events
-                    self.execute(sqlDE, varMap)
-                    # delete relations
-                    self.execute(sqlDR, varMap)
-                # commit
-                self.commit()
                 # insert job and files
                 varMap = jobSpec.values_list()
                 varMapsJ.append(varMap)
@@ -791,65 +800,84 @@ class DBProxy(object):
             # get logger
             tmpLog = core_utils.make_logger(_logger, method_name='fill_panda_queue_table')
             tmpLog.debug('start')
-            # get existing queues
-            sqlE = "SELECT queueName FROM {0} ".format(pandaQueueTableName)
+            limitAttrs = ['nQueueLimitJob', 'nQueueLimitWorker', 'maxWorkers',
+                          'nQueueLimitJobRatio', 'nQueueLimitJobMax', 'nQueueLimitJobMin',
+                          'nQueueLimitWorkerRatio', 'nQueueLimitWorkerMax', 'nQueueLimitWorkerMin']
+            # get existing queues with their limits
+            sqlE = "SELECT queueName,{0} FROM {1} ".format(','.join(limitAttrs), pandaQueueTableName)
             varMap = dict()
             self.execute(sqlE, varMap)
             resE = self.cur.fetchall()
-            for queueName, in resE:
-                # delete if not listed in cfg
-                if queueName not in panda_queue_list:
-                    sqlD = "DELETE FROM {0} ".format(pandaQueueTableName)
-                    sqlD += "WHERE queueName=:queueName "
-                    varMap = dict()
-                    varMap[':queueName'] = queueName
-                    self.execute(sqlD, varMap)
-                    # commit
-                    self.commit()
-            # loop over queues
+            existingMap = dict()
+            for res in resE:
+                existingMap.setdefault(res[0], [])
+                existingMap[res[0]].append(dict(zip(limitAttrs, res[1:])))
+            # delete queues not listed in cfg
+            queuesToDelete = [queueName for queueName in existingMap if queueName not in panda_queue_list]
+            sqlD = "DELETE FROM {0} ".format(pandaQueueTableName)
+            sqlD += "WHERE queueName IN "
+            for tmpQueues in core_utils.create_shards(queuesToDelete, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('queueName', tmpQueues)
+                self.execute(sqlD + sqlIn, varMap)
+            # make queues to update or insert, grouped by attributes to use executemany
+            toUpdate = dict()
+            toInsert = dict()
             for queueName in panda_queue_list:
                 queueConfig = queue_config_mapper.get_queue(queueName)
-                if queueConfig is not None:
-                    # check if already exist
-                    sqlC = "SELECT * FROM {0} ".format(pandaQueueTableName)
-                    sqlC += "WHERE queueName=:queueName "
+                if queueConfig is None:
+                    continue
+                if queueName in existingMap:
+                    # update limits if changed
+                    newLimits = dict()
+                    for qAttr in limitAttrs:
+                        if hasattr(queueConfig, qAttr):
+                            newLimits[qAttr] = getattr(queueConfig, qAttr)
+                    if len(newLimits) == 0:
+                        continue
+                    toSkip = True
+                    for oldLimits in existingMap[queueName]:
+                        for qAttr, qVal in iteritems(newLimits):
+                            if oldLimits[qAttr] != qVal:
+                                toSkip = False
+                                break
+                    if toSkip:
+                        continue
                     varMap = dict()
+                    for qAttr, qVal in iteritems(newLimits):
+                        varMap[':{0}'.format(qAttr)] = qVal
                     varMap[':queueName'] = queueName
-                    self.execute(sqlC, varMap)
-                    resC = self.cur.fetchone()
-                    if resC is not None:
-                        # update limits just in case
-                        varMap = dict()
-                        sqlU = "UPDATE {0} SET ".format(pandaQueueTableName)
-                        for qAttr in ['nQueueLimitJob', 'nQueueLimitWorker', 'maxWorkers',
-                                      'nQueueLimitJobRatio', 'nQueueLimitJobMax', 'nQueueLimitJobMin',
-                                      'nQueueLimitWorkerRatio', 'nQueueLimitWorkerMax', 'nQueueLimitWorkerMin']:
-                            if hasattr(queueConfig, qAttr):
-                                sqlU += '{0}=:{0},'.format(qAttr)
-                                varMap[':{0}'.format(qAttr)] = getattr(queueConfig, qAttr)
-                        if len(varMap) == 0:
-                            continue
-                        sqlU = sqlU[:-1]
-                        sqlU += " WHERE queueName=:queueName "
-                        varMap[':queueName'] = queueName
-                        self.execute(sqlU, varMap)
-                    else:
-                        # insert queue
-                        varMap = dict()
-                        varMap[':queueName'] = queueName
-                        attrName_list = []
-                        tmpKey_list = []
-                        for attrName in PandaQueueSpec.column_names().split(','):
-                            if hasattr(queueConfig, attrName):
-                                tmpKey = ':{0}'.format(attrName)
-                                attrName_list.append(attrName)
-                                tmpKey_list.append(tmpKey)
-                                varMap[tmpKey] = getattr(queueConfig, attrName)
-                        sqlP = "INSERT IGNORE INTO {0} ({1}) ".format(pandaQueueTableName, ','.join(attrName_list))
-                        sqlS = "VALUES ({0}) ".format(','.join(tmpKey_list))
-                        self.execute(sqlP + sqlS, varMap)
-                    # commit
-                    self.commit()
+                    toUpdate.setdefault(tuple(sorted(newLimits)), [])
+                    toUpdate[tuple(sorted(newLimits))].append(varMap)
+                else:
+                    # insert queue
+                    varMap = dict()
+                    varMap[':queueName'] = queueName
+                    attrName_list = []
+                    for attrName in PandaQueueSpec.column_names().split(','):
+                        if hasattr(queueConfig, attrName):
+                            attrName_list.append(attrName)
+                            varMap[':{0}'.format(attrName)] = getattr(queueConfig, attrName)
+                    toInsert.setdefault(tuple(attrName_list), [])
+                    toInsert[tuple(attrName_list)].append(varMap)
+            # update
+            nUpdate = 0
+            for attrName_list, varMaps in iteritems(toUpdate):
+                sqlU = "UPDATE {0} SET ".format(pandaQueueTableName)
+                sqlU += ','.join(['{0}=:{0}'.format(qAttr) for qAttr in attrName_list])
+                sqlU += " WHERE queueName=:queueName "
+                self.executemany(sqlU, varMaps)
+                nUpdate += len(varMaps)
+            # insert
+            nInsert = 0
+            for attrName_list, varMaps in iteritems(toInsert):
+                sqlP = "INSERT IGNORE INTO {0} ({1}) ".format(pandaQueueTableName, ','.join(attrName_list))
+                sqlS = "VALUES ({0}) ".format(','.join([':{0}'.format(attrName) for attrName in attrName_list]))
+                self.executemany(sqlP + sqlS, varMaps)
+                nInsert += len(varMaps)
+            # commit
+            self.commit()
+            tmpLog.debug('deleted {0} updated {1} inserted {2} queues'.format(len(queuesToDelete), nUpdate,
+                                                                            nInsert))
             tmpLog.debug('done')
             # return
             return True
@@ -959,30 +987,37 @@ class DBProxy(object):
             sql += "AND ((propagatorTime<:lockTimeLimit AND propagatorLock IS NOT NULL) "
             sql += "OR (propagatorTime<:updateTimeLimit AND propagatorLock IS NULL)) "
             sql += "ORDER BY propagatorTime LIMIT {0} ".format(max_jobs)
-            # sql to get jobs
-            sqlJ = "SELECT {0} FROM {1} ".format(JobSpec.column_names(), jobTableName)
-            sqlJ += "WHERE PandaID=:PandaID "
-            # sql to lock job
+            # sql to count events
+            sqlC = "SELECT PandaID,COUNT(*) cnt FROM {0} ".format(eventTableName)
+            sqlC += "WHERE subStatus IN (:statusFinished,:statusFailed) AND PandaID IN "
+            sqlCG = "GROUP BY PandaID "
+            # sql to lock jobs
             sqlL = "UPDATE {0} SET propagatorTime=:timeNow,propagatorLock=:lockedBy ".format(jobTableName)
-            sqlL += "WHERE PandaID=:PandaID "
-            sqlL += "AND ((propagatorTime<:lockTimeLimit AND propagatorLock IS NOT NULL) "
+            sqlL += "WHERE ((propagatorTime<:lockTimeLimit AND propagatorLock IS NOT NULL) "
             sqlL += "OR (propagatorTime<:updateTimeLimit AND propagatorLock IS NULL)) "
+            sqlL += "AND PandaID IN "
+            # sql to get jobs
+            sqlJ = "SELECT {0} FROM {1} ".format(JobSpec.column_names(), jobTableName)
+            sqlJ += "WHERE propagatorTime=:timeNow AND propagatorLock=:lockedBy AND PandaID IN "
             # sql to get events
             sqlE = "SELECT {0} FROM {1} ".format(EventSpec.column_names(), eventTableName)
-            sqlE += "WHERE PandaID=:PandaID AND subStatus IN (:statusFinished,:statusFailed) "
+            sqlE += "WHERE subStatus IN (:statusFinished,:statusFailed) AND PandaID IN "
             # sql to get file
             sqlF = "SELECT DISTINCT {0} FROM {1} f, {2} e, {1} f2 ".format(FileSpec.column_names('f2'),
                                                                            fileTableName,
                                                                            eventTableName)
-            sqlF += "WHERE e.PandaID=:PandaID AND e.fileID=f.fileID "
+            sqlF += "WHERE e.fileID=f.fileID "
             sqlF += "AND e.subStatus IN (:statusFinished,:statusFailed) "
             sqlF += "AND f2.fileID=f.zipFileID "
+            sqlF += "AND e.PandaID IN "
             # sql to get fileID of zip
             sqlZ = "SELECT e.fileID,f.zipFileID FROM {0} f, {1} e ".format(fileTableName, eventTableName)
-            sqlZ += "WHERE e.PandaID=:PandaID AND e.fileID=f.fileID "
+            sqlZ += "WHERE e.fileID=f.fileID "
             sqlZ += "AND e.subStatus IN (:statusFinished,:statusFailed) "
+            sqlZ += "AND e.PandaID IN "
             # get jobs
-            timeNow = datetime.datetime.utcnow()
+            # truncate to seconds since timeNow is used as a lock token which must survive the DB round trip
+            timeNow = datetime.datetime.utcnow().replace(microsecond=0)
             lockTimeLimit = timeNow - datetime.timedelta(seconds=lock_interval)
             updateTimeLimit = timeNow - datetime.timedelta(seconds=update_interval)
             varMap = dict()
@@ -999,76 +1034,83 @@ class DBProxy(object):
             random.shuffle(subPandaIDs)
             pandaIDs = pandaIDs[:nJobs] + subPandaIDs
             pandaIDs = pandaIDs[:max_jobs]
-            jobSpecList = []
+            statusMap = dict()
+            statusMap[':statusFinished'] = 'finished'
+            statusMap[':statusFailed'] = 'failed'
+            # count events
+            nEventsMap = dict()
+            for idList in core_utils.create_shards(pandaIDs, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                varMap.update(statusMap)
+                self.execute(sqlC + sqlIn + sqlCG, varMap)
+                for pandaID, nEvents in self.cur.fetchall():
+                    nEventsMap[pandaID] = nEvents
+            # avoid a bulk update for many jobs with too many events
             iEvents = 0
+            idsToLock = []
             for pandaID in pandaIDs:
-                # avoid a bulk update for many jobs with too many events
                 if iEvents > 10000:
                     break
-                # lock job
-                varMap = dict()
-                varMap[':PandaID'] = pandaID
+                idsToLock.append(pandaID)
+                iEvents += nEventsMap.get(pandaID, 0)
+            # lock jobs with one conditional update per chunk
+            for idList in core_utils.create_shards(idsToLock, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
                 varMap[':timeNow'] = timeNow
                 varMap[':lockedBy'] = locked_by
                 varMap[':lockTimeLimit'] = lockTimeLimit
                 varMap[':updateTimeLimit'] = updateTimeLimit
-                self.execute(sqlL, varMap)
-                nRow = self.cur.rowcount
-                # commit
-                self.commit()
-                if nRow > 0:
-                    # read job
-                    varMap = dict()
-                    varMap[':PandaID'] = pandaID
-                    self.execute(sqlJ, varMap)
-                    res = self.cur.fetchone()
+                self.execute(sqlL + sqlIn, varMap)
+            # commit
+            self.commit()
+            # read jobs actually locked
+            jobSpecMap = dict()
+            for idList in core_utils.create_shards(idsToLock, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                varMap[':timeNow'] = timeNow
+                varMap[':lockedBy'] = locked_by
+                self.execute(sqlJ + sqlIn, varMap)
+                resJs = self.cur.fetchall()
+                for res in resJs:
                     # make job
                     jobSpec = JobSpec()
                     jobSpec.pack(res)
                     jobSpec.propagatorLock = locked_by
-                    zipFiles = {}
-                    zipIdMap = dict()
-                    # get zipIDs
-                    varMap = dict()
-                    varMap[':PandaID'] = jobSpec.PandaID
-                    varMap[':statusFinished'] = 'finished'
-                    varMap[':statusFailed'] = 'failed'
-                    self.execute(sqlZ, varMap)
-                    resZ = self.cur.fetchall()
-                    for tmpFileID, tmpZipFileID in resZ:
-                        zipIdMap[tmpFileID] = tmpZipFileID
-                    # get zip files
-                    varMap = dict()
-                    varMap[':PandaID'] = jobSpec.PandaID
-                    varMap[':statusFinished'] = 'finished'
-                    varMap[':statusFailed'] = 'failed'
-                    self.execute(sqlF, varMap)
-                    resFs = self.cur.fetchall()
-                    for resF in resFs:
-                        fileSpec = FileSpec()
-                        fileSpec.pack(resF)
-                        zipFiles[fileSpec.fileID] = fileSpec
-                    # read events
-                    varMap = dict()
-                    varMap[':PandaID'] = jobSpec.PandaID
-                    varMap[':statusFinished'] = 'finished'
-                    varMap[':statusFailed'] = 'failed'
-                    self.execute(sqlE, varMap)
-                    resEs = self.cur.fetchall()
-                    for resE in resEs:
-                        eventSpec = EventSpec()
-                        eventSpec.pack(resE)
-                        zipFileSpec = None
-                        # get associated zip file if any
-                        if eventSpec.fileID is not None:
-                            if eventSpec.fileID not in zipIdMap:
-                                continue
-                            zipFileID = zipIdMap[eventSpec.fileID]
-                            if zipFileID is not None:
-                                zipFileSpec = zipFiles[zipFileID]
-                        jobSpec.add_event(eventSpec, zipFileSpec)
-                        iEvents += 1
-                    jobSpecList.append(jobSpec)
+                    jobSpecMap[jobSpec.PandaID] = jobSpec
+            lockedIDs = [pandaID for pandaID in idsToLock if pandaID in jobSpecMap]
+            # get zipIDs, zip files, and events
+            zipIdMap = dict()
+            zipFiles = dict()
+            for idList in core_utils.create_shards(lockedIDs, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                varMap.update(statusMap)
+                self.execute(sqlZ + sqlIn, varMap)
+                resZ = self.cur.fetchall()
+                for tmpFileID, tmpZipFileID in resZ:
+                    zipIdMap[tmpFileID] = tmpZipFileID
+                self.execute(sqlF + sqlIn, varMap)
+                resFs = self.cur.fetchall()
+                for resF in resFs:
+                    fileSpec = FileSpec()
+                    fileSpec.pack(resF)
+                    zipFiles[fileSpec.fileID] = fileSpec
+                self.execute(sqlE + sqlIn, varMap)
+                resEs = self.cur.fetchall()
+                for resE in resEs:
+                    eventSpec = EventSpec()
+                    eventSpec.pack(resE)
+                    zipFileSpec = None
+                    # get associated zip file if any
+                    if eventSpec.fileID is not None:
+                        if eventSpec.fileID not in zipIdMap:
+                            continue
+                        zipFileID = zipIdMap[eventSpec.fileID]
+                        if zipFileID is not None:
+                            zipFileSpec = zipFiles[zipFileID]
+                    jobSpecMap[eventSpec.PandaID].add_event(eventSpec, zipFileSpec)
+            # commit
+            self.commit()
+            jobSpecList = [jobSpecMap[pandaID] for pandaID in lockedIDs]
             tmpLog.debug('got {0} jobs'.format(len(jobSpecList)))
             return jobSpecList
         except Exception:
@@ -1382,23 +1424,6 @@ class DBProxy(object):
             sqlS = "SELECT siteName FROM {0} ".format(pandaQueueTableName)
             sqlS += "WHERE submitTime IS NULL OR submitTime<:timeLimit "
             sqlS += "ORDER BY submitTime "
-            # sql to get queues
-            sqlQ = "SELECT queueName,resourceType,nNewWorkers FROM {0} ".format(pandaQueueTableName)
-            sqlQ += "WHERE siteName=:siteName "
-            # sql to get orphaned workers
-            sqlO = "SELECT workerID FROM {0} ".format(workTableName)
-            sqlO += "WHERE computingSite=:computingSite "
-            sqlO += "AND status=:status AND modificationTime<:timeLimit "
-            # sql to delete orphaned workers. Not to use bulk delete to avoid deadlock with 0-record deletion
-            sqlD = "DELETE FROM {0} ".format(workTableName)
-            sqlD += "WHERE workerID=:workerID "
-            # sql to count nQueue
-            sqlN = "SELECT status,COUNT(*) cnt FROM {0} ".format(workTableName)
-            sqlN += "WHERE computingSite=:computingSite "
-            # sql to count re-fillers
-            sqlR = "SELECT COUNT(*) cnt FROM {0} ".format(workTableName)
-            sqlR += "WHERE computingSite=:computingSite AND status=:status "
-            sqlR += "AND nJobsToReFill IS NOT NULL AND nJobsToReFill>0 "
             # sql to update timestamp
             sqlU = "UPDATE {0} SET submitTime=:submitTime ".format(pandaQueueTableName)
             sqlU += "WHERE siteName=:siteName "
@@ -1423,66 +1448,7 @@ class DBProxy(object):
                 if nRow == 0:
                     continue
                 # get queues
-                varMap = dict()
-                varMap[':siteName'] = siteName
-                self.execute(sqlQ, varMap)
-                resQ = self.cur.fetchall()
-                for queueName, resourceType, nNewWorkers in resQ:
-                    # delete orphaned workers
-                    varMap = dict()
-                    varMap[':computingSite'] = queueName
-                    varMap[':status'] = WorkSpec.ST_pending
-                    varMap[':timeLimit'] = timeNow - datetime.timedelta(seconds=lock_interval)
-                    sqlO_tmp = sqlO
-                    if resourceType != 'ANY':
-                        varMap[':resourceType'] = resourceType
-                        sqlO_tmp += "AND resourceType=:resourceType "
-                    self.execute(sqlO_tmp, varMap)
-                    resO = self.cur.fetchall()
-                    for tmpWorkerID, in resO:
-                        varMap = dict()
-                        varMap[':workerID'] = tmpWorkerID
-                        self.execute(sqlD, varMap)
-                        # commit
-                        self.commit()
-                    # count nQueue
-                    varMap = dict()
-                    varMap[':computingSite'] = queueName
-                    varMap[':resourceType'] = resourceType
-                    sqlN_tmp = sqlN
-                    if resourceType != 'ANY':
-                        varMap[':resourceType'] = resourceType
-                        sqlN_tmp += "AND resourceType=:resourceType "
-                    sqlN_tmp += "GROUP BY status "
-                    self.execute(sqlN_tmp, varMap)
-                    nQueue = 0
-                    nReady = 0
-                    nRunning = 0
-                    for workerStatus, tmpNum in self.cur.fetchall():
-                        if workerStatus in [WorkSpec.ST_submitted, WorkSpec.ST_pending, WorkSpec.ST_idle]:
-                            nQueue += tmpNum
-                        elif workerStatus in [WorkSpec.ST_ready]:
-                            nReady += tmpNum
-                        elif workerStatus in [WorkSpec.ST_running]:
-                            nRunning += tmpNum
-                    # count nFillers
-                    varMap = dict()
-                    varMap[':computingSite'] = queueName
-                    varMap[':status'] = WorkSpec.ST_running
-                    sqlR_tmp = sqlR
-                    if resourceType != 'ANY':
-                        varMap[':resourceType'] = resourceType
-                        sqlR_tmp += "AND resourceType=:resourceType "
-                    self.execute(sqlR_tmp, varMap)
-                    nReFill, = self.cur.fetchone()
-                    nReady += nReFill
-                    # add
-                    retMap.setdefault(queueName, {})
-                    retMap[queueName][resourceType] = {'nReady': nReady,
-                                                       'nRunning': nRunning,
-                                                       'nQueue': nQueue,
-                                                       'nNewWorkers': nNewWorkers}
-                    resourceMap[resourceType] = queueName
+                retMap, resourceMap = self._get_queues_of_site(siteName, timeNow, lock_interval)
                 # enough queues
                 if len(retMap) >= 0:
                     break
@@ -1498,6 +1464,138 @@ class DBProxy(object):
             # return
             return {}, None, {}
 
+    # get multiple sites to submit workers
+    def get_sites_to_submit(self, n_sites, lookup_interval, lock_interval):
+        try:
+            # get logger
+            tmpLog = core_utils.make_logger(_logger, method_name='get_sites_to_submit')
+            tmpLog.debug('start n_sites={0}'.format(n_sites))
+            retList = []
+            # sql to get sites
+            sqlS = "SELECT siteName,MIN(submitTime) minTime FROM {0} ".format(pandaQueueTableName)
+            sqlS += "WHERE submitTime IS NULL OR submitTime<:timeLimit "
+            sqlS += "GROUP BY siteName ORDER BY minTime LIMIT {0} ".format(int(n_sites))
+            # sql to update timestamp
+            sqlU = "UPDATE {0} SET submitTime=:submitTime ".format(pandaQueueTableName)
+            sqlU += "WHERE siteName=:siteName "
+            sqlU += "AND (submitTime IS NULL OR submitTime<:timeLimit) "
+            # get sites
+            timeNow = datetime.datetime.utcnow()
+            timeLimit = timeNow - datetime.timedelta(seconds=lookup_interval)
+            varMap = dict()
+            varMap[':timeLimit'] = timeLimit
+            self.execute(sqlS, varMap)
+            resS = self.cur.fetchall()
+            # lock sites in one transaction
+            siteNames = []
+            for siteName, minTime in resS:
+                varMap = dict()
+                varMap[':siteName'] = siteName
+                varMap[':submitTime'] = timeNow
+                varMap[':timeLimit'] = timeLimit
+                self.execute(sqlU, varMap)
+                if self.cur.rowcount > 0:
+                    siteNames.append(siteName)
+            # commit
+            self.commit()
+            # get queues
+            for siteName in siteNames:
+                retMap, resourceMap = self._get_queues_of_site(siteName, timeNow, lock_interval)
+                retList.append((retMap, siteName, resourceMap))
+            tmpLog.debug('got {0} sites {1}'.format(len(siteNames), ','.join(siteNames)))
+            return retList
+        except Exception:
+            # roll back
+            self.rollback()
+            # dump error
+            core_utils.dump_error_message(_logger)
+            # return
+            return []
+
+    # get queues and number of workers for a site locked to submit workers
+    def _get_queues_of_site(self, site_name, time_now, lock_interval):
+        retMap = dict()
+        resourceMap = dict()
+        # sql to get queues
+        sqlQ = "SELECT queueName,resourceType,nNewWorkers FROM {0} ".format(pandaQueueTableName)
+        sqlQ += "WHERE siteName=:siteName "
+        # sql to get orphaned workers
+        sqlO = "SELECT workerID FROM {0} ".format(workTableName)
+        sqlO += "WHERE computingSite=:computingSite "
+        sqlO += "AND status=:status AND modificationTime<:timeLimit "
+        # sql to delete orphaned workers. Not to use bulk delete to avoid deadlock with 0-record deletion
+        sqlD = "DELETE FROM {0} ".format(workTableName)
+        sqlD += "WHERE workerID=:workerID "
+        # sql to count nQueue
+        sqlN = "SELECT status,COUNT(*) cnt FROM {0} ".format(workTableName)
+        sqlN += "WHERE computingSite=:computingSite "
+        # sql to count re-fillers
+        sqlR = "SELECT COUNT(*) cnt FROM {0} ".format(workTableName)
+        sqlR += "WHERE computingSite=:computingSite AND status=:status "
+        sqlR += "AND nJobsToReFill IS NOT NULL AND nJobsToReFill>0 "
+        # get queues
+        varMap = dict()
+        varMap[':siteName'] = site_name
+        self.execute(sqlQ, varMap)
+        resQ = self.cur.fetchall()
+        for queueName, resourceType, nNewWorkers in resQ:
+            # delete orphaned workers
+            varMap = dict()
+            varMap[':computingSite'] = queueName
+            varMap[':status'] = WorkSpec.ST_pending
+            varMap[':timeLimit'] = time_now - datetime.timedelta(seconds=lock_interval)
+            sqlO_tmp = sqlO
+            if resourceType != 'ANY':
+                varMap[':resourceType'] = resourceType
+                sqlO_tmp += "AND resourceType=:resourceType "
+            self.execute(sqlO_tmp, varMap)
+            resO = self.cur.fetchall()
+            for tmpWorkerID, in resO:
+                varMap = dict()
+                varMap[':workerID'] = tmpWorkerID
+                self.execute(sqlD, varMap)
+                # commit
+                self.commit()
+            # count nQueue
+            varMap = dict()
+            varMap[':computingSite'] = queueName
+            varMap[':resourceType'] = resourceType
+            sqlN_tmp = sqlN
+            if resourceType != 'ANY':
+                varMap[':resourceType'] = resourceType
+                sqlN_tmp += "AND resourceType=:resourceType "
+            sqlN_tmp += "GROUP BY status "
+            self.execute(sqlN_tmp, varMap)
+            nQueue = 0
+            nReady = 0
+            nRunning = 0
+            for workerStatus, tmpNum in self.cur.fetchall():
+                if workerStatus in [WorkSpec.ST_submitted, WorkSpec.ST_pending, WorkSpec.ST_idle]:
+                    nQueue += tmpNum
+                elif workerStatus in [WorkSpec.ST_ready]:
+                    nReady += tmpNum
+                elif workerStatus in [WorkSpec.ST_running]:
+                    nRunning += tmpNum
+            # count nFillers
+            varMap = dict()
+            varMap[':computingSite'] = queueName
+            varMap[':status'] = WorkSpec.ST_running
+            sqlR_tmp = sqlR
+            if resourceType != 'ANY':
+                varMap[':resourceType'] = resourceType
+                sqlR_tmp += "AND resourceType=:resourceType "
+            self.execute(sqlR_tmp, varMap)
+            nReFill, = self.cur.fetchone()
+            nReady += nReFill
+            # add
+            retMap.setdefault(queueName, {})
+            retMap[queueName][resourceType] = {'nReady': nReady,
+                                               'nRunning': nRunning,
+                                               'nQueue': nQueue,
+                                               'nNewWorkers': nNewWorkers}
+            resourceMap[resourceType] = queueName
+        return retMap, resourceMap
+
     # get job chunks to make workers
     def get_job_chunks_for_workers(self, queue_name, n_workers, n_ready, n_jobs_per_worker, n_workers_per_job,
                                    use_job_late_binding, check_interval, lock_interval, locked_by,
@@ -1828,6 +1926,197 @@ class DBProxy(object):
             # return
             return {}
 
+    # get workers to update in bulk. Only workers in worker_ids are considered if it is given
+    def get_workers_to_update_bulk(self, max_workers, check_interval, lock_interval, locked_by, worker_ids=None):
+        try:
+            # get logger
+            tmpLog = core_utils.make_logger(_logger, method_name='get_workers_to_update_bulk')
+            tmpLog.debug('start')
+            # sql to get workers
+            sqlW = "SELECT workerID,configID,mapType FROM {0} ".format(workTableName)
+            sqlW += "WHERE status IN (:st_submitted,:st_running,:st_idle) "
+            sqlW += "AND ((modificationTime<:lockTimeLimit AND lockedBy IS NOT NULL) "
+            sqlW += "OR (modificationTime<:checkTimeLimit AND lockedBy IS NULL)) "
+            sqlO = "ORDER BY modificationTime LIMIT {0} ".format(max_workers)
+            # sql to get associated workerIDs
+            sqlA = "SELECT s.workerID,t.workerID FROM {0} t, {0} s, {1} w ".format(jobWorkerTableName,
+                                                                                    workTableName)
+            sqlA += "WHERE s.PandaID=t.PandaID "
+            sqlA += "AND w.workerID=t.workerID AND w.status IN (:st_submitted,:st_running,:st_idle) "
+            sqlA += "AND s.workerID IN "
+            # sql to update modificationTime
+            sqlLM = "UPDATE {0} SET modificationTime=:timeNow ".format(workTableName)
+            sqlLM += "WHERE workerID IN "
+            # sql to lock workers with time check
+            sqlLT = "UPDATE {0} SET modificationTime=:timeNow,lockedBy=:lockedBy ".format(workTableName)
+            sqlLT += "WHERE status IN (:st_submitted,:st_running,:st_idle) "
+            sqlLT += "AND ((modificationTime<:lockTimeLimit AND lockedBy IS NOT NULL) "
+            sqlLT += "OR (modificationTime<:checkTimeLimit AND lockedBy IS NULL)) "
+            sqlLT += "AND workerID IN "
+            # sql to get locked workerIDs
+            sqlCL = "SELECT workerID FROM {0} ".format(workTableName)
+            sqlCL += "WHERE modificationTime=:timeNow AND lockedBy=:lockedBy "
+            sqlCL += "AND workerID IN "
+            # sql to lock workers without time check
+            sqlL = "UPDATE {0} SET modificationTime=:timeNow,lockedBy=:lockedBy ".format(workTableName)
+            sqlL += "WHERE workerID IN "
+            # sql to get workers
+            sqlG = "SELECT {0} FROM {1} ".format(WorkSpec.column_names(), workTableName)
+            sqlG += "WHERE workerID IN "
+            # sql to get associated PandaIDs
+            sqlP = "SELECT workerID,PandaID FROM {0} ".format(jobWorkerTableName)
+            sqlP += "WHERE workerID IN "
+            # truncate to seconds since timeNow is used as a lock token which must survive the DB round trip
+            timeNow = datetime.datetime.utcnow().replace(microsecond=0)
+            lockTimeLimit = timeNow - datetime.timedelta(seconds=lock_interval)
+            checkTimeLimit = timeNow - datetime.timedelta(seconds=check_interval)
+            statusMap = dict()
+            statusMap[':st_submitted'] = WorkSpec.ST_submitted
+            statusMap[':st_running'] = WorkSpec.ST_running
+            statusMap[':st_idle'] = WorkSpec.ST_idle
+            # get workerIDs
+            varMap = dict()
+            varMap.update(statusMap)
+            varMap[':lockTimeLimit'] = lockTimeLimit
+            varMap[':checkTimeLimit'] = checkTimeLimit
+            if worker_ids is None:
+                self.execute(sqlW + sqlO, varMap)
+                resW = self.cur.fetchall()
+            else:
+                resW = []
+                for idList in core_utils.create_shards(list(worker_ids), self.maxItemsInList):
+                    sqlIn, tmpVarMap = self.make_in_clause('workerID', idList)
+                    tmpVarMap.update(varMap)
+                    self.execute(sqlW + "AND workerID IN " + sqlIn + sqlO, tmpVarMap)
+                    resW += self.cur.fetchall()
+            tmpWorkers = dict()
+            for workerID, configID, mapType in resW:
+                # ignore configID
+                if not core_utils.dynamic_plugin_change():
+                    configID = None
+                tmpWorkers[workerID] = (configID, mapType)
+            # get associated workerIDs
+            workerIDtoScanMap = dict()
+            for workerID in tmpWorkers:
+                # add original ID just in case since no relation when job is not yet bound
+                workerIDtoScanMap[workerID] = {workerID}
+            for idList in core_utils.create_shards(list(tmpWorkers), self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                varMap.update(statusMap)
+                self.execute(sqlA + sqlIn, varMap)
+                resA = self.cur.fetchall()
+                for workerID, tmpWorkID in resA:
+                    workerIDtoScanMap[workerID].add(tmpWorkID)
+            # decide which worker represents each worker set
+            scannedIDs = set()
+            idsToTouch = []
+            idsToLock = []
+            for workerID in sorted(tmpWorkers):
+                configID, mapType = tmpWorkers[workerID]
+                # skip
+                if workerID in scannedIDs:
+                    continue
+                workerIDtoScan = workerIDtoScanMap[workerID]
+                # use only the largest worker to avoid updating the same worker set concurrently
+                if mapType == WorkSpec.MT_MultiWorkers:
+                    if workerID != min(workerIDtoScan):
+                        idsToTouch.append(workerID)
+                        continue
+                scannedIDs.update(workerIDtoScan)
+                idsToLock.append(workerID)
+            # update modification time
+            for idList in core_utils.create_shards(idsToTouch, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                varMap[':timeNow'] = timeNow
+                self.execute(sqlLM + sqlIn, varMap)
+            # lock workers with one conditional update per chunk
+            lockedIDs = set()
+            for idList in core_utils.create_shards(idsToLock, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                varMap.update(statusMap)
+                varMap[':timeNow'] = timeNow
+                varMap[':lockedBy'] = locked_by
+                varMap[':lockTimeLimit'] = lockTimeLimit
+                varMap[':checkTimeLimit'] = checkTimeLimit
+                self.execute(sqlLT + sqlIn, varMap)
+                # get workers actually locked
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                varMap[':timeNow'] = timeNow
+                varMap[':lockedBy'] = locked_by
+                self.execute(sqlCL + sqlIn, varMap)
+                resCL = self.cur.fetchall()
+                for tmpWorkID, in resCL:
+                    lockedIDs.add(tmpWorkID)
+            # commit
+            self.commit()
+            # lock associated workers without time check
+            idsToGet = set()
+            idsToLockWithoutCheck = []
+            for workerID in idsToLock:
+                if workerID not in lockedIDs:
+                    continue
+                for tmpWorkID in workerIDtoScanMap[workerID]:
+                    idsToGet.add(tmpWorkID)
+                    if tmpWorkID != workerID:
+                        idsToLockWithoutCheck.append(tmpWorkID)
+            for idList in core_utils.create_shards(idsToLockWithoutCheck, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                varMap[':timeNow'] = timeNow
+                varMap[':lockedBy'] = locked_by
+                self.execute(sqlL + sqlIn, varMap)
+            # get workers
+            workSpecMap = dict()
+            for idList in core_utils.create_shards(sorted(idsToGet), self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                self.execute(sqlG + sqlIn, varMap)
+                resG = self.cur.fetchall()
+                for tmpRes in resG:
+                    workSpec = WorkSpec()
+                    workSpec.pack(tmpRes)
+                    workSpec.pandaid_list = []
+                    workSpec.lockedBy = locked_by
+                    workSpec.force_not_update('lockedBy')
+                    workSpecMap[workSpec.workerID] = workSpec
+                # get associated PandaIDs
+                self.execute(sqlP + sqlIn, varMap)
+                resP = self.cur.fetchall()
+                for tmpWorkID, tmpPandaID in resP:
+                    if tmpWorkID in workSpecMap:
+                        workSpecMap[tmpWorkID].pandaid_list.append(tmpPandaID)
+            # commit
+            self.commit()
+            # make worker sets
+            retVal = {}
+            for workerID in idsToLock:
+                if workerID not in lockedIDs:
+                    continue
+                configID, mapType = tmpWorkers[workerID]
+                queueName = None
+                workersList = []
+                for tmpWorkID in sorted(workerIDtoScanMap[workerID]):
+                    if tmpWorkID not in workSpecMap:
+                        continue
+                    workSpec = workSpecMap[tmpWorkID]
+                    if queueName is None:
+                        queueName = workSpec.computingSite
+                    if len(workSpec.pandaid_list) > 0:
+                        workSpec.nJobs = len(workSpec.pandaid_list)
+                    workersList.append(workSpec)
+                # add
+                if queueName is not None:
+                    retVal.setdefault(queueName, dict())
+                    retVal[queueName].setdefault(configID, [])
+                    retVal[queueName][configID].append(workersList)
+            tmpLog.debug('locked {0} worker sets out of {1} candidates'.format(len(lockedIDs), len(tmpWorkers)))
+            return retVal
+        except Exception:
+            # roll back
+            self.rollback()
+            # dump error
+            core_utils.dump_error_message(_logger)
+            # return
+            return {}
+
     # get workers to propagate
     def get_workers_to_propagate(self, max_workers, check_interval):
         try:
@@ -1989,13 +2278,6 @@ class DBProxy(object):
             # sql to insert file
             sqlFI = "INSERT INTO {0} ({1}) ".format(fileTableName, FileSpec.column_names())
             sqlFI += FileSpec.bind_values_expression()
-            # sql to get pending files
-            sqlFP = "SELECT fileID,fsize,lfn FROM {0} ".format(fileTableName)
-            sqlFP += "WHERE PandaID=:PandaID AND status=:status AND fileType<>:type "
-            # sql to get provenanceID,workerID for pending files
-            sqlPW = "SELECT SUM(fsize),provenanceID,workerID FROM {0} ".format(fileTableName)
-            sqlPW += "WHERE PandaID=:PandaID AND status=:status AND fileType<>:type "
-            sqlPW += "GROUP BY provenanceID,workerID "
             # sql to update pending files
             sqlFU = "UPDATE {0} ".format(fileTableName)
             sqlFU += "SET status=:status,zipFileID=:zipFileID "
@@ -2122,81 +2404,7 @@ class DBProxy(object):
                         # check pending files
                         if jobSpec.zipPerMB is not None and \
                                 not (jobSpec.zipPerMB == 0 and jobSpec.subStatus != 'to_transfer'):
-                            # get workerID and provenanceID of pending files
-                            zippedFileIDs = []
-                            varMap = dict()
-                            varMap[':PandaID'] = jobSpec.PandaID
-                            varMap[':status'] = 'pending'
-                            varMap[':type'] = 'input'
-                            self.execute(sqlPW, varMap)
-                            resPW = self.cur.fetchall()
-                            for subTotalSize, tmpProvenanceID, tmpWorkerID in resPW:
-                                if jobSpec.subStatus == 'to_transfer' \
-                                        or (jobSpec.zipPerMB > 0 and subTotalSize > jobSpec.zipPerMB * 1024 * 1024) \
-                                        or (tmpWorkerID is not None and tmpWorkerID not in activeWorkers):
-                                    sqlFPx = sqlFP
-                                    varMap = dict()
-                                    varMap[':PandaID'] = jobSpec.PandaID
-                                    varMap[':status'] = 'pending'
-                                    varMap[':type'] = 'input'
-                                    if tmpProvenanceID is None:
-                                        sqlFPx += 'AND provenanceID IS NULL '
-                                    else:
-                                        varMap[':provenanceID'] = tmpProvenanceID
-                                        sqlFPx += 'AND provenanceID=:provenanceID '
-                                    if tmpWorkerID is None:
-                                        sqlFPx += 'AND workerID IS NULL '
-                                    else:
-                                        varMap[':workerID'] = tmpWorkerID
-                                        sqlFPx += 'AND workerID=:workerID'
-                                    # get pending files
-                                    self.execute(sqlFPx, varMap)
-                                    resFP = self.cur.fetchall()
-                                    tmpLog.debug('got {0} pending files for workerID={1} provenanceID={2}'.format(
-                                        len(resFP),
-                                        tmpWorkerID,
-                                        tmpProvenanceID))
-                                    # make subsets
-                                    subTotalSize = 0
-                                    subFileIDs = []
-                                    for tmpFileID, tmpFsize, tmpLFN in resFP:
-                                        if jobSpec.zipPerMB > 0 and subTotalSize > 0 \
-                                                and (subTotalSize + tmpFsize > jobSpec.zipPerMB * 1024 * 1024):
-                                            zippedFileIDs.append(subFileIDs)
-                                            subFileIDs = []
-                                            subTotalSize = 0
-                                        subTotalSize += tmpFsize
-                                        subFileIDs.append((tmpFileID, tmpLFN))
-                                    if (jobSpec.subStatus == 'to_transfer'
-                                            or (jobSpec.zipPerMB > 0 and subTotalSize > jobSpec.zipPerMB * 1024 * 1024)
-                                            or (tmpWorkerID is not None and tmpWorkerID not in activeWorkers)) \
-                                            and len(subFileIDs) > 0:
-                                        zippedFileIDs.append(subFileIDs)
-                            # make zip files
-                            for subFileIDs in zippedFileIDs:
-                                # insert zip file
-                                fileSpec = FileSpec()
-                                fileSpec.status = 'zipping'
-                                fileSpec.lfn = 'panda.' + subFileIDs[0][-1] + '.zip'
-                                fileSpec.scope = 'panda'
-                                fileSpec.fileType = 'zip_output'
-                                fileSpec.PandaID = jobSpec.PandaID
-                                fileSpec.taskID = jobSpec.taskID
-                                fileSpec.isZip = 1
-                                varMap = fileSpec.values_list()
-                                self.execute(sqlFI, varMap)
-                                # update pending files
-                                varMaps = []
-                                for tmpFileID, tmpLFN in subFileIDs:
-                                    varMap = dict()
-                                    varMap[':status'] = 'zipped'
-                                    varMap[':fileID'] = tmpFileID
-                                    varMap[':zipFileID'] = self.cur.lastrowid
-                                    varMaps.append(varMap)
-                                self.executemany(sqlFU, varMaps)
-                            # set zip output flag
-                            if len(zippedFileIDs) > 0:
-                                jobSpec.hasOutFile = JobSpec.HO_hasZipOutput
+                            self._zip_pending_files(jobSpec, activeWorkers, tmpLog)
                         # get event ranges and file stat
                         eventFileStat = dict()
                         eventRangesSet = set()
@@ -2333,6 +2541,450 @@ class DBProxy(object):
             # return
             return False
 
+    # update jobs and workers for many worker chunks with one commit per batch of workers
+    def update_jobs_workers_bulk(self, jobs_workers_list, locked_by, n_workers_per_commit=100):
+        # get logger
+        tmpLog = core_utils.make_logger(_logger, 'by {0}'.format(locked_by), method_name='update_jobs_workers_bulk')
+        tmpLog.debug('start with {0} worker chunks'.format(len(jobs_workers_list)))
+        # sql to lock jobs
+        sqlCJ = "SELECT PandaID FROM {0} WHERE PandaID IN ".format(jobTableName)
+        # sql to check file
+        sqlFC = "SELECT {0} FROM {1} ".format(FileSpec.column_names(), fileTableName)
+        sqlFC += "WHERE PandaID=:PandaID AND lfn=:lfn "
+        # sql to get all LFNs
+        sqlFL = "SELECT PandaID,lfn FROM {0} ".format(fileTableName)
+        sqlFL += "WHERE fileType<>:type AND PandaID IN "
+        # sql to get files with eventRangeID
+        sqlFE = "SELECT PandaID,lfn,eventRangeID,status FROM {0} ".format(fileTableName)
+        sqlFE += "WHERE eventRangeID IS NOT NULL AND PandaID IN "
+        # sql to insert file
+        sqlFI = "INSERT INTO {0} ({1}) ".format(fileTableName, FileSpec.column_names())
+        sqlFI += FileSpec.bind_values_expression()
+        # sql to update pending files
+        sqlFU = "UPDATE {0} ".format(fileTableName)
+        sqlFU += "SET status=:status,zipFileID=:zipFileID "
+        sqlFU += "WHERE fileID=:fileID "
+        # sql to check event
+        sqlEC = "SELECT PandaID,eventRangeID FROM {0} ".format(eventTableName)
+        sqlEC += "WHERE eventRangeID IS NOT NULL AND PandaID IN "
+        # sql to insert event
+        sqlEI = "INSERT INTO {0} ({1}) ".format(eventTableName, EventSpec.column_names())
+        sqlEI += EventSpec.bind_values_expression()
+        # sql to update event
+        sqlEU = "UPDATE {0} ".format(eventTableName)
+        sqlEU += "SET eventStatus=:eventStatus,subStatus=:subStatus "
+        sqlEU += "WHERE PandaID=:PandaID AND eventRangeID=:eventRangeID "
+        # sql to get active workers
+        sqlNW = "SELECT DISTINCT t.PandaID,t.workerID FROM {0} t, {1} w ".format(jobWorkerTableName, workTableName)
+        sqlNW += "WHERE w.workerID=t.workerID AND w.status IN (:st_submitted,:st_running,:st_idle) "
+        sqlNW += "AND t.PandaID IN "
+        # sql to check workers which can be updated
+        sqlCW = "SELECT workerID FROM {0} ".format(workTableName)
+        sqlCW += "WHERE lockedBy=:cr_lockedBy AND (status NOT IN (:st1,:st2,:st3,:st4)) "
+        sqlCW += "AND workerID IN "
+        # sql to get relationships
+        sqlCR = "SELECT PandaID,workerID FROM {0} WHERE workerID IN ".format(jobWorkerTableName)
+        # sql to insert job and worker relationship
+        sqlIR = "INSERT INTO {0} ({1}) ".format(jobWorkerTableName, JobWorkerRelationSpec.column_names())
+        sqlIR += JobWorkerRelationSpec.bind_values_expression()
+        # make batches of worker chunks
+        batchList = []
+        batch = []
+        nWorkers = 0
+        for jobspec_list, workspec_list, panda_ids_list in jobs_workers_list:
+            batch.append((jobspec_list, workspec_list, panda_ids_list))
+            nWorkers += len(workspec_list)
+            if nWorkers >= n_workers_per_commit:
+                batchList.append(batch)
+                batch = []
+                nWorkers = 0
+        if len(batch) > 0:
+            batchList.append(batch)
+        retList = []
+        for batch in batchList:
+            try:
+                timeNow = datetime.datetime.utcnow()
+                # collect jobs
+                jobList = []
+                for jobspec_list, workspec_list, panda_ids_list in batch:
+                    if jobspec_list is None:
+                        continue
+                    if len(workspec_list) > 0 and workspec_list[0].mapType == WorkSpec.MT_MultiWorkers:
+                        isMultiWorkers = True
+                    else:
+                        isMultiWorkers = False
+                    for jobSpec in jobspec_list:
+                        jobList.append((jobSpec, isMultiWorkers))
+                pandaIDs = sorted(set([jobSpec.PandaID for jobSpec, isMultiWorkers in jobList]))
+                multiPandaIDs = sorted(set([jobSpec.PandaID for jobSpec, isMultiWorkers in jobList
+                                            if isMultiWorkers]))
+                eventPandaIDs = sorted(set([jobSpec.PandaID for jobSpec, isMultiWorkers in jobList
+                                            if len(jobSpec.events) > 0]))
+                # lock jobs
+                existingIDs = set()
+                for idList in core_utils.create_shards(pandaIDs, self.maxItemsInList):
+                    sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                    self.execute(sqlCJ + sqlIn + 'FOR UPDATE ', varMap)
+                    resCJ = self.cur.fetchall()
+                    for tmpPandaID, in resCJ:
+                        existingIDs.add(tmpPandaID)
+                # get active workers
+                activeWorkersMap = dict()
+                for idList in core_utils.create_shards(multiPandaIDs, self.maxItemsInList):
+                    sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                    varMap[':st_submitted'] = WorkSpec.ST_submitted
+                    varMap[':st_running'] = WorkSpec.ST_running
+                    varMap[':st_idle'] = WorkSpec.ST_idle
+                    self.execute(sqlNW + sqlIn, varMap)
+                    resNW = self.cur.fetchall()
+                    for tmpPandaID, tmpWorkerID in resNW:
+                        activeWorkersMap.setdefault(tmpPandaID, set())
+                        activeWorkersMap[tmpPandaID].add(tmpWorkerID)
+                # get all LFNs and files with eventRangeID
+                allLFNsMap = dict()
+                eventFileMap = dict()
+                eventFileStatMap = dict()
+                for idList in core_utils.create_shards(pandaIDs, self.maxItemsInList):
+                    sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                    varMap[':type'] = 'input'
+                    self.execute(sqlFL + sqlIn, varMap)
+                    resFL = self.cur.fetchall()
+                    for tmpPandaID, tmpLFN in resFL:
+                        allLFNsMap.setdefault(tmpPandaID, set())
+                        allLFNsMap[tmpPandaID].add(tmpLFN)
+                    sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                    self.execute(sqlFE + sqlIn, varMap)
+                    resFE = self.cur.fetchall()
+                    for tmpPandaID, tmpLFN, tmpEventRangeID, tmpStat in resFE:
+                        eventFileMap.setdefault(tmpPandaID, set())
+                        eventFileMap[tmpPandaID].add((tmpLFN, tmpEventRangeID))
+                        eventFileStatMap.setdefault(tmpPandaID, dict())
+                        eventFileStatMap[tmpPandaID][tmpEventRangeID] = tmpStat
+                # get event ranges
+                eventRangesMap = dict()
+                for idList in core_utils.create_shards(eventPandaIDs, self.maxItemsInList):
+                    sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                    self.execute(sqlEC + sqlIn, varMap)
+                    resEC = self.cur.fetchall()
+                    for tmpPandaID, tmpEventRangeID in resEC:
+                        eventRangesMap.setdefault(tmpPandaID, set())
+                        eventRangesMap[tmpPandaID].add(tmpEventRangeID)
+                # update jobs
+                varMapsFI = []
+                varMapsEI = []
+                varMapsEU = []
+                varMapsJMap = dict()
+                for jobSpec, isMultiWorkers in jobList:
+                    if jobSpec.PandaID not in existingIDs:
+                        tmpLog.warning('PandaID={0} not found'.format(jobSpec.PandaID))
+                        continue
+                    # get nWorkers
+                    activeWorkers = activeWorkersMap.get(jobSpec.PandaID, set())
+                    if isMultiWorkers:
+                        jobSpec.nWorkers = len(activeWorkers)
+                    allLFNs = allLFNsMap.get(jobSpec.PandaID, set())
+                    eventFiles = eventFileMap.get(jobSpec.PandaID, set())
+                    eventFileStat = eventFileStatMap.setdefault(jobSpec.PandaID, dict())
+                    # insert files
+                    fileIdMap = {}
+                    zipFileRes = dict()
+                    for fileSpec in jobSpec.outFiles:
+                        # insert file
+                        if fileSpec.lfn not in allLFNs:
+                            if jobSpec.zipPerMB is None or fileSpec.isZip in [0, 1]:
+                                fileSpec.status = 'defined'
+                                jobSpec.hasOutFile = JobSpec.HO_hasOutput
+                            else:
+                                fileSpec.status = 'pending'
+                            # insert in bulk unless fileID is needed
+                            if fileSpec.eventRangeID is None and fileSpec.isZip != 1:
+                                varMapsFI.append(fileSpec.values_list())
+                                continue
+                            varMap = fileSpec.values_list()
+                            self.execute(sqlFI, varMap)
+                            fileSpec.fileID = self.cur.lastrowid
+                            # mapping between event range ID and file ID
+                            if fileSpec.eventRangeID is not None:
+                                fileIdMap[fileSpec.eventRangeID] = fileSpec.fileID
+                                eventFileStat[fileSpec.eventRangeID] = fileSpec.status
+                            # associate to itself
+                            if fileSpec.isZip == 1:
+                                varMap = dict()
+                                varMap[':status'] = fileSpec.status
+                                varMap[':fileID'] = fileSpec.fileID
+                                varMap[':zipFileID'] = fileSpec.fileID
+                                self.execute(sqlFU, varMap)
+                        elif fileSpec.isZip == 1 and fileSpec.eventRangeID is not None:
+                            # add a fake file with eventRangeID which has the same lfn/zipFileID as zip file
+                            if (fileSpec.lfn, fileSpec.eventRangeID) not in eventFiles:
+                                if fileSpec.lfn not in zipFileRes:
+                                    # get file
+                                    varMap = dict()
+                                    varMap[':PandaID'] = fileSpec.PandaID
+                                    varMap[':lfn'] = fileSpec.lfn
+                                    self.execute(sqlFC, varMap)
+                                    resFC = self.cur.fetchone()
+                                    zipFileRes[fileSpec.lfn] = resFC
+                                # associate to existing zip
+                                resFC = zipFileRes[fileSpec.lfn]
+                                zipFileSpec = FileSpec()
+                                zipFileSpec.pack(resFC)
+                                fileSpec.status = 'zipped'
+                                fileSpec.zipFileID = zipFileSpec.zipFileID
+                                varMap = fileSpec.values_list()
+                                self.execute(sqlFI, varMap)
+                                # mapping between event range ID and file ID
+                                fileIdMap[fileSpec.eventRangeID] = self.cur.lastrowid
+                                eventFileStat[fileSpec.eventRangeID] = fileSpec.status
+                    # check pending files
+                    if jobSpec.zipPerMB is not None and \
+                            not (jobSpec.zipPerMB == 0 and jobSpec.subStatus != 'to_transfer'):
+                        # pending files must be in the table before being zipped
+                        if len(varMapsFI) > 0:
+                            self.executemany(sqlFI, varMapsFI)
+                            varMapsFI = []
+                        self._zip_pending_files(jobSpec, activeWorkers, tmpLog)
+                    # insert or update events
+                    eventRangesSet = eventRangesMap.get(jobSpec.PandaID, set())
+                    for eventSpec in jobSpec.events:
+                        # set subStatus
+                        if eventSpec.eventStatus == 'finished':
+                            # check associated file
+                            if eventSpec.eventRangeID not in eventFileStat or \
+                                    eventFileStat[eventSpec.eventRangeID] == 'finished':
+                                eventSpec.subStatus = 'finished'
+                            elif eventFileStat[eventSpec.eventRangeID] == 'failed':
+                                eventSpec.eventStatus = 'failed'
+                                eventSpec.subStatus = 'failed'
+                            else:
+                                eventSpec.subStatus = 'transferring'
+                        else:
+                            eventSpec.subStatus = eventSpec.eventStatus
+                        # set fileID
+                        if eventSpec.eventRangeID in fileIdMap:
+                            eventSpec.fileID = fileIdMap[eventSpec.eventRangeID]
+                        # insert or update event
+                        if eventSpec.eventRangeID not in eventRangesSet:
+                            varMap = eventSpec.values_list()
+                            varMapsEI.append(varMap)
+                        else:
+                            varMap = dict()
+                            varMap[':PandaID'] = jobSpec.PandaID
+                            varMap[':eventRangeID'] = eventSpec.eventRangeID
+                            varMap[':eventStatus'] = eventSpec.eventStatus
+                            varMap[':subStatus'] = eventSpec.subStatus
+                            varMapsEU.append(varMap)
+                    # update job
+                    varMap = jobSpec.values_map(only_changed=True)
+                    if len(varMap) > 0:
+                        jobSpec.lockedBy = None
+                        jobSpec.modificationTime = timeNow
+                        # sql to update job
+                        sqlJ = "UPDATE {0} SET {1} ".format(jobTableName, jobSpec.bind_update_changes_expression())
+                        sqlJ += "WHERE PandaID=:PandaID "
+                        varMap = jobSpec.values_map(only_changed=True)
+                        varMap[':PandaID'] = jobSpec.PandaID
+                        varMapsJMap.setdefault(sqlJ, [])
+                        varMapsJMap[sqlJ].append(varMap)
+                if len(varMapsFI) > 0:
+                    self.executemany(sqlFI, varMapsFI)
+                if len(varMapsEI) > 0:
+                    self.executemany(sqlEI, varMapsEI)
+                if len(varMapsEU) > 0:
+                    self.executemany(sqlEU, varMapsEU)
+                for sqlJ, varMapsJ in iteritems(varMapsJMap):
+                    self.executemany(sqlJ, varMapsJ)
+                tmpLog.debug('updated {0} jobs with {1} events'.format(
+                    sum([len(varMapsJ) for varMapsJ in varMapsJMap.values()]),
+                    len(varMapsEI) + len(varMapsEU)))
+                # check workers which can be updated
+                workerIDs = [workSpec.workerID for jobspec_list, workspec_list, panda_ids_list in batch
+                             for workSpec in workspec_list]
+                updatableIDs = set()
+                for idList in core_utils.create_shards(workerIDs, self.maxItemsInList):
+                    sqlIn, varMap = self.make_in_clause('workerID', idList)
+                    varMap[':cr_lockedBy'] = locked_by
+                    varMap[':st1'] = WorkSpec.ST_cancelled
+                    varMap[':st2'] = WorkSpec.ST_finished
+                    varMap[':st3'] = WorkSpec.ST_failed
+                    varMap[':st4'] = WorkSpec.ST_missed
+                    self.execute(sqlCW + sqlIn + 'FOR UPDATE ', varMap)
+                    resCW = self.cur.fetchall()
+                    for tmpWorkerID, in resCW:
+                        updatableIDs.add(tmpWorkerID)
+                # get existing relationships
+                relationSet = set()
+                for idList in core_utils.create_shards(workerIDs, self.maxItemsInList):
+                    sqlIn, varMap = self.make_in_clause('workerID', idList)
+                    self.execute(sqlCR + sqlIn, varMap)
+                    resCR = self.cur.fetchall()
+                    for tmpPandaID, tmpWorkerID in resCR:
+                        relationSet.add((tmpPandaID, tmpWorkerID))
+                # update workers
+                varMapsWMap = dict()
+                varMapsIR = []
+                tmpRetList = []
+                for jobspec_list, workspec_list, panda_ids_list in batch:
+                    tmpRets = []
+                    for idxW, workSpec in enumerate(workspec_list):
+                        workSpec.lockedBy = None
+                        if workSpec.status == WorkSpec.ST_running and workSpec.startTime is None:
+                            workSpec.startTime = timeNow
+                        elif workSpec.is_final_status():
+                            if workSpec.startTime is None:
+                                workSpec.startTime = timeNow
+                            if workSpec.endTime is None:
+                                workSpec.endTime = timeNow
+                        if not workSpec.nextLookup:
+                            if workSpec.has_updated_attributes():
+                                workSpec.modificationTime = timeNow
+                        else:
+                            workSpec.nextLookup = False
+                        varMap = workSpec.values_map(only_changed=True)
+                        if len(varMap) == 0:
+                            tmpRets.append(True)
+                        elif workSpec.workerID not in updatableIDs:
+                            tmpLog.debug('workerID={0} not updated since it is not locked or in final status'.format(
+                                workSpec.workerID))
+                            tmpRets.append(False)
+                        else:
+                            # sql to update worker
+                            sqlW = "UPDATE {0} SET {1} ".format(workTableName,
+                                                                workSpec.bind_update_changes_expression())
+                            sqlW += "WHERE workerID=:workerID AND lockedBy=:cr_lockedBy "
+                            sqlW += "AND (status NOT IN (:st1,:st2,:st3,:st4)) "
+                            varMap[':workerID'] = workSpec.workerID
+                            varMap[':cr_lockedBy'] = locked_by
+                            varMap[':st1'] = WorkSpec.ST_cancelled
+                            varMap[':st2'] = WorkSpec.ST_finished
+                            varMap[':st3'] = WorkSpec.ST_failed
+                            varMap[':st4'] = WorkSpec.ST_missed
+                            varMapsWMap.setdefault(sqlW, [])
+                            varMapsWMap[sqlW].append(varMap)
+                            tmpRets.append(True)
+                        # insert relationship if necessary
+                        if panda_ids_list is not None and len(panda_ids_list) > idxW:
+                            for pandaID in panda_ids_list[idxW]:
+                                if (pandaID, workSpec.workerID) in relationSet:
+                                    continue
+                                relationSet.add((pandaID, workSpec.workerID))
+                                jwRelation = JobWorkerRelationSpec()
+                                jwRelation.PandaID = pandaID
+                                jwRelation.workerID = workSpec.workerID
+                                varMap = jwRelation.values_list()
+                                varMapsIR.append(varMap)
+                    tmpRetList.append(tmpRets)
+                for sqlW, varMapsW in iteritems(varMapsWMap):
+                    self.executemany(sqlW, varMapsW)
+                if len(varMapsIR) > 0:
+                    self.executemany(sqlIR, varMapsIR)
+                # commit
+                self.commit()
+                tmpLog.debug('updated {0} workers'.format(sum([len(varMapsW) for varMapsW in varMapsWMap.values()])))
+                retList += tmpRetList
+            except Exception:
+                # roll back
+                self.rollback()
+                # dump error
+                core_utils.dump_error_message(tmpLog)
+                # all workers in the batch failed
+                for jobspec_list, workspec_list, panda_ids_list in batch:
+                    retList.append([False] * len(workspec_list))
+        tmpLog.debug('done')
+        return retList
+
+    # make zip files for pending output files of a job
+    def _zip_pending_files(self, jobSpec, activeWorkers, tmpLog):
+        # sql to insert file
+        sqlFI = "INSERT INTO {0} ({1}) ".format(fileTableName, FileSpec.column_names())
+        sqlFI += FileSpec.bind_values_expression()
+        # sql to get pending files
+        sqlFP = "SELECT fileID,fsize,lfn FROM {0} ".format(fileTableName)
+        sqlFP += "WHERE PandaID=:PandaID AND status=:status AND fileType<>:type "
+        # sql to get provenanceID,workerID for pending files
+        sqlPW = "SELECT SUM(fsize),provenanceID,workerID FROM {0} ".format(fileTableName)
+        sqlPW += "WHERE PandaID=:PandaID AND status=:status AND fileType<>:type "
+        sqlPW += "GROUP BY provenanceID,workerID "
+        # sql to update pending files
+        sqlFU = "UPDATE {0} ".format(fileTableName)
+        sqlFU += "SET status=:status,zipFileID=:zipFileID "
+        sqlFU += "WHERE fileID=:fileID "
+        # get workerID and provenanceID of pending files
+        zippedFileIDs = []
+        varMap = dict()
+        varMap[':PandaID'] = jobSpec.PandaID
+        varMap[':status'] = 'pending'
+        varMap[':type'] = 'input'
+        self.execute(sqlPW, varMap)
+        resPW = self.cur.fetchall()
+        for subTotalSize, tmpProvenanceID, tmpWorkerID in resPW:
+            if jobSpec.subStatus == 'to_transfer' \
+                    or (jobSpec.zipPerMB > 0 and subTotalSize > jobSpec.zipPerMB * 1024 * 1024) \
+                    or (tmpWorkerID is not None and tmpWorkerID not in activeWorkers):
+                sqlFPx = sqlFP
+                varMap = dict()
+                varMap[':PandaID'] = jobSpec.PandaID
+                varMap[':status'] = 'pending'
+                varMap[':type'] = 'input'
+                if tmpProvenanceID is None:
+                    sqlFPx += 'AND provenanceID IS NULL '
+                else:
+                    varMap[':provenanceID'] = tmpProvenanceID
+                    sqlFPx += 'AND provenanceID=:provenanceID '
+                if tmpWorkerID is None:
+                    sqlFPx += 'AND workerID IS NULL '
+                else:
+                    varMap[':workerID'] = tmpWorkerID
+                    sqlFPx += 'AND workerID=:workerID'
+                # get pending files
+                self.execute(sqlFPx, varMap)
+                resFP = self.cur.fetchall()
+                tmpLog.debug('got {0} pending files for workerID={1} provenanceID={2}'.format(
+                    len(resFP),
+                    tmpWorkerID,
+                    tmpProvenanceID))
+                # make subsets
+                subTotalSize = 0
+                subFileIDs = []
+                for tmpFileID, tmpFsize, tmpLFN in resFP:
+                    if jobSpec.zipPerMB > 0 and subTotalSize > 0 \
+                            and (subTotalSize + tmpFsize > jobSpec.zipPerMB * 1024 * 1024):
+                        zippedFileIDs.append(subFileIDs)
+                        subFileIDs = []
+                        subTotalSize = 0
+                    subTotalSize += tmpFsize
+                    subFileIDs.append((tmpFileID, tmpLFN))
+                if (jobSpec.subStatus == 'to_transfer'
+                        or (jobSpec.zipPerMB > 0 and subTotalSize > jobSpec.zipPerMB * 1024 * 1024)
+                        or (tmpWorkerID is not None and tmpWorkerID not in activeWorkers)) \
+                        and len(subFileIDs) > 0:
+                    zippedFileIDs.append(subFileIDs)
+        # make zip files
+        for subFileIDs in zippedFileIDs:
+            # insert zip file
+            fileSpec = FileSpec()
+            fileSpec.status = 'zipping'
+            fileSpec.lfn = 'panda.' + subFileIDs[0][-1] + '.zip'
+            fileSpec.scope = 'panda'
+            fileSpec.fileType = 'zip_output'
+            fileSpec.PandaID = jobSpec.PandaID
+            fileSpec.taskID = jobSpec.taskID
+            fileSpec.isZip = 1
+            varMap = fileSpec.values_list()
+            self.execute(sqlFI, varMap)
+            # update pending files
+            varMaps = []
+            for tmpFileID, tmpLFN in subFileIDs:
+                varMap = dict()
+                varMap[':status'] = 'zipped'
+                varMap[':fileID'] = tmpFileID
+                varMap[':zipFileID'] = self.cur.lastrowid
+                varMaps.append(varMap)
+            self.executemany(sqlFU, varMaps)
+        # set zip output flag
+        if len(zippedFileIDs) > 0:
+            jobSpec.hasOutFile = JobSpec.HO_hasZipOutput
+
     # get jobs with workerID
     def get_jobs_with_worker_id(self, worker_id, locked_by, with_file=False, only_running=False, slim=False):
         try:
@@ -2934,11 +3586,11 @@ class DBProxy(object):
             self.execute(sqlU, varMap)
             # commit
             self.commit()
-            # put into global dict
+            # put into global dict together with the update time which consumers use as a version stamp
             cacheKey = 'cache|{0}|{1}'.format(main_key, sub_key)
             globalDict = core_utils.get_global_dict()
             globalDict.acquire()
-            globalDict[cacheKey] = cacheSpec.data
+            globalDict[cacheKey] = (cacheSpec.data, cacheSpec.lastUpdate)
             globalDict.release()
             tmpLog.debug('refreshed')
             return True
@@ -2969,7 +3621,7 @@ class DBProxy(object):
                 globalDict.release()
                 # make spec
                 cacheSpec = CacheSpec()
-                cacheSpec.data = globalDict[cacheKey]
+                cacheSpec.data, cacheSpec.lastUpdate = globalDict[cacheKey]
             else:
                 # read from database
                 useDB = True
@@ -2992,7 +3644,7 @@ class DBProxy(object):
                 cacheSpec = CacheSpec()
                 cacheSpec.pack(resJ)
                 # put into global dict
-                globalDict[cacheKey] = cacheSpec.data
+                globalDict[cacheKey] = (cacheSpec.data, cacheSpec.lastUpdate)
                 # release dict
                 globalDict.release()
             tmpLog.debug('done')
@@ -3416,108 +4068,173 @@ class DBProxy(object):
             sqlW += ') '
             sqlW += 'AND modificationTime<:timeLimit '
             sqlW += "ORDER BY modificationTime LIMIT {0} ".format(max_workers)
-            # sql to lock or release worker
+            # sql to lock workers
             sqlL = "UPDATE {0} SET modificationTime=:setTime ".format(workTableName)
-            sqlL += "WHERE workerID=:workerID AND modificationTime<:timeLimit "
+            sqlL += "WHERE modificationTime<:timeLimit AND workerID IN "
+            # sql to get locked workerIDs
+            sqlCL = "SELECT workerID FROM {0} ".format(workTableName)
+            sqlCL += "WHERE modificationTime=:setTime AND workerID IN "
             # sql to check associated jobs
-            sqlA = "SELECT COUNT(*) cnt FROM {0} j, {1} r ".format(jobTableName, jobWorkerTableName)
-            sqlA += "WHERE j.PandaID=r.PandaID AND r.workerID=:workerID "
-            sqlA += "AND propagatorTime IS NOT NULL "
+            sqlA = "SELECT r.workerID,COUNT(*) cnt FROM {0} j, {1} r ".format(jobTableName, jobWorkerTableName)
+            sqlA += "WHERE j.PandaID=r.PandaID AND propagatorTime IS NOT NULL "
+            sqlA += "AND r.workerID IN "
+            sqlAG = "GROUP BY r.workerID "
             # sql to get workers
             sqlG = "SELECT {0} FROM {1} ".format(WorkSpec.column_names(), workTableName)
-            sqlG += "WHERE workerID=:workerID "
+            sqlG += "WHERE workerID IN "
             # sql to get PandaIDs
-            sqlP = "SELECT j.PandaID FROM {0} j, {1} r ".format(jobTableName, jobWorkerTableName)
-            sqlP += "WHERE j.PandaID=r.PandaID AND r.workerID=:workerID "
+            sqlP = "SELECT r.workerID,j.PandaID FROM {0} j, {1} r ".format(jobTableName, jobWorkerTableName)
+            sqlP += "WHERE j.PandaID=r.PandaID AND r.workerID IN "
             # sql to get jobs
             sqlJ = "SELECT {0} FROM {1} ".format(JobSpec.column_names(), jobTableName)
-            sqlJ += "WHERE PandaID=:PandaID "
+            sqlJ += "WHERE PandaID IN "
             # sql to get files
             sqlF = "SELECT {0} FROM {1} ".format(FileSpec.column_names(), fileTableName)
-            sqlF += "WHERE PandaID=:PandaID "
+            sqlF += "WHERE PandaID IN "
             # sql to get files not to be deleted. b.todelete is not used to use index on b.lfn
-            sqlD = "SELECT b.lfn,b.todelete  FROM {0} a, {0} b ".format(fileTableName)
-            sqlD += "WHERE a.PandaID=:PandaID AND a.fileType=:fileType AND b.lfn=a.lfn "
+            sqlD = "SELECT a.PandaID,b.lfn,b.todelete FROM {0} a, {0} b ".format(fileTableName)
+            sqlD += "WHERE a.fileType=:fileType AND b.lfn=a.lfn AND a.PandaID IN "
+            # positions of columns in raw rows, not to pack rows only to read them
+            jobPandaIdIdx = JobSpec.column_names().split(',').index('PandaID')
+            filePandaIdIdx = FileSpec.column_names().split(',').index('PandaID')
+            fileLfnIdx = FileSpec.column_names().split(',').index('lfn')
             # get workerIDs
-            timeNow = datetime.datetime.utcnow()
+            # truncate to seconds since setTime is used as a lock token which must survive the DB round trip
+            timeNow = datetime.datetime.utcnow().replace(microsecond=0)
             self.execute(sqlW, varMap)
             resW = self.cur.fetchall()
-            retVal = dict()
-            iWorkers = 0
+            configIdMap = dict()
             for workerID, configID in resW:
-                # lock worker
-                varMap = dict()
-                varMap[':workerID'] = workerID
+                # ignore configID
+                if not core_utils.dynamic_plugin_change():
+                    configID = None
+                configIdMap[workerID] = configID
+            # lock workers with one conditional update per chunk
+            lockedIDs = set()
+            for idList in core_utils.create_shards(list(configIdMap), self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
                 varMap[':setTime'] = timeNow
                 varMap[':timeLimit'] = modTimeLimit
-                self.execute(sqlL, varMap)
+                self.execute(sqlL + sqlIn, varMap)
+                nLocked = self.cur.rowcount
                 # commit
                 self.commit()
-                if self.cur.rowcount == 0:
+                if nLocked == 0:
                     continue
-                # ignore configID
-                if not core_utils.dynamic_plugin_change():
-                    configID = None
-                # check associated jobs
-                varMap = dict()
-                varMap[':workerID'] = workerID
-                self.execute(sqlA, varMap)
-                nActJobs, = self.cur.fetchone()
-                # cleanup when there is no active job
-                if nActJobs == 0:
-                    # get worker
-                    varMap = dict()
-                    varMap[':workerID'] = workerID
-                    self.execute(sqlG, varMap)
-                    resG = self.cur.fetchone()
+                if nLocked == len(idList):
+                    lockedIDs.update(idList)
+                    continue
+                # get workers actually locked
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                varMap[':setTime'] = timeNow
+                self.execute(sqlCL + sqlIn, varMap)
+                resCL = self.cur.fetchall()
+                self.commit()
+                # skip the chunk if other sessions locked some of the workers with the same token.
+                # They are retried once the lock expires
+                if len(resCL) != nLocked:
+                    tmpLog.debug('skipped {0} workers locked concurrently'.format(len(idList)))
+                    continue
+                for workerID, in resCL:
+                    lockedIDs.add(workerID)
+            # check associated jobs
+            activeIDs = set()
+            for idList in core_utils.create_shards(list(lockedIDs), self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                self.execute(sqlA + sqlIn + sqlAG, varMap)
+                resA = self.cur.fetchall()
+                for workerID, nActJobs in resA:
+                    if nActJobs > 0:
+                        activeIDs.add(workerID)
+            # cleanup when there is no active job
+            idsToClean = sorted(lockedIDs - activeIDs)
+            # get workers
+            workerRowMap = dict()
+            for idList in core_utils.create_shards(idsToClean, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                self.execute(sqlG + sqlIn, varMap)
+                resGs = self.cur.fetchall()
+                for resG in resGs:
                     workSpec = WorkSpec()
                     workSpec.pack(resG)
-                    queueName = workSpec.computingSite
-                    retVal.setdefault(queueName, dict())
-                    retVal[queueName].setdefault(configID, [])
-                    retVal[queueName][configID].append(workSpec)
-                    # get jobs
-                    jobSpecs = []
-                    checkedLFNs = set()
-                    keepLFNs = set()
-                    varMap = dict()
-                    varMap[':workerID'] = workerID
-                    self.execute(sqlP, varMap)
-                    resP = self.cur.fetchall()
-                    for pandaID, in resP:
-                        varMap = dict()
-                        varMap[':PandaID'] = pandaID
-                        self.execute(sqlJ, varMap)
-                        resJ = self.cur.fetchone()
-                        jobSpec = JobSpec()
-                        jobSpec.pack(resJ)
-                        jobSpecs.append(jobSpec)
-                        # get LFNs not to be deleted
-                        varMap = dict()
-                        varMap[':PandaID'] = pandaID
-                        varMap[':fileType'] = 'input'
-                        self.execute(sqlD, varMap)
-                        resDs = self.cur.fetchall()
-                        for tmpLFN, tmpTodelete in resDs:
-                            if tmpTodelete == 0:
-                                keepLFNs.add(tmpLFN)
-                        # get files to be deleted
-                        varMap = dict()
-                        varMap[':PandaID'] = jobSpec.PandaID
-                        self.execute(sqlF, varMap)
-                        resFs = self.cur.fetchall()
-                        for resF in resFs:
+                    workerRowMap[workSpec.workerID] = workSpec
+            # get PandaIDs
+            pandaIDsMap = dict()
+            for idList in core_utils.create_shards(idsToClean, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                self.execute(sqlP + sqlIn, varMap)
+                resP = self.cur.fetchall()
+                for workerID, pandaID in resP:
+                    pandaIDsMap.setdefault(workerID, [])
+                    pandaIDsMap[workerID].append(pandaID)
+            allPandaIDs = set()
+            for pandaIDs in pandaIDsMap.values():
+                allPandaIDs.update(pandaIDs)
+            allPandaIDs = sorted(allPandaIDs)
+            # get jobs, files, and LFNs not to be deleted
+            jobRowMap = dict()
+            fileRowsMap = dict()
+            keepLFNsMap = dict()
+            for idList in core_utils.create_shards(allPandaIDs, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                self.execute(sqlJ + sqlIn, varMap)
+                resJs = self.cur.fetchall()
+                for resJ in resJs:
+                    jobRowMap[resJ[jobPandaIdIdx]] = resJ
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                varMap[':fileType'] = 'input'
+                self.execute(sqlD + sqlIn, varMap)
+                resDs = self.cur.fetchall()
+                for pandaID, tmpLFN, tmpTodelete in resDs:
+                    if tmpTodelete == 0:
+                        keepLFNsMap.setdefault(pandaID, set())
+                        keepLFNsMap[pandaID].add(tmpLFN)
+                sqlIn, varMap = self.make_in_clause('PandaID', idList)
+                self.execute(sqlF + sqlIn, varMap)
+                resFs = self.cur.fetchall()
+                for resF in resFs:
+                    fileRowsMap.setdefault(resF[filePandaIdIdx], [])
+                    fileRowsMap[resF[filePandaIdIdx]].append(resF)
+            # commit
+            self.commit()
+            # make workers
+            retVal = dict()
+            iWorkers = 0
+            for workerID in idsToClean:
+                if workerID not in workerRowMap:
+                    continue
+                configID = configIdMap[workerID]
+                workSpec = workerRowMap[workerID]
+                queueName = workSpec.computingSite
+                retVal.setdefault(queueName, dict())
+                retVal[queueName].setdefault(configID, [])
+                retVal[queueName][configID].append(workSpec)
+                # get jobs
+                jobSpecs = []
+                checkedLFNs = set()
+                keepLFNs = set()
+                for pandaID in pandaIDsMap.get(workerID, []):
+                    if pandaID not in jobRowMap:
+                        continue
+                    jobSpec = JobSpec()
+                    jobSpec.pack(jobRowMap[pandaID])
+                    jobSpecs.append(jobSpec)
+                    # get LFNs not to be deleted
+                    keepLFNs.update(keepLFNsMap.get(pandaID, set()))
+                    # get files to be deleted
+                    for resF in fileRowsMap.get(pandaID, []):
+                        tmpLFN = resF[fileLfnIdx]
+                        # skip if already checked
+                        if tmpLFN in checkedLFNs:
+                            continue
+                        checkedLFNs.add(tmpLFN)
+                        # check if it is ready to delete
+                        if tmpLFN not in keepLFNs:
                             fileSpec = FileSpec()
                             fileSpec.pack(resF)
-                            # skip if already checked
-                            if fileSpec.lfn in checkedLFNs:
-                                continue
-                            checkedLFNs.add(fileSpec.lfn)
-                            # check if it is ready to delete
-                            if fileSpec.lfn not in keepLFNs:
-                                jobSpec.add_file(fileSpec)
-                    workSpec.set_jobspec_list(jobSpecs)
-                    iWorkers += 1
+                            jobSpec.add_file(fileSpec)
+                workSpec.set_jobspec_list(jobSpecs)
+                iWorkers += 1
             tmpLog.debug('got {0} workers'.format(iWorkers))
             return retVal
         except Exception:
@@ -3530,52 +4247,65 @@ class DBProxy(object):
 
     # delete a worker
     def delete_worker(self, worker_id):
+        return self.delete_workers([worker_id])
+
+    # delete jobs together with files, events, and relations without commit. Return the number of deleted jobs
+    def _delete_jobs_in_batch(self, panda_ids):
+        # sql to delete jobs
+        sqlDJ = "DELETE FROM {0} ".format(jobTableName)
+        sqlDJ += "WHERE PandaID IN "
+        # sql to delete files
+        sqlDF = "DELETE FROM {0} ".format(fileTableName)
+        sqlDF += "WHERE PandaID IN "
+        # sql to delete events
+        sqlDE = "DELETE FROM {0} ".format(eventTableName)
+        sqlDE += "WHERE PandaID IN "
+        # sql to delete relations
+        sqlDR = "DELETE FROM {0} ".format(jobWorkerTableName)
+        sqlDR += "WHERE PandaID IN "
+        nDel = 0
+        for idList in core_utils.create_shards(panda_ids, self.maxItemsInList):
+            sqlIn, varMap = self.make_in_clause('PandaID', idList)
+            # delete jobs
+            self.execute(sqlDJ + sqlIn, varMap)
+            iDel = self.cur.rowcount
+            if iDel > 0:
+                nDel += iDel
+            # delete files
+            self.execute(sqlDF + sqlIn, varMap)
+            # delete events
+            self.execute(sqlDE + sqlIn, varMap)
+            # delete relations
+            self.execute(sqlDR + sqlIn, varMap)
+        return nDel
+
+    # delete workers together with their jobs, files, events, and relations with one commit per batch
+    def delete_workers(self, worker_ids):
         try:
             # get logger
-            tmpLog = core_utils.make_logger(_logger, 'workerID={0}'.format(worker_id),
-                                            method_name='delete_worker')
-            tmpLog.debug('start')
+            tmpLog = core_utils.make_logger(_logger, method_name='delete_workers')
+            tmpLog.debug('start for {0} workers'.format(len(worker_ids)))
             # sql to get jobs
             sqlJ = "SELECT PandaID FROM {0} ".format(jobWorkerTableName)
-            sqlJ += "WHERE workerID=:workerID "
-            # sql to delete job
-            sqlDJ = "DELETE FROM {0} ".format(jobTableName)
-            sqlDJ += "WHERE PandaID=:PandaID "
-            # sql to delete files
-            sqlDF = "DELETE FROM {0} ".format(fileTableName)
-            sqlDF += "WHERE PandaID=:PandaID "
-            # sql to delete events
-            sqlDE = "DELETE FROM {0} ".format(eventTableName)
-            sqlDE += "WHERE PandaID=:PandaID "
-            # sql to delete relations
-            sqlDR = "DELETE FROM {0} ".format(jobWorkerTableName)
-            sqlDR += "WHERE PandaID=:PandaID "
-            # sql to delete worker
+            sqlJ += "WHERE workerID IN "
+            # sql to delete workers
             sqlDW = "DELETE FROM {0} ".format(workTableName)
-            sqlDW += "WHERE workerID=:workerID "
-            # get jobs
-            varMap = dict()
-            varMap[':workerID'] = worker_id
-            self.execute(sqlJ, varMap)
-            resJ = self.cur.fetchall()
-            for pandaID, in resJ:
-                varMap = dict()
-                varMap[':PandaID'] = pandaID
-                # delete job
-                self.execute(sqlDJ, varMap)
-                # delete files
-                self.execute(sqlDF, varMap)
-                # delete events
-                self.execute(sqlDE, varMap)
-                # delete relations
-                self.execute(sqlDR, varMap)
-            # delete worker
-            varMap = dict()
-            varMap[':workerID'] = worker_id
-            self.execute(sqlDW, varMap)
-            # commit
-            self.commit()
-            tmpLog.debug('done')
+            sqlDW += "WHERE workerID IN "
+            batchSize = min(self.deleteBatchSize, self.maxItemsInList)
+            nJobs = 0
+            for idList in core_utils.create_shards(list(worker_ids), batchSize):
+                # get jobs
+                sqlIn, varMap = self.make_in_clause('workerID', idList)
+                self.execute(sqlJ + sqlIn, varMap)
+                resJ = self.cur.fetchall()
+                pandaIDs = sorted(set([pandaID for pandaID, in resJ]))
+                # delete jobs
+                nJobs += self._delete_jobs_in_batch(pandaIDs)
+                # delete workers
+                self.execute(sqlDW + sqlIn, varMap)
+                # commit
+                self.commit()
+            tmpLog.debug('done with {0} jobs'.format(nJobs))
             return True
         except Exception:
             # roll back
@@ -3989,6 +4719,47 @@ class DBProxy(object):
             # return
             return {}
 
+    # get status of files in bulk. Return a map of {lfn: {status: count}}
+    def get_files_status(self, lfn_list, file_type, endpoint, job_status):
+        try:
+            # get logger
+            tmpLog = core_utils.make_logger(_logger, 'endpoint={0}'.format(endpoint),
+                                            method_name='get_files_status')
+            tmpLog.debug('start for {0} files'.format(len(lfn_list)))
+            # sql to get files
+            sqlF = "SELECT f.lfn, f.status, COUNT(*) cnt FROM {0} f, {1} j ".format(fileTableName, jobTableName)
+            sqlF += "WHERE j.PandaID=f.PandaID AND j.status=:jobStatus "
+            sqlF += "AND f.fileType=:type "
+            if endpoint is not None:
+                sqlF += "AND f.endpoint=:endpoint "
+            sqlF += "AND f.lfn IN "
+            sqlG = "GROUP BY f.lfn, f.status "
+            # get files
+            retMap = dict()
+            lfnList = sorted(set(lfn_list))
+            for lfn in lfnList:
+                retMap[lfn] = dict()
+            for tmpLFNs in core_utils.create_shards(lfnList, self.maxItemsInList):
+                sqlIn, varMap = self.make_in_clause('lfn', tmpLFNs)
+                varMap[':type'] = file_type
+                varMap[':jobStatus'] = job_status
+                if endpoint is not None:
+                    varMap[':endpoint'] = endpoint
+                self.execute(sqlF + sqlIn + sqlG, varMap)
+                for lfn, status, cnt in self.cur.fetchall():
+                    retMap[lfn][status] = cnt
+            # commit
+            self.commit()
+            tmpLog.debug('done')
+            return retMap
+        except Exception:
+            # roll back
+            self.rollback()
+            # dump error
+            core_utils.dump_error_message(_logger)
+            # return
+            return {}
+
     # change file status
     def change_file_status(self, panda_id, data, locked_by):
         try:
@@ -4605,18 +5376,6 @@ class DBProxy(object):
             sqlGJ += "WHERE subStatus=:subStatus AND propagatorTime IS NULL "
             sqlGJ += "AND ((modificationTime IS NOT NULL AND modificationTime<:timeLimit1) "
             sqlGJ += "OR (modificationTime IS NULL AND creationTime<:timeLimit2)) "
-            # sql to delete job
-            sqlDJ = "DELETE FROM {0} ".format(jobTableName)
-            sqlDJ += "WHERE PandaID=:PandaID "
-            # sql to delete files
-            sqlDF = "DELETE FROM {0} ".format(fileTableName)
-            sqlDF += "WHERE PandaID=:PandaID "
-            # sql to delete events
-            sqlDE = "DELETE FROM {0} ".format(eventTableName)
-            sqlDE += "WHERE PandaID=:PandaID "
-            # sql to delete relations
-            sqlDR = "DELETE FROM {0} ".format(jobWorkerTableName)
-            sqlDR += "WHERE PandaID=:PandaID "
             # get jobs
             varMap = dict()
             varMap[':subStatus'] = 'done'
@@ -4624,21 +5383,11 @@ class DBProxy(object):
             varMap[':timeLimit2'] = datetime.datetime.utcnow() - datetime.timedelta(hours=timeout*2)
             self.execute(sqlGJ, varMap)
             resGJ = self.cur.fetchall()
+            self.commit()
+            # delete jobs with one commit per batch
             nDel = 0
-            for pandaID, in resGJ:
-                varMap = dict()
-                varMap[':PandaID'] = pandaID
-                # delete job
-                self.execute(sqlDJ, varMap)
-                iDel = self.cur.rowcount
-                if iDel > 0:
-                    nDel += iDel
-                    # delete files
-                    self.execute(sqlDF, varMap)
-                    # delete events
-                    self.execute(sqlDE, varMap)
-                    # delete relations
-                    self.execute(sqlDR, varMap)
+            for pandaIDs in core_utils.create_shards([pandaID for pandaID, in resGJ], self.deleteBatchSize):
+                nDel += self._delete_jobs_in_batch(pandaIDs)
                 # commit
                 self.commit()
             tmpLog.debug('deleted {0} jobs'.format(nDel))
@@ -5012,32 +5761,24 @@ class DBProxy(object):
                                             method_name='delete_orphaned_job_info')
             tmpLog.debug('start')
             # sql to get job info to be deleted
-            sqlGJ = "SELECT PandaID FROM {0} "
+            sqlGJ = "SELECT DISTINCT PandaID FROM {0} "
             sqlGJ += "WHERE PandaID NOT IN ("
             sqlGJ += "SELECT PandaID FROM {1}) "
             # sql to delete job info
             sqlDJ = "DELETE FROM {0} "
-            sqlDJ += "WHERE PandaID=:PandaID "
-            # sql to delete files
-            sqlDF = "DELETE FROM {0} ".format(fileTableName)
-            sqlDF += "WHERE PandaID=:PandaID "
-            # sql to delete events
-            sqlDE = "DELETE FROM {0} ".format(eventTableName)
-            sqlDE += "WHERE PandaID=:PandaID "
-            # sql to delete relations
-            sqlDR = "DELETE FROM {0} ".format(jobWorkerTableName)
-            sqlDR += "WHERE PandaID=:PandaID "
+            sqlDJ += "WHERE PandaID IN "
+            batchSize = min(self.deleteBatchSize, self.maxItemsInList)
             # loop over all tables
             for tableName in [fileTableName, eventTableName, jobWorkerTableName]:
                 # get job info
                 self.execute(sqlGJ.format(tableName, jobTableName))
                 resGJ = self.cur.fetchall()
+                self.commit()
                 nDel = 0
-                for pandaID, in resGJ:
+                for pandaIDs in core_utils.create_shards([pandaID for pandaID, in resGJ], batchSize):
                     # delete
-                    varMap = dict()
-                    varMap[':PandaID'] = pandaID
-                    self.execute(sqlDJ.format(tableName), varMap)
+                    sqlIn, varMap = self.make_in_clause('PandaID', pandaIDs)
+                    self.execute(sqlDJ.format(tableName) + sqlIn, varMap)
                     iDel = self.cur.rowcount
                     if iDel > 0:
                         nDel += iDel
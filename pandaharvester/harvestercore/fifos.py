@@ -112,6 +112,23 @@ class FIFOBase(object):
         mainLog.debug('score={0}'.format(score))
         return retVal
 
+    # enqueue many objects in one transaction; obj_score_list is a list of (obj, score)
+    def put_many(self, obj_score_list, encode_item=True):
+        mainLog = self.make_logger(_logger, 'id={0}-{1}'.format(self.fifoName, self.get_pid()), method_name='put_many')
+        obj_serialized_score_list = []
+        timeNow_timestamp = time.time()
+        for obj, score in obj_score_list:
+            if encode_item:
+                obj_serialized = self.encode(obj)
+            else:
+                obj_serialized = obj
+            if score is None:
+                score = timeNow_timestamp
+            obj_serialized_score_list.append((obj_serialized, score))
+        retVal = self.fifo.put_many(obj_serialized_score_list)
+        mainLog.debug('put {0} objects'.format(len(obj_serialized_score_list)))
+        return retVal
+
     # enqueue by id, which is unique
     def putbyid(self, id, obj, score=None, encode_item=True):
         mainLog = self.make_logger(_logger, 'id={0}-{1}'.format(self.fifoName, self.get_pid()), method_name='putbyid')
@@ -143,6 +160,20 @@ class FIFOBase(object):
         mainLog.debug('called. protective={0}'.format(protective))
         return retVal
 
+    # dequeue to get the first fifo objects up to count
+    def get_many(self, count, timeout=None, protective=False, decode_item=True):
+        mainLog = self.make_logger(_logger, 'id={0}-{1}'.format(self.fifoName, self.get_pid()), method_name='get_many')
+        object_tuple_list = self.fifo.get_many(count, timeout, protective)
+        retList = []
+        for id, obj_serialized, score in object_tuple_list:
+            if obj_serialized is not None and decode_item:
+                obj = self.decode(obj_serialized)
+            else:
+                obj = obj_serialized
+            retList.append(FifoObject(id, obj, score))
+        mainLog.debug('got {0} objects. protective={1}'.format(len(retList), protective))
+        return retList
+
     # dequeue to get the last fifo object
     def getlast(self, timeout=None, protective=False, decode_item=True):
         mainLog = self.make_logger(_logger, 'id={0}-{1}'.format(self.fifoName, self.get_pid()), method_name='getlast')
@@ -280,9 +311,14 @@ class MonitorFIFO(FIFOBase):
             fifoMaxWorkersPerChunk = self.config.fifoMaxWorkersPerChunk
         except AttributeError:
             fifoMaxWorkersPerChunk = 500
+        try:
+            fifoMaxChunksPerPut = self.config.fifoMaxChunksPerPut
+        except AttributeError:
+            fifoMaxChunksPerPut = 100
         workspec_iterator = self.dbProxy.get_active_workers(fifoMaxWorkersToPopulate, seconds_ago)
         last_queueName = None
         workspec_chunk = []
+        obj_score_list = []
         timeNow_timestamp = time.time()
         score = timeNow_timestamp
         for workspec in workspec_iterator:
@@ -298,7 +334,10 @@ class MonitorFIFO(FIFOBase):
                 and len(workspec_chunk) < fifoMaxWorkersPerChunk:
                 workspec_chunk.append([workspec])
             else:
-                self.put((last_queueName, workspec_chunk), score)
+                obj_score_list.append(((last_queueName, workspec_chunk), score))
+                if len(obj_score_list) >= fifoMaxChunksPerPut:
+                    self.put_many(obj_score_list)
+                    obj_score_list = []
                 try:
                     score = timegm(workspec.modificationTime.utctimetuple())
                 except Exception:
@@ -306,7 +345,9 @@ class MonitorFIFO(FIFOBase):
                 workspec_chunk = [[workspec]]
                 last_queueName = workspec.computingSite
         if len(workspec_chunk) > 0:
-            self.put((last_queueName, workspec_chunk), score)
+            obj_score_list.append(((last_queueName, workspec_chunk), score))
+        if len(obj_score_list) > 0:
+            self.put_many(obj_score_list)
 
     def to_check_workers(self, check_interval=harvester_config.monitor.checkInterval):
         """
@@ -40,6 +40,9 @@ class FileSpec(SpecBase):
                  'todelete'
                  )
 
+    # attributes in addition to columns
+    __slots__ = ('associatedFiles',)
+
     # constructor
     def __init__(self):
         SpecBase.__init__(self)
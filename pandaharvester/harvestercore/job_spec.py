@@ -68,6 +68,9 @@ class JobSpec(SpecBase):
     # attributes to skip when slim reading
     skipAttrsToSlim = ('jobParams')
 
+    # attributes in addition to columns
+    __slots__ = ('events', 'zipEventMap', 'inFiles', 'outFiles', 'zipFileMap', 'workspec_list')
+
     # constructor
     def __init__(self):
         SpecBase.__init__(self)
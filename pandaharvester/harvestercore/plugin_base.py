@@ -3,6 +3,10 @@ from pandaharvester.harvestercore import core_utils
 
 
 class PluginBase(object):
+    # set False in plugins which keep per-call state in attributes, to be instantiated every time
+    # instead of being cached and reused by PluginFactory
+    reentrant = True
+
     def __init__(self, **kwarg):
         for tmpKey, tmpVal in iteritems(kwarg):
             setattr(self, tmpKey, tmpVal)
@@ -1,3 +1,6 @@
+import json
+import hashlib
+import threading
 from future.utils import iteritems
 
 from . import core_utils
@@ -6,6 +9,26 @@ from .db_interface import DBInterface
 # logger
 _logger = core_utils.setup_logger('plugin_factory')
 
+# generation of plugin configurations. Cached plugin instances of older generations are discarded
+_cache_generation = 0
+_cache_generation_lock = threading.Lock()
+
+
+# invalidate plugin instances cached in all factories, e.g. when queue configurations are changed
+def invalidate_plugin_cache():
+    global _cache_generation
+    with _cache_generation_lock:
+        _cache_generation += 1
+
+
+# make a stable hash of plugin configuration
+def _get_conf_hash(plugin_conf):
+    try:
+        confStr = json.dumps(plugin_conf, sort_keys=True, default=str)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.md5(confStr.encode('utf-8')).hexdigest()
+
 
 # plugin factory
 class PluginFactory(object):
@@ -13,9 +36,13 @@ class PluginFactory(object):
     def __init__(self, no_db=False):
         self.classMap = {}
         self.noDB = no_db
+        # cache of plugin instances per thread, since plugins may keep per-call state in attributes
+        # instances are reused only when the factory is called from long-lived threads, so that agents
+        # keep their worker threads across cycles. Threads made per cycle get new instances every time
+        self.localCache = threading.local()
 
     # get plugin
-    def get_plugin(self, plugin_conf):
+    def get_plugin(self, plugin_conf, config_id=None):
         # use module + class as key
         moduleName = plugin_conf['module']
         className = plugin_conf['name']
@@ -35,6 +62,25 @@ class PluginFactory(object):
             cls = getattr(mod, className)
             # add
             self.classMap[pluginKey] = cls
+        cls = self.classMap[pluginKey]
+        # plugins which are not reentrant are instantiated every time
+        if not getattr(cls, 'reentrant', True):
+            return self.make_plugin(cls, plugin_conf)
+        confHash = _get_conf_hash(plugin_conf)
+        if confHash is None:
+            return self.make_plugin(cls, plugin_conf)
+        instanceKey = (pluginKey, confHash, config_id)
+        localCache = self.localCache
+        # discard instances made with old configurations
+        if getattr(localCache, 'generation', None) != _cache_generation:
+            localCache.instanceMap = {}
+            localCache.generation = _cache_generation
+        if instanceKey not in localCache.instanceMap:
+            localCache.instanceMap[instanceKey] = self.make_plugin(cls, plugin_conf)
+        return localCache.instanceMap[instanceKey]
+
+    # instantiate plugin
+    def make_plugin(self, cls, plugin_conf):
         # make args
         args = {}
         for tmpKey, tmpVal in iteritems(plugin_conf):
@@ -45,6 +91,5 @@ class PluginFactory(object):
         if not self.noDB:
             args['dbInterface'] = DBInterface()
         # instantiate
-        cls = self.classMap[pluginKey]
         impl = cls(**args)
         return impl
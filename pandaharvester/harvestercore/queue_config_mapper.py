@@ -18,7 +18,7 @@ from .panda_queue_spec import PandaQueueSpec
 from . import core_utils
 from .core_utils import SingletonWithID
 from .db_proxy_pool import DBProxyPool as DBProxy
-from .plugin_factory import PluginFactory
+from .plugin_factory import PluginFactory, invalidate_plugin_cache
 from .queue_config_dump_spec import QueueConfigDumpSpec
 from .db_interface import DBInterface
 
@@ -168,6 +168,7 @@ class QueueConfigMapper(six.with_metaclass(SingletonWithID, object)):
     def __init__(self, update_db=True):
         self.lock = threading.Lock()
         self.lastUpdate = None
+        self.lastConfigIDs = None
         self.dbProxy = DBProxy()
         self.toUpdateDB = update_db
         try:
@@ -555,6 +556,12 @@ class QueueConfigMapper(six.with_metaclass(SingletonWithID, object)):
                 newQueueConfigWithID[dumpSpec.configID] = queueConfig
             self.queueConfigWithID = newQueueConfigWithID
             self.lastUpdate = datetime.datetime.utcnow()
+            # discard cached plugin instances if configs were changed
+            configIDs = set([queueConfig.configID for queueConfig in newQueueConfig.values()])
+            if self.lastConfigIDs is not None and configIDs != self.lastConfigIDs:
+                mainLog.debug('invalidate cached plugins since configs were changed')
+                invalidate_plugin_cache()
+            self.lastConfigIDs = configIDs
         # update database
         if self.toUpdateDB:
             self.dbProxy.fill_panda_queue_table(self.activeQueues.keys(), self)
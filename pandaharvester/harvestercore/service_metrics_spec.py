@@ -21,4 +21,8 @@ class ServiceMetricSpec(SpecBase):
 
         self.creationTime = datetime.datetime.utcnow()
         self.hostName = socket.getfqdn()
-        self.metrics = json.dumps(service_metrics)
\ No newline at end of file
+        self.metrics = json.dumps(service_metrics)
+
+    # install default values before restoring unpickled state, without the constructor which requires metrics
+    def init_state(self):
+        SpecBase.__init__(self)
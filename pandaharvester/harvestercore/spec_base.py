@@ -5,7 +5,7 @@ Base class for XyzSpec
 
 import json
 import pickle
-from future.utils import iteritems
+from future.utils import iteritems, with_metaclass
 
 try:
     from json.decoder import JSONDecodeError
@@ -28,53 +28,123 @@ def as_python_object(dct):
     return dct
 
 
+# meta class to build attribute metadata and __slots__ once per class
+class SpecMeta(type):
+    def __new__(mcs, name, bases, dct):
+        if 'attributesWithTypes' in dct:
+            # remove types
+            attributes = []
+            serializedAttrs = set()
+            for attr in dct['attributesWithTypes']:
+                attr, attrType = attr.split(':')
+                attrType = attrType.split()[0]
+                attributes.append(attr)
+                if attrType in ['blob']:
+                    serializedAttrs.add(attr)
+            dct['attributes'] = tuple(attributes)
+            dct['serializedAttrs'] = frozenset(serializedAttrs)
+        else:
+            attributes = []
+        dct['__slots__'] = tuple(dct.get('__slots__', ())) + tuple(attributes)
+        cls = type.__new__(mcs, name, bases, dct)
+        # attributes to be pickled
+        stateAttrs = []
+        for klass in reversed(cls.__mro__):
+            for attr in klass.__dict__.get('__slots__', ()):
+                if attr not in stateAttrs and attr not in ('changedAttrs', 'rawBlobs') \
+                        and attr not in cls.skipAttrsToPickle:
+                    stateAttrs.append(attr)
+        cls.stateAttrs = tuple(stateAttrs)
+        return cls
+
+
 # base class for XyzSpec
-class SpecBase(object):
+class SpecBase(with_metaclass(SpecMeta, object)):
+    # map of changed attributes and map of serialized attributes not decoded yet
+    __slots__ = ('changedAttrs', 'rawBlobs')
     # to be set
     attributesWithTypes = ()
     zeroAttrs = ()
     skipAttrsToSlim = ()
+    skipAttrsToPickle = ()
 
     # constructor
     def __init__(self):
-        # remove types
-        object.__setattr__(self, 'attributes', [])
-        object.__setattr__(self, 'serializedAttrs', set())
-        for attr in self.attributesWithTypes:
-            attr, attrType = attr.split(':')
-            attrType = attrType.split()[0]
-            self.attributes.append(attr)
-            if attrType in ['blob']:
-                self.serializedAttrs.add(attr)
         # install attributes
         for attr in self.attributes:
             if attr in self.zeroAttrs:
                 object.__setattr__(self, attr, 0)
             else:
                 object.__setattr__(self, attr, None)
-        # map of changed attributes
         object.__setattr__(self, 'changedAttrs', {})
+        object.__setattr__(self, 'rawBlobs', {})
 
     # override __setattr__ to collect changed attributes
     def __setattr__(self, name, value):
+        # blob attributes are marked as changed without deep comparison
+        if name in self.serializedAttrs:
+            self.rawBlobs.pop(name, None)
+            object.__setattr__(self, name, value)
+            self.changedAttrs[name] = value
+            return
         oldVal = getattr(self, name)
         object.__setattr__(self, name, value)
-        newVal = getattr(self, name)
         # collect changed attributes
-        if oldVal != newVal:
+        if oldVal != value:
             self.changedAttrs[name] = value
 
-    # keep state for pickle
+    # decode serialized attributes at the first access
+    def __getattr__(self, name):
+        try:
+            rawBlobs = object.__getattribute__(self, 'rawBlobs')
+        except AttributeError:
+            rawBlobs = {}
+        if name not in rawBlobs:
+            raise AttributeError("'{0}' object has no attribute '{1}'".format(self.__class__.__name__, name))
+        val = rawBlobs.pop(name)
+        try:
+            val = json.loads(val, object_hook=as_python_object)
+        except JSONDecodeError:
+            pass
+        object.__setattr__(self, name, val)
+        return val
+
+    # keep state for pickle as a compact tuple of values. stateAttrs is shared by all instances of the class
+    # so that pickle memoizes it when many specs are pickled together
     def __getstate__(self):
-        odict = self.__dict__.copy()
-        del odict['changedAttrs']
-        return odict
+        rawBlobs = self.rawBlobs
+        values = tuple(None if attr in rawBlobs else getattr(self, attr) for attr in self.stateAttrs)
+        return self.stateAttrs, values, rawBlobs.copy()
+
+    # install default values before restoring unpickled state. To be overridden by subclasses of which
+    # constructors take arguments
+    def init_state(self):
+        self.__init__()
 
     # restore state from the unpickled state values
     def __setstate__(self, state):
-        self.__init__()
-        for k, v in state.items():
-            object.__setattr__(self, k, v)
+        self.init_state()
+        if isinstance(state, dict):
+            # pickled with __dict__ by old versions
+            rawBlobs = state.get('rawBlobs', {})
+            for attr in self.stateAttrs:
+                if attr in state:
+                    object.__setattr__(self, attr, state[attr])
+        else:
+            stateAttrs, values, rawBlobs = state
+            if stateAttrs == self.stateAttrs:
+                for attr, val in zip(stateAttrs, values):
+                    object.__setattr__(self, attr, val)
+            else:
+                # pickled with different attributes
+                for attr, val in zip(stateAttrs, values):
+                    if attr in self.stateAttrs:
+                        object.__setattr__(self, attr, val)
+        # serialized attributes not decoded yet
+        for attr in rawBlobs:
+            if attr in self.serializedAttrs:
+                self.rawBlobs[attr] = rawBlobs[attr]
+                object.__delattr__(self, attr)
 
     # reset changed attribute list
     def reset_changed_list(self):
@@ -103,21 +173,33 @@ class SpecBase(object):
                 val = None
             else:
                 val = values[attr]
+                # keep serialized attributes to decode them at the first access
                 if attr in self.serializedAttrs and val is not None:
+                    self.rawBlobs[attr] = val
                     try:
-                        val = json.loads(val, object_hook=as_python_object)
-                    except JSONDecodeError:
+                        object.__delattr__(self, attr)
+                    except AttributeError:
                         pass
+                    continue
+            self.rawBlobs.pop(attr, None)
             object.__setattr__(self, attr, val)
 
     # set blob attribute
     def set_blob_attribute(self, key, val):
         try:
             val = json.loads(val, object_hook=as_python_object)
+            self.rawBlobs.pop(key, None)
             object.__setattr__(self, key, val)
         except JSONDecodeError:
             pass
 
+    # get serialized value of attribute
+    def get_serialized_value(self, attr):
+        # not decoded yet
+        if attr in self.rawBlobs:
+            return self.rawBlobs[attr]
+        return json.dumps(getattr(self, attr), cls=PythonObjectEncoder)
+
     # return column names for INSERT
     def column_names(cls, prefix=None, slim=False):
         ret = ""
@@ -164,14 +246,12 @@ class SpecBase(object):
             if only_changed:
                 if attr not in self.changedAttrs:
                     continue
-            val = getattr(self, attr)
-            if val is None:
-                if attr in self.zeroAttrs:
-                    val = 0
-                else:
-                    val = None
             if attr in self.serializedAttrs:
-                val = json.dumps(val, cls=PythonObjectEncoder)
+                val = self.get_serialized_value(attr)
+            else:
+                val = getattr(self, attr)
+                if val is None and attr in self.zeroAttrs:
+                    val = 0
             ret[':%s' % attr] = val
         return ret
 
@@ -183,14 +263,12 @@ class SpecBase(object):
             if only_changed:
                 if attr not in self.changedAttrs:
                     continue
-            val = getattr(self, attr)
-            if val is None:
-                if attr in self.zeroAttrs:
-                    val = 0
-                else:
-                    val = None
             if attr in self.serializedAttrs:
-                val = json.dumps(val, cls=PythonObjectEncoder)
+                val = self.get_serialized_value(attr)
+            else:
+                val = getattr(self, attr)
+                if val is None and attr in self.zeroAttrs:
+                    val = 0
             ret.append(val)
         return ret
 
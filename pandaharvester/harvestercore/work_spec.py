@@ -97,6 +97,12 @@ class WorkSpec(SpecBase):
     # attributes to skip when slim reading
     skipAttrsToSlim = ('workParams', 'workAttributes')
 
+    # attributes to skip when pickling
+    skipAttrsToPickle = ('isNew', 'new_status')
+
+    # attributes in addition to columns
+    __slots__ = ('isNew', 'nextLookup', 'jobspec_list', 'pandaid_list', 'new_status', 'pilot_closed')
+
     # constructor
     def __init__(self):
         SpecBase.__init__(self)
@@ -107,13 +113,6 @@ class WorkSpec(SpecBase):
         object.__setattr__(self, 'new_status', False)
         object.__setattr__(self, 'pilot_closed', False)
 
-    # keep state for pickle
-    def __getstate__(self):
-        odict = SpecBase.__getstate__(self)
-        del odict['isNew']
-        del odict['new_status']
-        return odict
-
     # set status
     def set_status(self, value):
         # prevent reverse transition
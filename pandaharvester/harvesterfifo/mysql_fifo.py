@@ -160,6 +160,17 @@ class MysqlFifo(PluginBase):
         params = (obj, score)
         self.execute(sql_push, params)
 
+    def _push_many(self, obj_score_list):
+        sql_push = (
+                'INSERT INTO {table_name} '
+                '(item, score) '
+                'VALUES (%s, %s) '
+            ).format(table_name=self.tableName)
+        params_list = [(obj, score) for obj, score in obj_score_list]
+        self.executemany(sql_push, params_list)
+        n_row = self.cur.rowcount
+        return n_row
+
     def _push_by_id(self, id, obj, score):
         sql_push = (
                 'INSERT IGNORE INTO {table_name} '
@@ -238,6 +249,58 @@ class MysqlFifo(PluginBase):
             wait = min(max_wait, tries/10.0 + wait)
         return None
 
+    def _pop_many(self, count, timeout=None, protective=False):
+        sql_pop_get_many = (
+                'SELECT id, item, score FROM {table_name} '
+                'WHERE temporary = 0 '
+                'ORDER BY score LIMIT %s '
+                'FOR UPDATE '
+            ).format(table_name=self.tableName)
+        sql_pop_to_temp_template = (
+                'UPDATE {table_name} SET temporary = 1 '
+                'WHERE id in ({placeholders} ) AND temporary = 0 '
+            )
+        sql_pop_del_template = (
+                'DELETE FROM {table_name} '
+                'WHERE id in ({placeholders} ) AND temporary = 0 '
+            )
+        keep_polling = True
+        _exc = None
+        wait = 0.1
+        max_wait = 2
+        tries = 0
+        last_attempt_timestamp = time.time()
+        while keep_polling:
+            try:
+                self.execute(sql_pop_get_many, (count,))
+                res = self.cur.fetchall()
+                if len(res) > 0:
+                    ids = [id for id, obj, score in res]
+                    placeholders_str = ','.join([' %s'] * len(ids))
+                    if protective:
+                        sql_pop = sql_pop_to_temp_template.format(
+                                table_name=self.tableName, placeholders=placeholders_str)
+                    else:
+                        sql_pop = sql_pop_del_template.format(
+                                table_name=self.tableName, placeholders=placeholders_str)
+                    self.execute(sql_pop, ids)
+                self.commit()
+            except Exception as _e:
+                self.rollback()
+                _exc = _e
+            else:
+                if len(res) > 0:
+                    return [(id, obj, score) for id, obj, score in res]
+            now_timestamp = time.time()
+            if timeout is None or (now_timestamp - last_attempt_timestamp) >= timeout:
+                keep_polling = False
+                if _exc is not None:
+                    raise _exc
+            tries += 1
+            time.sleep(wait)
+            wait = min(max_wait, tries/10.0 + wait)
+        return []
+
     def _peek(self, mode='first', id=None, skip_item=False):
         if skip_item:
             columns_str = 'id, score'
@@ -306,6 +369,17 @@ class MysqlFifo(PluginBase):
             self.rollback()
             raise _e
 
+    # enqueue many objects with priority scores in one transaction
+    def put_many(self, obj_score_list):
+        try:
+            retVal = self._push_many(obj_score_list)
+            self.commit()
+        except Exception as _e:
+            self.rollback()
+            raise _e
+        else:
+            return retVal
+
     # enqueue by id
     def putbyid(self, id, obj, score):
         try:
@@ -321,6 +395,10 @@ class MysqlFifo(PluginBase):
     def get(self, timeout=None, protective=False):
         return self._pop(timeout=timeout, protective=protective)
 
+    # dequeue the first objects up to count
+    def get_many(self, count, timeout=None, protective=False):
+        return self._pop_many(count, timeout=timeout, protective=protective)
+
     # dequeue the last object
     def getlast(self, timeout=None, protective=False):
         return self._pop(timeout=timeout, protective=protective, mode='last')
@@ -372,16 +450,18 @@ class MysqlFifo(PluginBase):
             sql_restore = (
                     'UPDATE {table_name} SET temporary = 0 WHERE temporary != 0 '
                 ).format(table_name=self.tableName)
+            params = None
         elif isinstance(ids, (list, tuple)):
             placeholders_str = ','.join([' %s'] * len(ids))
             sql_restore = (
                     'UPDATE {table_name} SET temporary = 0 '
                     'WHERE temporary != 0 AND id in ({placeholders} ) '
                 ).format(table_name=self.tableName, placeholders=placeholders_str)
+            params = ids
         else:
             raise TypeError('ids should be list or tuple or None')
         try:
-            self.execute(sql_restore)
+            self.execute(sql_restore, params)
             self.commit()
         except Exception as _e:
             self.rollback()
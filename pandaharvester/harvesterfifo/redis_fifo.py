@@ -108,6 +108,42 @@ class RedisFifo(PluginBase):
                 break
         return id, item, score
 
+    def _pop_many(self, count, timeout=None, protective=False):
+        wait = 0.1
+        max_wait = 2
+        tries = 1
+        last_attempt_timestamp = time.time()
+        retList = []
+        while True:
+            with self.qconn.pipeline() as pipeline:
+                try:
+                    pipeline.watch(self.id_score, self.id_item, self.id_temp)
+                    id_score_list = pipeline.zrange(self.id_score, 0, count - 1, withscores=True)
+                    if len(id_score_list) > 0:
+                        ids = [id for id, score in id_score_list]
+                        items = pipeline.hmget(self.id_item, ids)
+                        pipeline.multi()
+                        if protective:
+                            pipeline.sadd(self.id_temp, *ids)
+                            pipeline.zrem(self.id_score, *ids)
+                        else:
+                            pipeline.srem(self.id_temp, *ids)
+                            pipeline.hdel(self.id_item, *ids)
+                            pipeline.zrem(self.id_score, *ids)
+                        pipeline.execute()
+                        retList = [(id, item, score) for (id, score), item in zip(id_score_list, items)]
+                except redis.WatchError:
+                    continue
+            if len(retList) > 0:
+                break
+            tries += 1
+            now_timestamp = time.time()
+            if timeout is None or (now_timestamp - last_attempt_timestamp) >= timeout:
+                break
+            time.sleep(wait)
+            wait = min(max_wait, tries/10.0 + wait)
+        return retList
+
     # number of objects in queue
     def size(self):
         return len(self)
@@ -139,6 +175,32 @@ class RedisFifo(PluginBase):
             time.sleep(0.0001)
         return False
 
+    # enqueue many objects with priority scores in one pipeline
+    def put_many(self, item_score_list):
+        n_put = 0
+        with self.qconn.pipeline() as pipeline:
+            id_item_score_list = []
+            for item, score in item_score_list:
+                id = random_id()
+                pipeline.execute_command('ZADD', self.id_score, 'NX', score, id)
+                pipeline.hsetnx(self.id_item, id, item)
+                id_item_score_list.append((id, item, score))
+            # errors of commands are returned in resVal not to raise after other commands are applied,
+            # so that only failed objects are put again
+            resVal = pipeline.execute(raise_on_error=False)
+        for i, (id, item, score) in enumerate(id_item_score_list):
+            if resVal[2*i] == 1 and resVal[2*i+1] == 1:
+                n_put += 1
+            else:
+                # id collision or error; clean up and fall back to put one by one
+                if resVal[2*i] == 1:
+                    self.qconn.zrem(self.id_score, id)
+                if resVal[2*i+1] == 1:
+                    self.qconn.hdel(self.id_item, id)
+                if self.put(item, score):
+                    n_put += 1
+        return n_put
+
     # enqueue by id
     def putbyid(self, id, item, score):
         with self.qconn.pipeline() as pipeline:
@@ -162,6 +224,10 @@ class RedisFifo(PluginBase):
     def get(self, timeout=None, protective=False):
         return self._pop(timeout=timeout, protective=protective, mode='first')
 
+    # dequeue the first objects up to count
+    def get_many(self, count, timeout=None, protective=False):
+        return self._pop_many(count, timeout=timeout, protective=protective)
+
     # dequeue the last object
     def getlast(self, timeout=None, protective=False):
         return self._pop(timeout=timeout, protective=protective, mode='last')
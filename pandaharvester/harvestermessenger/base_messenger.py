@@ -51,6 +51,14 @@ class BaseMessenger(PluginBase):
     def acknowledge_events_files(self, workspec):
         pass
 
+    # take snapshots of access points to look up files during the check of workers
+    def take_snapshots(self, workspec_list):
+        pass
+
+    # release snapshots of access points
+    def release_snapshots(self, workspec_list):
+        pass
+
     # setup access points
     def setup_access_points(self, workspec_list):
         pass
@@ -1,5 +1,7 @@
 import json
 import os
+import copy
+import time
 import shutil
 import datetime
 
@@ -13,9 +15,15 @@ try:
 except ImportError:
     import subprocess
 
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
 import uuid
 import os.path
 import fnmatch
+import threading
 import distutils.spawn
 import multiprocessing
 from future.utils import iteritems
@@ -24,6 +32,7 @@ from concurrent.futures import ThreadPoolExecutor as Pool
 
 from pandaharvester.harvestercore import core_utils
 from pandaharvester.harvestercore.work_spec import WorkSpec
+from pandaharvester.harvestermisc.inotify_utils import get_worker_file_watcher
 from .base_messenger import BaseMessenger
 from pandaharvester.harvesterconfig import harvester_config
 
@@ -125,7 +134,126 @@ class SharedFileMessenger(BaseMessenger):
     def __init__(self, **kwarg):
         self.jobSpecFileFormat = 'json'
         self.stripJobParams = False
+        # lifetime in sec of parsed json files which are not looked up
+        self.jsonCacheLifetime = 3600
+        # json files larger than this size in bytes, e.g. job reports, are not cached
+        self.jsonCacheMaxFileSize = 65536
         BaseMessenger.__init__(self, **kwarg)
+        # snapshots of access points. accessPoint: {'names': set of file names, 'entries': {name: DirEntry},
+        # 'stats': {name: (size, mtime)}}
+        self.snapshotMap = dict()
+        # parsed json files. path: (size, mtime, data, lastLookupTime)
+        self.jsonCache = dict()
+        self.jsonCachePurgeTime = time.time()
+        self.snapshotLock = threading.Lock()
+        # watcher of files written by workers
+        self.fileWatcher = get_worker_file_watcher()
+
+    # get all access points of a worker
+    def get_access_points(self, workspec):
+        accessPoints = set([workspec.get_access_point()])
+        if workspec.pandaid_list:
+            for pandaID in workspec.pandaid_list:
+                accessPoints.add(self.get_access_point(workspec, pandaID))
+        return accessPoints
+
+    # take snapshots of access points of workers. Each access point is listed at the first lookup
+    # and files are looked up in the snapshot until release_snapshots is called
+    def take_snapshots(self, workspec_list):
+        timeNow = time.time()
+        with self.snapshotLock:
+            for workSpec in workspec_list:
+                accessPoints = self.get_access_points(workSpec)
+                for accessPoint in accessPoints:
+                    self.snapshotMap[accessPoint] = None
+                # watch access points to get notified when files are written
+                if self.fileWatcher is not None:
+                    self.fileWatcher.register(workSpec.workerID, accessPoints)
+            # purge parsed json files of gone workers
+            if timeNow - self.jsonCachePurgeTime > 60:
+                for jsonFilePath in list(self.jsonCache):
+                    if timeNow - self.jsonCache[jsonFilePath][3] > self.jsonCacheLifetime:
+                        del self.jsonCache[jsonFilePath]
+                self.jsonCachePurgeTime = timeNow
+
+    # release snapshots of access points of workers
+    def release_snapshots(self, workspec_list):
+        with self.snapshotLock:
+            for workSpec in workspec_list:
+                for accessPoint in self.get_access_points(workSpec):
+                    self.snapshotMap.pop(accessPoint, None)
+
+    # get snapshot of access point. None if snapshot is not taken
+    def _get_snapshot(self, access_point):
+        with self.snapshotLock:
+            if access_point not in self.snapshotMap:
+                return None
+            snapshot = self.snapshotMap[access_point]
+        if snapshot is None:
+            # list the directory. Stats are taken from the entries only when files are looked up
+            try:
+                entries = dict((entry.name, entry) for entry in scandir(access_point))
+            except OSError:
+                entries = dict()
+            snapshot = {'names': set(entries), 'entries': entries, 'stats': dict()}
+            with self.snapshotLock:
+                if access_point in self.snapshotMap:
+                    self.snapshotMap[access_point] = snapshot
+        return snapshot
+
+    # update snapshot after a file is made or removed by the messenger
+    def _update_snapshot(self, access_point, file_name, exists):
+        with self.snapshotLock:
+            snapshot = self.snapshotMap.get(access_point)
+            if snapshot is None:
+                return
+            snapshot['stats'].pop(file_name, None)
+            snapshot['entries'].pop(file_name, None)
+            if exists:
+                snapshot['names'].add(file_name)
+            else:
+                snapshot['names'].discard(file_name)
+
+    # check if a file exists in access point
+    def _file_exists(self, access_point, file_name):
+        snapshot = self._get_snapshot(access_point)
+        if snapshot is None:
+            return os.path.exists(os.path.join(access_point, file_name))
+        return file_name in snapshot['names']
+
+    # get size and modification time of a file in access point
+    def _get_file_stat(self, access_point, file_name):
+        snapshot = self._get_snapshot(access_point)
+        if snapshot is not None and file_name in snapshot['stats']:
+            return snapshot['stats'][file_name]
+        if snapshot is not None and file_name in snapshot['entries']:
+            tmpStat = snapshot['entries'][file_name].stat()
+        else:
+            tmpStat = os.stat(os.path.join(access_point, file_name))
+        fileStat = (tmpStat.st_size, tmpStat.st_mtime)
+        if snapshot is not None:
+            snapshot['stats'][file_name] = fileStat
+        return fileStat
+
+    # load a json file in access point. Small files are not parsed again unless the size or mtime is changed.
+    # A copy is returned so that callers can modify it without corrupting the cache
+    def _load_json(self, access_point, file_name):
+        jsonFilePath = os.path.join(access_point, file_name)
+        fileStat = self._get_file_stat(access_point, file_name)
+        timeNow = time.time()
+        with self.snapshotLock:
+            cachedItem = self.jsonCache.get(jsonFilePath)
+            if cachedItem is not None and cachedItem[:2] == fileStat:
+                self.jsonCache[jsonFilePath] = cachedItem[:3] + (timeNow,)
+                return copy.deepcopy(cachedItem[2])
+        with open(jsonFilePath) as jsonFile:
+            data = json.load(jsonFile)
+        with self.snapshotLock:
+            if fileStat[0] <= self.jsonCacheMaxFileSize:
+                self.jsonCache[jsonFilePath] = fileStat + (copy.deepcopy(data), timeNow)
+            else:
+                self.jsonCache.pop(jsonFilePath, None)
+        return data
 
     # get access point
     def get_access_point(self, workspec, panda_id):
@@ -150,30 +278,28 @@ class SharedFileMessenger(BaseMessenger):
             jsonFilePath = os.path.join(accessPoint, jsonAttrsFileName)
             tmpLog.debug('looking for attributes file {0}'.format(jsonFilePath))
             retDict = dict()
-            if not os.path.exists(jsonFilePath):
+            if not self._file_exists(accessPoint, jsonAttrsFileName):
                 # not found
                 tmpLog.debug('not found attributes file')
             else:
                 try:
-                    with open(jsonFilePath) as jsonFile:
-                        retDict = json.load(jsonFile)
+                    retDict = dict(self._load_json(accessPoint, jsonAttrsFileName))
                 except Exception:
                     tmpLog.debug('failed to load {0}'.format(jsonFilePath))
             # look for job report
             jsonFilePath = os.path.join(accessPoint, jsonJobReport)
             tmpLog.debug('looking for job report file {0}'.format(jsonFilePath))
             sw_checkjobrep = core_utils.get_stopwatch()
-            if not os.path.exists(jsonFilePath):
+            if not self._file_exists(accessPoint, jsonJobReport):
                 # not found
                 tmpLog.debug('not found job report file')
             else:
                 try:
                     sw_readrep = core_utils.get_stopwatch()
-                    with open(jsonFilePath) as jsonFile:
-                        tmpDict = json.load(jsonFile)
+                    tmpDict = self._load_json(accessPoint, jsonJobReport)
                     retDict['metaData'] = tmpDict
-                    tmpLog.debug('got {0} kB of job report. {1} sec.'.format(os.stat(jsonFilePath).st_size / 1024,
-                                                                             sw_readrep.get_elapsed_time()))
+                    tmpLog.debug('got {0} kB of job report. {1} sec.'.format(
+                        self._get_file_stat(accessPoint, jsonJobReport)[0] / 1024, sw_readrep.get_elapsed_time()))
                     numofreads += 1
                 except Exception:
                     tmpLog.debug('failed to load {0}'.format(jsonFilePath))
@@ -198,11 +324,11 @@ class SharedFileMessenger(BaseMessenger):
             readJsonPath = jsonFilePath + suffixReadJson
             # first look for json.read which is not yet acknowledged
             tmpLog.debug('looking for output file {0}'.format(readJsonPath))
-            if os.path.exists(readJsonPath):
+            if self._file_exists(accessPoint, jsonOutputsFileName + suffixReadJson):
                 pass
             else:
                 tmpLog.debug('looking for output file {0}'.format(jsonFilePath))
-                if not os.path.exists(jsonFilePath):
+                if not self._file_exists(accessPoint, jsonOutputsFileName):
                     # not found
                     tmpLog.debug('not found')
                     continue
@@ -210,6 +336,8 @@ class SharedFileMessenger(BaseMessenger):
                     tmpLog.debug('found')
                     # rename to prevent from being overwritten
                     os.rename(jsonFilePath, readJsonPath)
+                    self._update_snapshot(accessPoint, jsonOutputsFileName, False)
+                    self._update_snapshot(accessPoint, jsonOutputsFileName + suffixReadJson, True)
                 except Exception:
                     tmpLog.error('failed to rename json')
                     continue
@@ -233,6 +361,15 @@ class SharedFileMessenger(BaseMessenger):
                 sizeMap = dict()
                 chksumMap = dict()
                 eventsList = dict()
+                # calculate missing checksums in one go
+                pfnsToSum = set()
+                for tmpEventMapList in loadDict.values():
+                    if isinstance(tmpEventMapList, list):
+                        for tmpEventInfo in tmpEventMapList:
+                            if isinstance(tmpEventInfo, dict) and 'chksum' not in tmpEventInfo \
+                                    and 'path' in tmpEventInfo:
+                                pfnsToSum.add(tmpEventInfo['path'])
+                calculatedChksumMap = core_utils.calc_adler32_bulk(pfnsToSum)
                 for tmpPandaID, tmpEventMapList in iteritems(loadDict):
                     tmpPandaID = long(tmpPandaID)
                     # test if tmpEventMapList is a list
@@ -275,6 +412,8 @@ class SharedFileMessenger(BaseMessenger):
                             if pfn not in chksumMap:
                                 if 'chksum' in tmpEventInfo:
                                     chksumMap[pfn] = tmpEventInfo['chksum']
+                                elif pfn in calculatedChksumMap:
+                                    chksumMap[pfn] = calculatedChksumMap[pfn]
                                 else:
                                     chksumMap[pfn] = core_utils.calc_adler32(pfn)
                             tmpFileDict['chksum'] = chksumMap[pfn]
@@ -302,10 +441,12 @@ class SharedFileMessenger(BaseMessenger):
                         json.dump(eventsList, f)
                         f.close()
                         os.rename(newName, curName)
+                        self._update_snapshot(accessPoint, jsonEventsUpdateFileName, True)
             # remove empty file
             if toSkip or nData == 0:
                 try:
                     os.remove(readJsonPath)
+                    self._update_snapshot(accessPoint, jsonOutputsFileName + suffixReadJson, False)
                 except Exception:
                     pass
             tmpLog.debug('got {0} files for PandaID={1}'.format(nData, pandaID))
@@ -320,15 +461,14 @@ class SharedFileMessenger(BaseMessenger):
         # look for the json just under the access point
         jsonFilePath = os.path.join(workspec.get_access_point(), jsonJobRequestFileName)
         tmpLog.debug('looking for job request file {0}'.format(jsonFilePath))
-        if not os.path.exists(jsonFilePath):
+        if not self._file_exists(workspec.get_access_point(), jsonJobRequestFileName):
             # not found
             tmpLog.debug('not found')
             return False
         # read nJobs
         try:
-            with open(jsonFilePath) as jsonFile:
-                tmpDict = json.load(jsonFile)
-                nJobs = tmpDict['nJobs']
+            tmpDict = self._load_json(workspec.get_access_point(), jsonJobRequestFileName)
+            nJobs = tmpDict['nJobs']
         except Exception:
             # request 1 job by default
             nJobs = 1
@@ -401,13 +541,12 @@ class SharedFileMessenger(BaseMessenger):
         # look for the json just under the access point
         jsonFilePath = os.path.join(workspec.get_access_point(), jsonEventsRequestFileName)
         tmpLog.debug('looking for event request file {0}'.format(jsonFilePath))
-        if not os.path.exists(jsonFilePath):
+        if not self._file_exists(workspec.get_access_point(), jsonEventsRequestFileName):
             # not found
             tmpLog.debug('not found')
             return {}
         try:
-            with open(jsonFilePath) as jsonFile:
-                retDict = json.load(jsonFile)
+            retDict = dict(self._load_json(workspec.get_access_point(), jsonEventsRequestFileName))
         except Exception:
             tmpLog.debug('failed to load json')
             return {}
@@ -459,17 +598,19 @@ class SharedFileMessenger(BaseMessenger):
             readJsonPath = jsonFilePath + suffixReadJson
             # first look for json.read which is not yet acknowledged
             tmpLog.debug('looking for event update file {0}'.format(readJsonPath))
-            if os.path.exists(readJsonPath):
+            if self._file_exists(accessPoint, jsonEventsUpdateFileName + suffixReadJson):
                 pass
             else:
                 tmpLog.debug('looking for event update file {0}'.format(jsonFilePath))
-                if not os.path.exists(jsonFilePath):
+                if not self._file_exists(accessPoint, jsonEventsUpdateFileName):
                     # not found
                     tmpLog.debug('not found')
                     continue
                 try:
                     # rename to prevent from being overwritten
                     os.rename(jsonFilePath, readJsonPath)
+                    self._update_snapshot(accessPoint, jsonEventsUpdateFileName, False)
+                    self._update_snapshot(accessPoint, jsonEventsUpdateFileName + suffixReadJson, True)
                 except Exception:
                     tmpLog.error('failed to rename json')
                     continue
@@ -490,6 +631,7 @@ class SharedFileMessenger(BaseMessenger):
             if nData == 0:
                 try:
                     os.remove(readJsonPath)
+                    self._update_snapshot(accessPoint, jsonEventsUpdateFileName + suffixReadJson, False)
                 except Exception:
                     pass
             tmpLog.debug('got {0} events for PandaID={1}'.format(nData, pandaID))
@@ -509,6 +651,7 @@ class SharedFileMessenger(BaseMessenger):
                 jsonFilePath += suffixReadJson
                 jsonFilePath_rename = jsonFilePath + '.' + str(datetime.datetime.utcnow())
                 os.rename(jsonFilePath, jsonFilePath_rename)
+                self._update_snapshot(accessPoint, jsonEventsUpdateFileName + suffixReadJson, False)
             except Exception:
                 pass
             try:
@@ -516,6 +659,7 @@ class SharedFileMessenger(BaseMessenger):
                 jsonFilePath += suffixReadJson
                 jsonFilePath_rename = jsonFilePath + '.' + str(datetime.datetime.utcnow())
                 os.rename(jsonFilePath, jsonFilePath_rename)
+                self._update_snapshot(accessPoint, jsonOutputsFileName + suffixReadJson, False)
             except Exception:
                 pass
         tmpLog.debug('done')
@@ -595,6 +739,7 @@ class SharedFileMessenger(BaseMessenger):
                 jsonFilePath = os.path.join(accessPoint, jsonOutputsFileName)
                 with open(jsonFilePath, 'w') as jsonFile:
                     json.dump(fileDict, jsonFile)
+                self._update_snapshot(accessPoint, jsonOutputsFileName, True)
                 tmpLog.debug('done')
             return True
         except Exception:
@@ -610,13 +755,12 @@ class SharedFileMessenger(BaseMessenger):
         jsonFilePath = os.path.join(workspec.get_access_point(), pandaIDsFile)
         tmpLog.debug('looking for PandaID file {0}'.format(jsonFilePath))
         retVal = []
-        if not os.path.exists(jsonFilePath):
+        if not self._file_exists(workspec.get_access_point(), pandaIDsFile):
             # not found
             tmpLog.debug('not found')
             return retVal
         try:
-            with open(jsonFilePath) as jsonFile:
-                retVal = json.load(jsonFile)
+            retVal = list(self._load_json(workspec.get_access_point(), pandaIDsFile))
         except Exception:
             tmpLog.debug('failed to load json')
             return retVal
@@ -631,7 +775,7 @@ class SharedFileMessenger(BaseMessenger):
         # look for the json just under the access point
         jsonFilePath = os.path.join(workspec.get_access_point(), killWorkerFile)
         tmpLog.debug('looking for kill request file {0}'.format(jsonFilePath))
-        if not os.path.exists(jsonFilePath):
+        if not self._file_exists(workspec.get_access_point(), killWorkerFile):
             # not found
             tmpLog.debug('not found')
             return False
@@ -646,7 +790,7 @@ class SharedFileMessenger(BaseMessenger):
         # json file
         jsonFilePath = os.path.join(workspec.get_access_point(), heartbeatFile)
         tmpLog.debug('looking for heartbeat file {0}'.format(jsonFilePath))
-        if not os.path.exists(jsonFilePath): # no heartbeat file was found
+        if not self._file_exists(workspec.get_access_point(), heartbeatFile): # no heartbeat file was found
             tmpLog.debug('startTime: {0}, now: {1}'.format(workspec.startTime, datetime.datetime.utcnow()))
             if not workspec.startTime:
                 # the worker didn't even have time to start
@@ -661,7 +805,8 @@ class SharedFileMessenger(BaseMessenger):
                 tmpLog.debug('not found')
                 return None
         try:
-            mtime = datetime.datetime.utcfromtimestamp(os.path.getmtime(jsonFilePath))
+            mtime = datetime.datetime.utcfromtimestamp(self._get_file_stat(workspec.get_access_point(),
+                                                                           heartbeatFile)[1])
             tmpLog.debug('last modification time : {0}'.format(mtime))
             if datetime.datetime.utcnow() - mtime > datetime.timedelta(minutes=time_limit):
                 tmpLog.debug('too old')
@@ -12,7 +12,7 @@ from pandaharvester.harvestercore import core_utils
 from pandaharvester import panda_pkg_info
 from pandaharvester.harvestermisc import generic_utils
 from pandaharvester.harvestercore.work_spec import WorkSpec
-from pandaharvester.harvestermisc.info_utils import PandaQueuesDict
+from pandaharvester.harvestermisc.info_utils import get_panda_queues_dict
 
 _base_logger = core_utils.setup_logger('apfmon')
 NO_CE = 'noCE'
@@ -109,7 +109,7 @@ class Apfmon(object):
 
             # get the active queues from the config mapper
             all_sites = self.queue_config_mapper.get_active_queues().keys()
-            panda_queues_dict = PandaQueuesDict()
+            panda_queues_dict = get_panda_queues_dict()
 
             # publish the active queues to APF mon in shards
             for sites in generic_utils.create_shards(all_sites, 20):
@@ -209,7 +209,7 @@ class Apfmon(object):
 
             # get the active queues from the config mapper
             all_sites = self.queue_config_mapper.get_active_queues().keys()
-            panda_queues_dict = PandaQueuesDict()
+            panda_queues_dict = get_panda_queues_dict()
 
             site_info = panda_queues_dict.get(site, dict())
             if not site_info:
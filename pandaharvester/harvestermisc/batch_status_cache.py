@@ -0,0 +1,64 @@
+"""
+status of batch jobs listed with one query per scheduler and shared by all threads for a short time
+
+"""
+import time
+import threading
+
+import six
+
+from pandaharvester.harvestercore import core_utils
+from pandaharvester.harvestercore.core_utils import SingletonWithID
+
+# logger
+baseLogger = core_utils.setup_logger('batch_status_cache')
+
+
+class BatchStatusCache(six.with_metaclass(SingletonWithID, object)):
+    """
+    Snapshot of batchID -> batch status of all jobs in a scheduler. One instance per id, i.e. scheduler,
+    in a process. The snapshot is taken again when it is older than the lifetime, or when some batch jobs
+    are missing in it and it was taken before they are asked for, e.g. batch jobs submitted in the meantime
+    """
+    def __init__(self, *args, **kwargs):
+        self.scheduler = str(kwargs.get('id'))
+        self.lock = threading.Lock()
+        self.statusMap = dict()
+        self.updateTime = None
+        self.nHits = 0
+        self.nMisses = 0
+        self.nQueries = 0
+
+    # get status of batch jobs as a dict of batchID: status, with query_func which returns a dict
+    # of batchID: status of all jobs in the scheduler. Batch jobs not in the scheduler are missing in the dict
+    def get_status(self, batch_id_list, query_func, lifetime=30):
+        tmpLog = core_utils.make_logger(baseLogger, 'scheduler={0}'.format(self.scheduler),
+                                        method_name='get_status')
+        timeCalled = time.time()
+        batchIDs = set(batch_id_list)
+        with self.lock:
+            toQuery = False
+            if self.updateTime is None or timeCalled - self.updateTime >= lifetime:
+                toQuery = True
+            elif self.updateTime < timeCalled and not batchIDs.issubset(self.statusMap):
+                toQuery = True
+            if toQuery:
+                self.nMisses += len(batchIDs)
+                self.nQueries += 1
+                timeNow = time.time()
+                self.statusMap = query_func()
+                self.updateTime = timeNow
+                tmpLog.debug('got {0} jobs in {1:.3f} sec'.format(len(self.statusMap), time.time() - timeNow))
+            else:
+                self.nHits += len(batchIDs)
+            retMap = dict()
+            for batchID in batchIDs:
+                if batchID in self.statusMap:
+                    retMap[batchID] = self.statusMap[batchID]
+        return retMap
+
+    # get hit and miss counters
+    def get_stats(self):
+        with self.lock:
+            return {'nHits': self.nHits, 'nMisses': self.nMisses, 'nQueries': self.nQueries,
+                    'nJobs': len(self.statusMap), 'updateTime': self.updateTime}
@@ -1,3 +1,5 @@
+import threading
+
 from future.utils import iteritems
 
 from pandaharvester.harvesterconfig import harvester_config
@@ -6,6 +8,11 @@ from pandaharvester.harvestercore.db_interface import DBInterface
 
 harvesterID = harvester_config.master.harvester_id
 
+# snapshots of PanDA queue info shared by all threads. cacher_key: PandaQueuesDict
+_snapshot_map = dict()
+_snapshot_lock = threading.Lock()
+
+
 class PandaQueuesDict(dict, PluginBase):
     """
     Dictionary of PanDA queue info from DB by cacher
@@ -15,10 +22,15 @@ class PandaQueuesDict(dict, PluginBase):
     def __init__(self, **kwarg):
         dict.__init__(self)
         PluginBase.__init__(self, **kwarg)
+        # PanDA Queue name -> PanDA Resource name
+        self.resource_name_map = dict()
+        # update time of the cache used as a version stamp
+        self.last_update = None
         dbInterface = DBInterface()
         cacher_key = kwarg.get('cacher_key', 'panda_queues.json')
         panda_queues_cache = dbInterface.get_cache(cacher_key)
         if panda_queues_cache and isinstance(panda_queues_cache.data, dict):
+            self.last_update = panda_queues_cache.lastUpdate
             panda_queues_dict = panda_queues_cache.data
             for (k, v) in iteritems(panda_queues_dict):
                 try:
@@ -28,20 +40,19 @@ class PandaQueuesDict(dict, PluginBase):
                     pass
                 else:
                     self[panda_resource] = v
+                    self.resource_name_map[k] = panda_resource
 
     def __getitem__(self, panda_resource):
         if panda_resource in self:
             return dict.__getitem__(self, panda_resource)
         else:
-            panda_queue = self.get_panda_queue_name(panda_resource)
-            return dict.__getitem__(self, panda_queue)
+            return dict.__getitem__(self, self.resource_name_map.get(panda_resource, panda_resource))
 
     def get(self, panda_resource, default=None):
         if panda_resource in self:
             return dict.get(self, panda_resource, default)
         else:
-            panda_queue = self.get_panda_queue_name(panda_resource)
-            return dict.get(self, panda_queue, default)
+            return dict.get(self, self.resource_name_map.get(panda_resource), default)
 
     def get_panda_queue_name(self, panda_resource):
         """
@@ -109,3 +120,19 @@ class PandaQueuesDict(dict, PluginBase):
             pq_type = panda_queue_dict.get('type')
             workflow = panda_queue_dict.get('workflow')
         return pq_type, workflow
+
+
+def get_panda_queues_dict(cacher_key='panda_queues.json'):
+    """
+    Return PandaQueuesDict shared by all threads, which is rebuilt only when the cache is refreshed by cacher.
+    The returned dict must not be modified
+    """
+    dbInterface = DBInterface()
+    panda_queues_cache = dbInterface.get_cache(cacher_key)
+    last_update = None if panda_queues_cache is None else panda_queues_cache.lastUpdate
+    with _snapshot_lock:
+        panda_queues_dict = _snapshot_map.get(cacher_key)
+        if panda_queues_dict is None or last_update is None or panda_queues_dict.last_update != last_update:
+            panda_queues_dict = PandaQueuesDict(cacher_key=cacher_key)
+            _snapshot_map[cacher_key] = panda_queues_dict
+    return panda_queues_dict
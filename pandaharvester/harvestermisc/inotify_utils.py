@@ -0,0 +1,275 @@
+"""
+utilities routines to watch files written by workers in their access points with inotify,
+or with periodic stat calls on file systems which do not support inotify
+
+"""
+import os
+import time
+import errno
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+
+from pandaharvester.harvesterconfig import harvester_config
+from pandaharvester.harvestercore import core_utils
+
+# logger
+_logger = core_utils.setup_logger('inotify_utils')
+
+# inotify constants from sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+# events to be notified
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+
+# struct inotify_event without name
+_event_header = struct.Struct('iIII')
+
+
+# thin wrapper of inotify system calls
+class Inotify(object):
+    # constructor
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._inotify_init1 = libc.inotify_init1
+        self._inotify_init1.argtypes = [ctypes.c_int]
+        self._inotify_add_watch = libc.inotify_add_watch
+        self._inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._inotify_rm_watch = libc.inotify_rm_watch
+        self._inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = self._inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            errNo = ctypes.get_errno()
+            raise OSError(errNo, os.strerror(errNo))
+
+    # add a watch to a directory and return the watch descriptor
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self._inotify_add_watch(self.fd, path.encode('utf-8'), mask)
+        if wd < 0:
+            errNo = ctypes.get_errno()
+            raise OSError(errNo, os.strerror(errNo), path)
+        return wd
+
+    # remove a watch
+    def rm_watch(self, wd):
+        self._inotify_rm_watch(self.fd, wd)
+
+    # read events as a list of (wd, mask, name). Empty if no event within timeout
+    def read_events(self, timeout):
+        try:
+            readable = select.select([self.fd], [], [], timeout)[0]
+        except select.error:
+            return []
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError as e:
+            if e.errno in [errno.EAGAIN, errno.EINTR]:
+                return []
+            raise
+        events = []
+        offset = 0
+        while offset + _event_header.size <= len(data):
+            wd, mask, cookie, nameLen = _event_header.unpack_from(data, offset)
+            offset += _event_header.size
+            name = data[offset:offset + nameLen].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += nameLen
+            events.append((wd, mask, name))
+        return events
+
+    # close
+    def close(self):
+        os.close(self.fd)
+
+
+# watcher of files in access points of workers. Access points are registered when workers are checked
+# and unregistered when they are removed or are not registered again within the lifetime
+class WorkerFileWatcher(object):
+    # constructor
+    def __init__(self, file_names, mode='inotify', poll_interval=60, lifetime=3600):
+        self.fileNames = set(file_names)
+        self.pollInterval = poll_interval
+        self.lifetime = lifetime
+        self.lock = threading.Lock()
+        self.changedEvent = threading.Event()
+        # workerIDs of which files were written
+        self.changedWorkers = set()
+        # accessPoint: {'workers': set of workerIDs, 'time': last registration, 'wd': watch descriptor or None,
+        #               'stats': {name: (size, mtime)} for polling, 'toWatch': False if inotify is unusable}
+        self.watchMap = dict()
+        # watch descriptor: accessPoint
+        self.wdMap = dict()
+        self.inotify = None
+        if mode == 'inotify':
+            try:
+                self.inotify = Inotify()
+            except Exception as e:
+                _logger.warning('inotify is unavailable due to {0}. Falling back to polling'.format(e))
+        thread = threading.Thread(target=self.run, name='WorkerFileWatcher')
+        thread.daemon = True
+        thread.start()
+
+    # register access points of a worker
+    def register(self, worker_id, access_points):
+        timeNow = time.time()
+        with self.lock:
+            for accessPoint in access_points:
+                watchEntry = self.watchMap.get(accessPoint)
+                if watchEntry is None:
+                    watchEntry = {'workers': set(), 'time': timeNow, 'wd': None, 'stats': None,
+                                  'toWatch': self.inotify is not None}
+                    self.watchMap[accessPoint] = watchEntry
+                # access points which are not yet made are watched when they are registered again
+                if watchEntry['toWatch'] and watchEntry['wd'] is None:
+                    try:
+                        watchEntry['wd'] = self.inotify.add_watch(accessPoint)
+                        self.wdMap[watchEntry['wd']] = accessPoint
+                    except OSError as e:
+                        # unsupported file system or too many watches. Use polling
+                        if e.errno != errno.ENOENT:
+                            watchEntry['toWatch'] = False
+                            _logger.debug('cannot watch {0} due to {1}. Use polling'.format(accessPoint, e))
+                watchEntry['workers'].add(worker_id)
+                watchEntry['time'] = timeNow
+
+    # get and clear workerIDs of which files were written
+    def get_changed_workers(self):
+        with self.lock:
+            changedWorkers = self.changedWorkers
+            self.changedWorkers = set()
+            self.changedEvent.clear()
+        return changedWorkers
+
+    # wait until files are written or timeout
+    def wait(self, timeout):
+        return self.changedEvent.wait(timeout)
+
+    # mark workers in access point as changed
+    def _mark_changed(self, access_point):
+        watchEntry = self.watchMap.get(access_point)
+        if watchEntry is None:
+            return
+        self.changedWorkers.update(watchEntry['workers'])
+        self.changedEvent.set()
+
+    # remove access point
+    def _remove(self, access_point):
+        watchEntry = self.watchMap.pop(access_point, None)
+        if watchEntry is None or watchEntry['wd'] is None:
+            return
+        self.wdMap.pop(watchEntry['wd'], None)
+        try:
+            self.inotify.rm_watch(watchEntry['wd'])
+        except Exception:
+            pass
+
+    # handle inotify events
+    def _process_events(self, timeout):
+        events = self.inotify.read_events(timeout)
+        with self.lock:
+            for wd, mask, name in events:
+                accessPoint = self.wdMap.get(wd)
+                if accessPoint is None:
+                    continue
+                if mask & (IN_IGNORED | IN_DELETE_SELF | IN_MOVE_SELF):
+                    # access point was removed or moved
+                    self._remove(accessPoint)
+                elif name in self.fileNames:
+                    self._mark_changed(accessPoint)
+
+    # look up files in access points without inotify
+    def _poll(self):
+        with self.lock:
+            accessPoints = [accessPoint for accessPoint, watchEntry in self.watchMap.items()
+                            if watchEntry['wd'] is None]
+        for accessPoint in accessPoints:
+            newStats = dict()
+            for fileName in self.fileNames:
+                try:
+                    tmpStat = os.stat(os.path.join(accessPoint, fileName))
+                    newStats[fileName] = (tmpStat.st_size, tmpStat.st_mtime)
+                except OSError:
+                    pass
+            with self.lock:
+                watchEntry = self.watchMap.get(accessPoint)
+                if watchEntry is None:
+                    continue
+                # the first look-up is just to take the baseline
+                if watchEntry['stats'] is not None and watchEntry['stats'] != newStats:
+                    self._mark_changed(accessPoint)
+                watchEntry['stats'] = newStats
+
+    # remove access points which are not registered within the lifetime
+    def _expire(self):
+        timeLimit = time.time() - self.lifetime
+        with self.lock:
+            for accessPoint in list(self.watchMap):
+                if self.watchMap[accessPoint]['time'] < timeLimit:
+                    self._remove(accessPoint)
+
+    # main loop
+    def run(self):
+        lastPollTime = lastExpireTime = time.time()
+        while True:
+            try:
+                if self.inotify is not None:
+                    self._process_events(min(self.pollInterval, 10))
+                else:
+                    time.sleep(self.pollInterval)
+                timeNow = time.time()
+                if timeNow - lastPollTime >= self.pollInterval:
+                    self._poll()
+                    lastPollTime = timeNow
+                if timeNow - lastExpireTime >= 60:
+                    self._expire()
+                    lastExpireTime = timeNow
+            except Exception:
+                core_utils.dump_error_message(_logger)
+                time.sleep(1)
+
+
+# watcher shared by all threads in the process
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+# get the watcher if enabled with monitor.fileWatcherMode = inotify or poll. None if disabled
+def get_worker_file_watcher():
+    global _watcher
+    try:
+        mode = harvester_config.monitor.fileWatcherMode
+    except AttributeError:
+        mode = None
+    if mode not in ['inotify', 'poll']:
+        return None
+    with _watcher_lock:
+        if _watcher is None:
+            try:
+                pollInterval = harvester_config.monitor.fileWatcherPollInterval
+            except AttributeError:
+                pollInterval = 60
+            try:
+                lifetime = harvester_config.monitor.fileWatcherLifetime
+            except AttributeError:
+                lifetime = 3600
+            fileNames = []
+            for attrName in ['heartbeatFile', 'eventStatusDumpJsonFile', 'jobReportFile', 'workerAttributesFile']:
+                try:
+                    fileNames.append(getattr(harvester_config.payload_interaction, attrName))
+                except AttributeError:
+                    pass
+            _watcher = WorkerFileWatcher(fileNames, mode, pollInterval, lifetime)
+        return _watcher
@@ -0,0 +1,126 @@
+"""
+cache of pods in a namespace kept up to date with list-then-watch of Kubernetes API
+
+"""
+import time
+import threading
+
+from pandaharvester.harvestercore import core_utils
+
+# logger
+_logger = core_utils.setup_logger('k8s_pod_cache')
+
+
+# convert V1Pod to dict
+def get_pod_info(pod):
+    pod_info = {}
+    pod_info['name'] = pod.metadata.name
+    pod_info['start_time'] = pod.status.start_time.replace(tzinfo=None) if pod.status.start_time else pod.status.start_time
+    pod_info['status'] = pod.status.phase
+    pod_info['status_reason'] = pod.status.conditions[0].reason if pod.status.conditions else None
+    pod_info['status_message'] = pod.status.conditions[0].message if pod.status.conditions else None
+    pod_info['job_name'] = pod.metadata.labels['job-name'] \
+        if pod.metadata.labels and 'job-name' in pod.metadata.labels else None
+    return pod_info
+
+
+# watch stream of kubernetes python client
+def _kubernetes_watch_stream(func, **kwarg):
+    from kubernetes import watch
+    return watch.Watch().stream(func, **kwarg)
+
+
+class PodCache(object):
+    """
+    Pods in a namespace indexed by job-name label. The initial list is followed by watch from its
+    resourceVersion, and pods are listed again when the watch fails, e.g. with 410 Gone.
+    corev1 and watch_stream can be replaced with fake ones emitting synthetic events for testing
+    """
+    def __init__(self, corev1, namespace, watch_stream=None, watch_timeout=300, retry_interval=10):
+        self.corev1 = corev1
+        self.namespace = namespace
+        self.watch_stream = watch_stream if watch_stream is not None else _kubernetes_watch_stream
+        self.watch_timeout = watch_timeout
+        self.retry_interval = retry_interval
+        self.lock = threading.Lock()
+        # pod name: pod info
+        self.pod_map = dict()
+        # job name: set of pod names
+        self.job_index = dict()
+        self.resource_version = None
+        # set while the cache is in sync with API
+        self.synced = threading.Event()
+        thread = threading.Thread(target=self.run, name='PodCache')
+        thread.daemon = True
+        thread.start()
+
+    # add or update a pod
+    def _set_pod(self, pod_info):
+        old_pod_info = self.pod_map.get(pod_info['name'])
+        if old_pod_info is not None and old_pod_info['job_name'] != pod_info['job_name']:
+            self._remove_pod(pod_info['name'])
+        self.pod_map[pod_info['name']] = pod_info
+        if pod_info['job_name'] is not None:
+            self.job_index.setdefault(pod_info['job_name'], set())
+            self.job_index[pod_info['job_name']].add(pod_info['name'])
+
+    # remove a pod
+    def _remove_pod(self, pod_name):
+        pod_info = self.pod_map.pop(pod_name, None)
+        if pod_info is None or pod_info['job_name'] is None:
+            return
+        pod_names = self.job_index.get(pod_info['job_name'])
+        if pod_names is not None:
+            pod_names.discard(pod_name)
+            if not pod_names:
+                del self.job_index[pod_info['job_name']]
+
+    # list all pods to rebuild the cache
+    def list_pods(self):
+        ret = self.corev1.list_namespaced_pod(namespace=self.namespace)
+        with self.lock:
+            self.pod_map = dict()
+            self.job_index = dict()
+            for pod in ret.items:
+                self._set_pod(get_pod_info(pod))
+            self.resource_version = ret.metadata.resource_version
+        self.synced.set()
+
+    # apply events from watch until the watch times out
+    def watch_pods(self):
+        for event in self.watch_stream(self.corev1.list_namespaced_pod, namespace=self.namespace,
+                                       resource_version=self.resource_version,
+                                       timeout_seconds=self.watch_timeout):
+            event_type = event['type']
+            if event_type == 'ERROR':
+                raise RuntimeError('watch error {0}'.format(event.get('raw_object', event['object'])))
+            pod = event['object']
+            with self.lock:
+                if event_type == 'ADDED' or event_type == 'MODIFIED':
+                    self._set_pod(get_pod_info(pod))
+                elif event_type == 'DELETED':
+                    self._remove_pod(pod.metadata.name)
+                self.resource_version = pod.metadata.resource_version
+
+    # main loop
+    def run(self):
+        while True:
+            try:
+                if self.resource_version is None:
+                    self.list_pods()
+                self.watch_pods()
+            except Exception as e:
+                _logger.warning('failed to watch pods in {0} due to {1}. Listing again'.format(self.namespace, e))
+                self.synced.clear()
+                self.resource_version = None
+                time.sleep(self.retry_interval)
+
+    # get pods of jobs as a dict of {job name: [pod info]}. None if the cache is not in sync within timeout
+    def get_pods_info_by_job_name(self, job_name_list, timeout=10):
+        if not self.synced.wait(timeout):
+            return None
+        ret_map = dict()
+        with self.lock:
+            for job_name in job_name_list:
+                ret_map[job_name] = [dict(self.pod_map[pod_name]) for pod_name in self.job_index.get(job_name, [])]
+        return ret_map
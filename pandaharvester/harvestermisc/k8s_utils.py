@@ -3,19 +3,39 @@ utilities routines associated with Kubernetes python client
 
 """
 import os
+import re
 import copy
+import threading
 import datetime
 import base64
 
 import six
 import yaml
 
+from concurrent.futures import ThreadPoolExecutor
+
 from kubernetes import client, config
 from kubernetes.client.rest import ApiException
 
 from pandaharvester.harvesterconfig import harvester_config
 from pandaharvester.harvestercore.core_utils import SingletonWithID
-from pandaharvester.harvestermisc.info_utils import PandaQueuesDict
+from pandaharvester.harvestermisc.info_utils import get_panda_queues_dict
+from pandaharvester.harvestermisc.k8s_pod_cache import PodCache, get_pod_info
+
+# labels put on jobs and pods at submission to delete them in bulk with label selectors
+HARVESTER_ID_LABEL = 'harvesterID'
+WORKER_ID_LABEL = 'workerID'
+# label put on pods by the job controller
+JOB_NAME_LABEL = 'job-name'
+
+# max number of values in a set-based label selector
+MAX_VALUES_IN_SELECTOR = 100
+
+
+# make a valid label value
+def get_label_value(value):
+    value = re.sub('[^-A-Za-z0-9_.]', '-', str(value))[:63]
+    return value.strip('-_.')
 
 
 class k8s_Client(six.with_metaclass(SingletonWithID, object)):
@@ -26,6 +46,10 @@ class k8s_Client(six.with_metaclass(SingletonWithID, object)):
         self.corev1 = client.CoreV1Api()
         self.batchv1 = client.BatchV1Api()
         self.deletev1 = client.V1DeleteOptions(propagation_policy='Background')
+        # pods kept up to date with watch, shared by all threads
+        self.pod_cache = None
+        self.pod_cache_lock = threading.Lock()
+        self.harvester_id_label = get_label_value(harvester_config.master.harvester_id)
 
     def read_yaml_file(self, yaml_file):
         with open(yaml_file) as f:
@@ -34,14 +58,20 @@ class k8s_Client(six.with_metaclass(SingletonWithID, object)):
         return yaml_content
 
     def create_job_from_yaml(self, yaml_content, work_spec, cert, cpuadjustratio, memoryadjustratio):
-        panda_queues_dict = PandaQueuesDict()
+        panda_queues_dict = get_panda_queues_dict()
         queue_name = panda_queues_dict.get_panda_queue_name(work_spec.computingSite)
 
         yaml_content['metadata']['name'] = yaml_content['metadata']['name'] + "-" + str(work_spec.workerID)
 
+        worker_labels = {HARVESTER_ID_LABEL: self.harvester_id_label,
+                         WORKER_ID_LABEL: str(work_spec.workerID)}
+        yaml_content['metadata'].setdefault('labels', {})
+        yaml_content['metadata']['labels'].update(worker_labels)
+
         yaml_content['spec']['template'].setdefault('metadata', {})
         yaml_content['spec']['template']['metadata'].update({
             'labels': {'resourceType': str(work_spec.resourceType)}})
+        yaml_content['spec']['template']['metadata']['labels'].update(worker_labels)
 
         yaml_containers = yaml_content['spec']['template']['spec']['containers']
         del(yaml_containers[1:len(yaml_containers)])
@@ -89,14 +119,7 @@ class k8s_Client(six.with_metaclass(SingletonWithID, object)):
         ret = self.corev1.list_namespaced_pod(namespace=self.namespace)
 
         for i in ret.items:
-            pod_info = {}
-            pod_info['name'] = i.metadata.name
-            pod_info['start_time'] = i.status.start_time.replace(tzinfo=None) if i.status.start_time else i.status.start_time
-            pod_info['status'] = i.status.phase
-            pod_info['status_reason'] = i.status.conditions[0].reason if i.status.conditions else None
-            pod_info['status_message'] = i.status.conditions[0].message if i.status.conditions else None
-            pod_info['job_name'] = i.metadata.labels['job-name'] if i.metadata.labels and 'job-name' in i.metadata.labels else None
-            pods_list.append(pod_info)
+            pods_list.append(get_pod_info(i))
 
         return pods_list
 
@@ -105,6 +128,24 @@ class k8s_Client(six.with_metaclass(SingletonWithID, object)):
             pods_list = [ i for i in pods_list if i['job_name'] == job_name]
         return pods_list
 
+    def get_pods_info_by_job_name(self, job_name_list, use_cache=True):
+        """
+        Return a dict of {job name: [pod info]}, looked up in the pod cache kept by watch if use_cache
+        is True, or with one list call if the cache is disabled or not in sync
+        """
+        ret_map = None
+        if use_cache:
+            with self.pod_cache_lock:
+                if self.pod_cache is None:
+                    self.pod_cache = PodCache(self.corev1, self.namespace)
+            ret_map = self.pod_cache.get_pods_info_by_job_name(job_name_list)
+        if ret_map is None:
+            ret_map = dict([(job_name, []) for job_name in job_name_list])
+            for pod_info in self.get_pods_info():
+                if pod_info['job_name'] in ret_map:
+                    ret_map[pod_info['job_name']].append(pod_info)
+        return ret_map
+
     def get_jobs_info(self, job_name=None):
         jobs_list = list()
 
@@ -120,25 +161,84 @@ class k8s_Client(six.with_metaclass(SingletonWithID, object)):
             jobs_list.append(job_info)
         return jobs_list
 
-    def delete_pods(self, pod_name_list):
-        retList = list()
+    def delete_a_pod(self, pod_name):
+        rsp = {}
+        rsp['name'] = pod_name
+        try:
+            self.corev1.delete_namespaced_pod(name=pod_name, namespace=self.namespace, body=self.deletev1, grace_period_seconds=0)
+        except ApiException as _e:
+            rsp['errMsg'] = '' if _e.status == 404 else _e.reason
+        else:
+            rsp['errMsg'] = ''
+        return rsp
 
-        for pod_name in pod_name_list:
-            rsp = {}
-            rsp['name'] = pod_name
-            try:
-                self.corev1.delete_namespaced_pod(name=pod_name, namespace=self.namespace, body=self.deletev1, grace_period_seconds=0)
-            except ApiException as _e:
-                rsp['errMsg'] = '' if _e.status == 404 else _e.reason
-            else:
-                rsp['errMsg'] = ''
-            retList.append(rsp)
+    def delete_pods(self, pod_name_list, n_threads=1):
+        # pod names cannot be combined in a selector, so that pods are deleted one by one in parallel
+        if n_threads > 1 and len(pod_name_list) > 1:
+            with ThreadPoolExecutor(n_threads) as thread_pool:
+                retList = list(thread_pool.map(self.delete_a_pod, pod_name_list))
+        else:
+            retList = [self.delete_a_pod(pod_name) for pod_name in pod_name_list]
 
         return retList
 
     def delete_job(self, job_name):
         self.batchv1.delete_namespaced_job(name=job_name, namespace=self.namespace, body=self.deletev1, grace_period_seconds=0)
 
+    def _delete_collection(self, delete_func, label_key, value_list, base_selector, n_threads):
+        """
+        Delete objects of which label_key has a value in value_list, with a delete-collection call per chunk
+        of values. Chunks are deleted in parallel. Return a dict of {value: error message or empty string}
+        """
+        def delete_chunk(values):
+            label_selector = '{0}{1} in ({2})'.format(base_selector, label_key, ','.join(values))
+            try:
+                delete_func(namespace=self.namespace, label_selector=label_selector,
+                            body=self.deletev1, grace_period_seconds=0)
+            except ApiException as _e:
+                errMsg = '' if _e.status == 404 else _e.reason
+            else:
+                errMsg = ''
+            return [(value, errMsg) for value in values]
+
+        value_list = sorted(set([value for value in value_list if value is not None]))
+        chunks = [value_list[i:i + MAX_VALUES_IN_SELECTOR] for i in range(0, len(value_list), MAX_VALUES_IN_SELECTOR)]
+        retMap = dict()
+        if n_threads > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(n_threads) as thread_pool:
+                for tmpList in thread_pool.map(delete_chunk, chunks):
+                    retMap.update(tmpList)
+        else:
+            for chunk in chunks:
+                retMap.update(delete_chunk(chunk))
+        return retMap
+
+    def delete_jobs_by_worker_id(self, worker_id_list, n_threads=1):
+        """
+        Delete jobs of workers submitted by this harvester instance with label selectors.
+        Return a dict of {workerID: error message or empty string}
+        """
+        base_selector = '{0}={1},'.format(HARVESTER_ID_LABEL, self.harvester_id_label)
+        retMap = self._delete_collection(self.batchv1.delete_collection_namespaced_job, WORKER_ID_LABEL,
+                                         [str(worker_id) for worker_id in worker_id_list], base_selector, n_threads)
+        return dict([(int(worker_id), errMsg) for worker_id, errMsg in retMap.items()])
+
+    def delete_pods_by_job_name(self, job_name_list, n_threads=1):
+        """
+        Delete pods of jobs with label selectors, including pods left after their jobs are gone.
+        Return a dict of {job name: error message or empty string}
+        """
+        return self._delete_collection(self.corev1.delete_collection_namespaced_pod, JOB_NAME_LABEL,
+                                       job_name_list, '', n_threads)
+
+    def get_unlabelled_job_names(self):
+        """
+        Return names of jobs without the worker label, i.e. jobs submitted before jobs were labelled
+        """
+        ret = self.batchv1.list_namespaced_job(namespace=self.namespace,
+                                               label_selector='!{0}'.format(WORKER_ID_LABEL))
+        return set([i.metadata.name for i in ret.items])
+
     def set_proxy(self, proxy_path):
         with open(proxy_path) as f:
             content = f.read()
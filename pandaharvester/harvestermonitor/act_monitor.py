@@ -19,31 +19,63 @@ class ACTMonitor(PluginBase):
         self.log = core_utils.make_logger(baseLogger, 'aCT submitter', method_name='__init__')
         self.actDB = aCTDBPanda(self.log)
 
+        # max number of jobs in one query
+        try:
+            self.maxJobsPerQuery
+        except AttributeError:
+            self.maxJobsPerQuery = 1000
 
     # check workers
     def check_workers(self, workspec_list):
+        tmpLog = core_utils.make_logger(baseLogger, method_name='check_workers')
+        tmpLog.debug('start nWorkers={0}'.format(len(workspec_list)))
+        columns = ['id', 'actpandastatus', 'pandastatus', 'computingElement']
+        # query aCT for all workers in one go
+        actJobsMap = dict()
+        errMap = dict()
+        batchIDs = set()
+        for workSpec in workspec_list:
+            try:
+                batchIDs.add(int(workSpec.batchID))
+            except (TypeError, ValueError):
+                pass
+        for tmpBatchIDs in core_utils.create_shards(sorted(batchIDs), self.maxJobsPerQuery):
+            try:
+                tmpLog.debug('Querying aCT for {0} ids'.format(len(tmpBatchIDs)))
+                actjobs = self.actDB.getJobs('id IN ({0})'.format(','.join([str(i) for i in tmpBatchIDs])), columns)
+            except Exception as e:
+                tmpLog.error("Failed to query aCT DB: {0}".format(str(e)))
+                for batchID in tmpBatchIDs:
+                    errMap[batchID] = str(e)
+                continue
+            for actjob in actjobs:
+                actJobsMap[int(actjob['id'])] = actjob
+
         retList = []
         for workSpec in workspec_list:
             # make logger
             tmpLog = core_utils.make_logger(baseLogger, 'workerID={0}'.format(workSpec.workerID),
                                             method_name='check_workers')
             try:
-                tmpLog.debug('Querying aCT for id {0}'.format(workSpec.batchID))
-                columns = ['actpandastatus', 'pandastatus', 'computingElement']
-                actjobs = self.actDB.getJobs("id={0}".format(workSpec.batchID), columns)
-            except Exception as e:
-                tmpLog.error("Failed to query aCT DB: {0}".format(str(e)))
+                batchID = int(workSpec.batchID)
+            except (TypeError, ValueError):
+                tmpLog.error("Failed to query aCT DB: invalid id {0}".format(workSpec.batchID))
+                # send back current status
+                retList.append((workSpec.status, ''))
+                continue
+            if batchID in errMap:
                 # send back current status
                 retList.append((workSpec.status, ''))
                 continue
 
-            if not actjobs:
+            if batchID not in actJobsMap:
                 tmpLog.error("Job with id {0} not found in aCT".format(workSpec.batchID))
                 # send back current status
                 retList.append((WorkSpec.ST_failed, "Job not found in aCT"))
                 continue
 
-            actstatus = actjobs[0]['actpandastatus']
+            actjob = actJobsMap[batchID]
+            actstatus = actjob['actpandastatus']
             newStatus = WorkSpec.ST_running
             if actstatus in ['sent', 'starting']:
                 newStatus = WorkSpec.ST_submitted
@@ -56,8 +88,8 @@ class ACTMonitor(PluginBase):
 
             tmpLog.debug('batchStatus {0} -> workerStatus {1}'.format(actstatus, newStatus))
 
-            if actjobs[0]['computingElement']:
-                workSpec.computingElement = actjobs[0]['computingElement']
+            if actjob['computingElement']:
+                workSpec.computingElement = actjob['computingElement']
 
             retList.append((newStatus, ''))
 
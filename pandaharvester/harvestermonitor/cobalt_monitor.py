@@ -3,13 +3,12 @@ try:
     import subprocess32 as subprocess
 except:
     import subprocess
-import json
 import os.path
-from pprint import pprint
 
 from pandaharvester.harvestercore import core_utils
 from pandaharvester.harvestercore.work_spec import WorkSpec
 from pandaharvester.harvestercore.plugin_base import PluginBase
+from pandaharvester.harvestermisc.batch_status_cache import BatchStatusCache
 
 # logger
 baseLogger = core_utils.setup_logger('cobalt_monitor')
@@ -20,130 +19,162 @@ baseLogger = core_utils.setup_logger('cobalt_monitor')
 # ===================================================
 # 77734  fcurtis  06:00:00  64     queued  None
 
+
+# convert batch job state to worker status. None if unknown
+def _get_worker_status(state):
+    if 'running' in state:
+        newStatus = WorkSpec.ST_running
+    elif 'queued' in state:
+        newStatus = WorkSpec.ST_submitted
+    elif 'user_hold' in state:
+        newStatus = WorkSpec.ST_submitted
+    elif 'starting' in state:
+        newStatus = WorkSpec.ST_running
+    elif 'killing' in state:
+        newStatus = WorkSpec.ST_failed
+    elif 'exiting' in state:
+        newStatus = WorkSpec.ST_running
+    elif 'maxrun_hold' in state:
+        newStatus = WorkSpec.ST_submitted
+    else:
+        newStatus = None
+    return newStatus
+
+
+# parse the full listing of qstat into a dict of batchID: state
+def _parse_qstat(std_out):
+    statusMap = dict()
+    inBody = False
+    for tmpLine in std_out.split('\n'):
+        if tmpLine.startswith('==='):
+            inBody = True
+            continue
+        parts = tmpLine.split()
+        if not inBody or len(parts) < 5:
+            continue
+        statusMap[parts[0]] = parts[4]
+    return statusMap
+
+
+# get exit status of an exited job from cobalt log
+def _check_cobalt_log(cobalt_logfile, batch_id, tmp_log):
+    errStr = ''
+    return_code = None
+    job_cancelled = False
+    with open(cobalt_logfile) as f:
+        for line in f:
+            # looking for line like this:
+            # Thu Aug 24 19:01:20 2017 +0000 (UTC) Info: task completed normally with an exit code of 0; initiating job cleanup and removal
+            if 'task completed normally' in line:
+                start_index = line.find('exit code of ') + len('exit code of ')
+                end_index = line.find(';', start_index)
+                str_return_code = line[start_index:end_index]
+                if 'None' in str_return_code:
+                    return_code = -1
+                else:
+                    return_code = int(str_return_code)
+                break
+            elif 'maximum execution time exceeded' in line:
+                errStr += ' batch job exceeded wall clock time '
+            elif 'user delete requested' in line:
+                errStr += ' job was cancelled '
+                job_cancelled = True
+    if return_code == 0:
+        tmp_log.debug('job finished normally')
+        newStatus = WorkSpec.ST_finished
+    elif return_code is None:
+        if job_cancelled:
+            tmp_log.debug('job was cancelled')
+            errStr += ' job cancelled '
+            newStatus = WorkSpec.ST_cancelled
+        else:
+            tmp_log.debug('job has no exit code, failing job')
+            errStr += ' exit code not found in cobalt log file %s ' % cobalt_logfile
+            newStatus = WorkSpec.ST_failed
+    else:
+        tmp_log.debug(' non zero exit code %s from batch job id %s' % (return_code, batch_id))
+        errStr += ' non-zero exit code %s from batch job id %s ' % (return_code, batch_id)
+        newStatus = WorkSpec.ST_failed
+    return newStatus, errStr
+
+
 # monitor for HTCONDOR batch system
 class CobaltMonitor (PluginBase):
     # constructor
     def __init__(self, **kwarg):
         PluginBase.__init__(self, **kwarg)
+        # lifetime of cached batch job status in sec
+        try:
+            self.cacheRefreshInterval
+        except AttributeError:
+            self.cacheRefreshInterval = 30
+
+    # list state of all batch jobs with one qstat
+    def query_all(self):
+        tmpLog = self.make_logger(baseLogger, method_name='query_all')
+        comStr = 'qstat'
+        tmpLog.debug('check with {0}'.format(comStr))
+        p = subprocess.Popen(comStr.split(),
+                             shell=False,
+                             universal_newlines=True,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        stdOut, stdErr = p.communicate()
+        retCode = p.returncode
+        tmpLog.debug('retCode= {0}'.format(retCode))
+        # exit code 1 and no output means no job
+        if retCode == 1 and len(stdOut.strip()) == 0 and len(stdErr.strip()) == 0:
+            return dict()
+        if retCode != 0:
+            raise RuntimeError('qstat failed with {0} stdout: {1}\n stderr: {2}'.format(retCode, stdOut, stdErr))
+        return _parse_qstat(stdOut)
 
     # check workers
     def check_workers(self, workspec_list):
+        tmpLog = self.make_logger(baseLogger, method_name='check_workers')
+        tmpLog.debug('start nWorkers={0}'.format(len(workspec_list)))
+        statusCache = BatchStatusCache(id='cobalt')
+        errStr = ''
+        try:
+            statusMap = statusCache.get_status([str(workSpec.batchID) for workSpec in workspec_list],
+                                               self.query_all, self.cacheRefreshInterval)
+        except Exception as e:
+            errStr = str(e)
+            tmpLog.error(errStr)
+            statusMap = None
         retList = []
         for workSpec in workspec_list:
-            # print "pprint(dir(workSpec))"
-            # pprint(dir(workSpec))
-            # print "pprint(vars(workSpec))"
-            # pprint(vars(workSpec))
             # make logger
             tmpLog = self.make_logger(baseLogger, 'workerID={0}'.format(workSpec.workerID),
                                       method_name='check_workers')
-            # first command
-            comStr = "qstat {0}".format(workSpec.batchID)
-            # first check
-            tmpLog.debug('check with {0}'.format(comStr))
-            p = subprocess.Popen(comStr.split(),
-                                 shell=False,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE)
             oldStatus = workSpec.status
-            newStatus = None
-            # first check return code
-            stdOut, stdErr = p.communicate()
-            retCode = p.returncode
-            tmpLog.debug('retCode= {0}'.format(retCode))
-            tmpLog.debug('stdOut = {0}'.format(stdOut))
-            tmpLog.debug('stdErr = {0}'.format(stdErr))
+            if statusMap is None:
+                # failed to query
+                retList.append((oldStatus, errStr))
+                continue
             errStr = ''
-            if retCode == 0:
-                # batch job is still running and has a state, output looks like this:
-                # JobID   User    WallTime  Nodes  State   Location
-                # ===================================================
-                # 124559  hdshin  06:00:00  64     queued  None
-                
-                lines = stdOut.split('\n')
-                parts = lines[2].split()
-                batchid = parts[0]
-                user = parts[1]
-                walltime = parts[2]
-                nodes = parts[3]
-                state = parts[4]
-
-                if int(batchid) != int(workSpec.batchID):
-                    errStr += 'qstat returned status for wrong batch id %s != %s' % (batchid,workSpec.batchID)
-                    newStatus = WorkSpec.ST_failed
-                else:
-                    if 'running' in state:
-                       newStatus = WorkSpec.ST_running
-                    elif 'queued' in state:
-                       newStatus = WorkSpec.ST_submitted
-                    elif 'user_hold' in state:
-                       newStatus = WorkSpec.ST_submitted
-                    elif 'starting' in state:
-                       newStatus = WorkSpec.ST_running
-                    elif 'killing' in state:
-                       newStatus = WorkSpec.ST_failed
-                    elif 'exiting' in state:
-                       newStatus = WorkSpec.ST_running
-                    elif 'maxrun_hold' in state:
-                       newStatus = WorkSpec.ST_submitted
-                    else:
-                       raise Exception('failed to parse job state "%s" qstat stdout: %s\n stderr: %s' % (state,stdOut,stdErr))
-                
-                retList.append((newStatus, errStr))
-            elif retCode == 1 and len(stdOut.strip()) == 0 and len(stdErr.strip()) == 0:
-                tmpLog.debug('job has already exited, checking cobalt log for exit status')
-                # exit code 1 and stdOut/stdErr has no content means job exited
+            batchID = str(workSpec.batchID)
+            if batchID in statusMap:
+                # batch job is still running and has a state
+                state = statusMap[batchID]
+                newStatus = _get_worker_status(state)
+                if newStatus is None:
+                    errStr = 'failed to parse job state "%s"' % state
+                    tmpLog.error(errStr)
+                    newStatus = oldStatus
+            else:
+                # job is not in qstat, which means job exited
                 # need to look at cobalt log to determine exit status
-
-                cobalt_logfile = os.path.join(workSpec.get_access_point(),'cobalt.log')
+                tmpLog.debug('job has already exited, checking cobalt log for exit status')
+                cobalt_logfile = os.path.join(workSpec.get_access_point(), 'cobalt.log')
                 if os.path.exists(cobalt_logfile):
-                    return_code = None
-                    job_cancelled = False
-                    for line in open(cobalt_logfile):
-                        # looking for line like this:
-                        # Thu Aug 24 19:01:20 2017 +0000 (UTC) Info: task completed normally with an exit code of 0; initiating job cleanup and removal
-                        if 'task completed normally' in line:
-                            start_index = line.find('exit code of ') + len('exit code of ')
-                            end_index = line.find(';',start_index)
-                            str_return_code = line[start_index:end_index]
-                            if 'None' in str_return_code:
-                              return_code = -1
-                            else:
-                              return_code = int(str_return_code)
-                            break
-                        elif 'maximum execution time exceeded' in line:
-                            errStr += ' batch job exceeded wall clock time '
-                        elif 'user delete requested' in line:
-                            errStr += ' job was cancelled '
-                            job_cancelled = True
-                            
-                            
-                    if return_code == 0:
-                        tmpLog.debug('job finished normally')
-                        newStatus = WorkSpec.ST_finished
-                        retList.append((newStatus,errStr))
-                    elif return_code is None:
-                        if job_cancelled:
-                            tmpLog.debug('job was cancelled')
-                            errStr += ' job cancelled '
-                            newStatus = WorkSpec.ST_cancelled
-                            retList.append((newStatus,errStr))
-                        else:
-                            tmpLog.debug('job has no exit code, failing job')
-                            errStr += ' exit code not found in cobalt log file %s ' % cobalt_logfile
-                            newStatus = WorkSpec.ST_failed
-                            retList.append((newStatus,errStr))
-                    else:
-                        tmpLog.debug(' non zero exit code %s from batch job id %s' % (return_code,workSpec.batchID))
-                        errStr += ' non-zero exit code %s from batch job id %s ' % (return_code,workSpec.batchID)
-                        newStatus = WorkSpec.ST_failed
-                        retList.append((newStatus,errStr))
+                    newStatus, errStr = _check_cobalt_log(cobalt_logfile, workSpec.batchID, tmpLog)
                 else:
                     tmpLog.debug(' cobalt log file does not exist')
                     errStr += ' cobalt log file %s does not exist ' % cobalt_logfile
                     newStatus = WorkSpec.ST_failed
-                    retList.append((newStatus,errStr))
-                
+            retList.append((newStatus, errStr))
+
             tmpLog.debug('batchStatus {0} -> workerStatus {1}'.format(oldStatus, newStatus))
             tmpLog.debug('errStr: %s' % errStr)
 
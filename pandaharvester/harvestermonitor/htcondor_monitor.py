@@ -76,6 +76,21 @@ def condor_job_id_from_workspec(workspec):
     return '{0}#{1}'.format(workspec.submissionHost, workspec.batchID)
 
 
+## get batchIDs of a batch job; ClusterId.ProcId for workers submitted in bulk, and ClusterId for the first proc
+def get_batchIDs_of_job(job_ads_dict):
+    proc_id = str(job_ads_dict.get('ProcId', 0))
+    batchid_list = ['{0}.{1}'.format(job_ads_dict['ClusterId'], proc_id)]
+    if proc_id == '0':
+        batchid_list.append(str(job_ads_dict['ClusterId']))
+    return batchid_list
+
+
+## get requirements to query batch jobs by ClusterIds
+def get_cluster_requirements(batchIDs_set):
+    clusterIDs_str = ','.join(sorted(set(batchid.split('.')[0] for batchid in batchIDs_set)))
+    return 'member(ClusterID, {{{0}}})'.format(clusterIDs_str)
+
+
 ## Condor queue cache fifo
 class CondorQCacheFifo(six.with_metaclass(SingletonWithID, SpecialFIFOBase)):
     global_lock_id = -1
@@ -223,12 +238,12 @@ class CondorJobQuery(six.with_metaclass(SingletonWithID, object)):
                         ## Every attribute
                         attribute_iter = map(_getAttribute_tuple, _c.findall('a'))
                         job_ads_dict.update(attribute_iter)
-                        batchid = str(job_ads_dict['ClusterId'])
-                        condor_job_id = '{0}#{1}'.format(self.submissionHost, batchid)
-                        job_ads_all_dict[condor_job_id] = job_ads_dict
-                        ## Remove batch jobs already gotten from the list
-                        if batchid in batchIDs_set:
-                            batchIDs_set.discard(batchid)
+                        for batchid in get_batchIDs_of_job(job_ads_dict):
+                            condor_job_id = '{0}#{1}'.format(self.submissionHost, batchid)
+                            job_ads_all_dict[condor_job_id] = job_ads_dict
+                            ## Remove batch jobs already gotten from the list
+                            if batchid in batchIDs_set:
+                                batchIDs_set.discard(batchid)
                 else:
                     ## Job not found
                     tmpLog.debug('job not found with {0}'.format(comStr))
@@ -261,17 +276,17 @@ class CondorJobQuery(six.with_metaclass(SingletonWithID, object)):
         for query_method in query_method_list:
             ## Make requirements
             batchIDs_str = ','.join(list(batchIDs_set))
-            requirements = 'member(ClusterID, {{{0}}})'.format(batchIDs_str)
+            requirements = get_cluster_requirements(batchIDs_set)
             tmpLog.debug('Query method: {0} ; batchIDs: "{1}"'.format(query_method.__name__, batchIDs_str))
             ## Query
             jobs_iter = query_method(requirements=requirements, projection=CONDOR_JOB_ADS_LIST)
             for job in jobs_iter:
                 job_ads_dict = dict(job)
-                batchid = str(job_ads_dict['ClusterId'])
-                condor_job_id = '{0}#{1}'.format(self.submissionHost, batchid)
-                job_ads_all_dict[condor_job_id] = job_ads_dict
-                ## Remove batch jobs already gotten from the list
-                batchIDs_set.discard(batchid)
+                for batchid in get_batchIDs_of_job(job_ads_dict):
+                    condor_job_id = '{0}#{1}'.format(self.submissionHost, batchid)
+                    job_ads_all_dict[condor_job_id] = job_ads_dict
+                    ## Remove batch jobs already gotten from the list
+                    batchIDs_set.discard(batchid)
             if len(batchIDs_set) == 0:
                 break
         ## Remaining
@@ -426,17 +441,17 @@ class CondorJobQuery(six.with_metaclass(SingletonWithID, object)):
             if query_method is cache_query:
                 requirements = 'harvesterID =?= "{0}"'.format(harvesterID)
             else:
-                requirements = 'member(ClusterID, {{{0}}})'.format(batchIDs_str)
+                requirements = get_cluster_requirements(batchIDs_set)
             tmpLog.debug('Query method: {0} ; batchIDs: "{1}"'.format(query_method.__name__, batchIDs_str))
             ## Query
             jobs_iter = query_method(requirements=requirements, projection=CONDOR_JOB_ADS_LIST)
             for job in jobs_iter:
                 job_ads_dict = dict(job)
-                batchid = str(job_ads_dict['ClusterId'])
-                condor_job_id = '{0}#{1}'.format(self.submissionHost, batchid)
-                job_ads_all_dict[condor_job_id] = job_ads_dict
-                ## Remove batch jobs already gotten from the list
-                batchIDs_set.discard(batchid)
+                for batchid in get_batchIDs_of_job(job_ads_dict):
+                    condor_job_id = '{0}#{1}'.format(self.submissionHost, batchid)
+                    job_ads_all_dict[condor_job_id] = job_ads_dict
+                    ## Remove batch jobs already gotten from the list
+                    batchIDs_set.discard(batchid)
             if len(batchIDs_set) == 0:
                 break
         ## Remaining
@@ -37,8 +37,13 @@ class K8sMonitor(PluginBase):
             self.podQueueTimeLimit
         except AttributeError:
             self.podQueueTimeLimit = 172800
-
-        self._all_pods_list = []
+        # look up pods in the cache kept by watch instead of listing pods every time
+        try:
+            self.usePodCache
+        except AttributeError:
+            self.usePodCache = True
+        else:
+            self.usePodCache = bool(self.usePodCache)
 
     def check_pods_status(self, pods_status_list):
         newStatus = ''
@@ -64,7 +69,7 @@ class K8sMonitor(PluginBase):
 
         return newStatus
 
-    def check_a_job(self, workspec):
+    def check_a_job(self, workspec, pods_list):
         # set logger
         tmpLog = self.make_logger(baseLogger, 'workerID={0} batchID={1}'.format(workspec.workerID, workspec.batchID),
                                   method_name='check_a_job')
@@ -75,7 +80,6 @@ class K8sMonitor(PluginBase):
         errStr = ''
 
         try:
-            pods_list = self.k8s_client.filter_pods_info(self._all_pods_list, job_name=job_id)
             timeNow = datetime.datetime.utcnow()
             pods_status_list = []
             pods_name_to_delete_list = []
@@ -99,18 +103,11 @@ class K8sMonitor(PluginBase):
                 tmpLog.debug('pods_status_list={0}'.format(pods_status_list))
                 newStatus = self.check_pods_status(pods_status_list)
                 tmpLog.debug('new_status={0}'.format(newStatus))
-            # delete queuing too long pods
+            # queuing too long pods are deleted together with ones of other workers
             if pods_name_to_delete_list:
-                tmpLog.debug('Deleting pods queuing too long')
-                retList = self.k8s_client.delete_pods(pods_name_to_delete_list)
-                deleted_pods_list = []
-                for item in retList:
-                    if item['errMsg'] == '':
-                        deleted_pods_list.append(item['name'])
-                tmpLog.debug('Deleted pods queuing too long: {0}'.format(
-                                ','.join(deleted_pods_list)))
+                tmpLog.debug('To delete pods queuing too long: {0}'.format(','.join(pods_name_to_delete_list)))
 
-        return (newStatus, errStr)
+        return (newStatus, errStr, pods_name_to_delete_list)
 
 
     # check workers
@@ -125,12 +122,27 @@ class K8sMonitor(PluginBase):
             retList.append(('', errStr))
             return False, retList
 
-        self._all_pods_list = self.k8s_client.get_pods_info()
+        pods_map = self.k8s_client.get_pods_info_by_job_name([workspec.batchID for workspec in workspec_list],
+                                                             use_cache=self.usePodCache)
 
         with ThreadPoolExecutor(self.nProcesses) as thread_pool:
-            retIterator = thread_pool.map(self.check_a_job, workspec_list)
-
-        retList = list(retIterator)
+            retIterator = thread_pool.map(self.check_a_job, workspec_list,
+                                          [pods_map.get(workspec.batchID, []) for workspec in workspec_list])
+
+        retList = []
+        pods_name_to_delete_list = []
+        for newStatus, errStr, tmp_pods_name_list in retIterator:
+            retList.append((newStatus, errStr))
+            pods_name_to_delete_list += tmp_pods_name_list
+
+        # delete queuing too long pods in parallel
+        if pods_name_to_delete_list:
+            tmpLog.debug('Deleting {0} pods queuing too long'.format(len(pods_name_to_delete_list)))
+            deleted_pods_list = []
+            for item in self.k8s_client.delete_pods(pods_name_to_delete_list, n_threads=self.nProcesses):
+                if item['errMsg'] == '':
+                    deleted_pods_list.append(item['name'])
+            tmpLog.debug('Deleted pods queuing too long: {0}'.format(','.join(deleted_pods_list)))
 
         tmpLog.debug('done')
 
@@ -1,4 +1,4 @@
-import re
+import json
 try:
     import subprocess32 as subprocess
 except:
@@ -7,65 +7,130 @@ except:
 from pandaharvester.harvestercore import core_utils
 from pandaharvester.harvestercore.work_spec import WorkSpec
 from pandaharvester.harvestercore.plugin_base import PluginBase
+from pandaharvester.harvestermisc.batch_status_cache import BatchStatusCache
 
 # logger
 baseLogger = core_utils.setup_logger('pbs_monitor')
 
 
+# convert batch job status to worker status
+def _get_worker_status(batch_status):
+    if batch_status in ['R', 'E']:
+        newStatus = WorkSpec.ST_running
+    elif batch_status in ['C', 'H']:
+        newStatus = WorkSpec.ST_finished
+    elif batch_status in ['CANCELLED']:
+        newStatus = WorkSpec.ST_cancelled
+    elif batch_status in ['Q', 'W', 'S']:
+        newStatus = WorkSpec.ST_submitted
+    else:
+        newStatus = WorkSpec.ST_failed
+    return newStatus
+
+
+# run qstat
+def _run_qstat(com_str, tmp_log):
+    tmp_log.debug('check with {0}'.format(com_str))
+    p = subprocess.Popen(com_str.split(),
+                         shell=False,
+                         universal_newlines=True,
+                         stdout=subprocess.PIPE,
+                         stderr=subprocess.PIPE)
+    stdOut, stdErr = p.communicate()
+    retCode = p.returncode
+    tmp_log.debug('retCode={0}'.format(retCode))
+    if retCode != 0:
+        raise RuntimeError(stdOut + ' ' + stdErr)
+    return stdOut
+
+
+# get job ID without server name, since the full listing of qstat may truncate server names
+def _get_short_id(batch_id):
+    return batch_id.split('.')[0]
+
+
+# parse the full listing of qstat
+# Job ID                    Name             User            Time Use S Queue
+# ------------------------- ---------------- --------------- -------- - -----
+# 1234.server               panda.sh         atlas           00:01:02 R batch
+def _parse_qstat(std_out):
+    statusMap = dict()
+    for tmpLine in std_out.split('\n'):
+        tmpItems = tmpLine.split()
+        if len(tmpItems) < 6 or tmpItems[0].startswith('-') or tmpItems[0] == 'Job':
+            continue
+        statusMap[_get_short_id(tmpItems[0])] = tmpItems[-2]
+    return statusMap
+
+
+# parse the output of qstat -f -F json
+def _parse_qstat_json(std_out):
+    statusMap = dict()
+    for batchID, jobAttrs in json.loads(std_out).get('Jobs', {}).items():
+        statusMap[_get_short_id(batchID)] = jobAttrs.get('job_state')
+    return statusMap
+
+
 # monitor for PBS batch system
 class PBSMonitor(PluginBase):
     # constructor
     def __init__(self, **kwarg):
         PluginBase.__init__(self, **kwarg)
+        # lifetime of cached batch job status in sec
+        try:
+            self.cacheRefreshInterval
+        except AttributeError:
+            self.cacheRefreshInterval = 30
+        # use qstat -f -F json which is available in PBS Pro
+        try:
+            self.useJson
+        except AttributeError:
+            self.useJson = True
+
+    # list status of all batch jobs with one qstat
+    def query_all(self):
+        tmpLog = self.make_logger(baseLogger, method_name='query_all')
+        if self.useJson:
+            try:
+                return _parse_qstat_json(_run_qstat('qstat -f -F json', tmpLog))
+            except Exception as e:
+                tmpLog.warning('falling back to the full listing since qstat -F json is unavailable: {0}'.format(e))
+                self.useJson = False
+        return _parse_qstat(_run_qstat('qstat', tmpLog))
 
     # check workers
     def check_workers(self, workspec_list):
+        tmpLog = self.make_logger(baseLogger, method_name='check_workers')
+        tmpLog.debug('start nWorkers={0}'.format(len(workspec_list)))
+        statusCache = BatchStatusCache(id='pbs')
+        batchIDs = [_get_short_id(workSpec.batchID) for workSpec in workspec_list if workSpec.batchID is not None]
+        errStr = ''
+        try:
+            statusMap = statusCache.get_status(batchIDs, self.query_all, self.cacheRefreshInterval)
+        except Exception as e:
+            errStr = str(e)
+            tmpLog.error(errStr)
+            statusMap = None
         retList = []
         for workSpec in workspec_list:
-            # make logger
-            tmpLog = self.make_logger(baseLogger, 'workerID={0}'.format(workSpec.workerID),
-                                      method_name='check_workers')
-            # command
-            comStr = "qstat {0}".format(workSpec.batchID)
-            # check
-            tmpLog.debug('check with {0}'.format(comStr))
-            p = subprocess.Popen(comStr.split(),
-                                 shell=False,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE)
             newStatus = workSpec.status
-            # check return code
-            stdOut, stdErr = p.communicate()
-            retCode = p.returncode
-            tmpLog.debug('retCode={0}'.format(retCode))
-            errStr = ''
-            if retCode == 0:
-                # parse
-                for tmpLine in stdOut.split('\n'):
-                    tmpMatch = re.search('{0} '.format(workSpec.batchID), tmpLine)
-                    if tmpMatch is not None:
-                        errStr = tmpLine
-                        batchStatus = tmpLine.split()[-2]
-                        if batchStatus in ['R', 'E']:
-                            newStatus = WorkSpec.ST_running
-                        elif batchStatus in ['C', 'H']:
-                            newStatus = WorkSpec.ST_finished
-                        elif batchStatus in ['CANCELLED']:
-                            newStatus = WorkSpec.ST_cancelled
-                        elif batchStatus in ['Q', 'W', 'S']:
-                            newStatus = WorkSpec.ST_submitted
-                        else:
-                            newStatus = WorkSpec.ST_failed
-                        tmpLog.debug('batchStatus {0} -> workerStatus {1}'.format(batchStatus,
-                                                                                  newStatus))
-                        break
+            if statusMap is None:
+                # failed to query
                 retList.append((newStatus, errStr))
+            elif workSpec.batchID is None:
+                retList.append((newStatus, 'batchID is not set'))
+            elif _get_short_id(workSpec.batchID) in statusMap:
+                batchStatus = statusMap[_get_short_id(workSpec.batchID)]
+                newStatus = _get_worker_status(batchStatus)
+                tmpLog.debug('workerID={0} batchStatus {1} -> workerStatus {2}'.format(workSpec.workerID,
+                                                                                       batchStatus,
+                                                                                       newStatus))
+                retList.append((newStatus, '{0} {1}'.format(workSpec.batchID, batchStatus)))
             else:
-                # failed
-                errStr = stdOut + ' ' + stdErr
-                tmpLog.error(errStr)
-                if 'Unknown Job Id Error' in errStr:
-                    tmpLog.info("Mark job as finished.")
-                    newStatus = WorkSpec.ST_finished
-                retList.append((newStatus, errStr))
+                # unknown job ID
+                tmpLog.info('workerID={0} mark job as finished since batchID={1} is unknown'.format(
+                    workSpec.workerID, workSpec.batchID))
+                newStatus = WorkSpec.ST_finished
+                retList.append((newStatus, 'Unknown Job Id {0}'.format(workSpec.batchID)))
+        tmpLog.debug('done with {0}'.format(statusCache.get_stats()))
         return True, retList
@@ -1,4 +1,5 @@
-import re
+import time
+import threading
 try:
     import subprocess32 as subprocess
 except:
@@ -11,60 +12,141 @@ from pandaharvester.harvestercore.plugin_base import PluginBase
 # logger
 baseLogger = core_utils.setup_logger('slurm_monitor')
 
+# batch job status shared by all threads. batchID -> (batchStatus, timestamp)
+_status_cache = dict()
+_status_cache_lock = threading.Lock()
+
+# error message of sacct when some of the batch jobs are unknown
+_invalid_job_id_msg = 'slurm_load_jobs error: Invalid job id specified'
+
+
+# convert batch job status to worker status
+def _get_worker_status(batch_status):
+    if batch_status in ['RUNNING', 'COMPLETING', 'STOPPED', 'SUSPENDED']:
+        newStatus = WorkSpec.ST_running
+    elif batch_status in ['COMPLETED', 'PREEMPTED', 'TIMEOUT']:
+        newStatus = WorkSpec.ST_finished
+    elif batch_status in ['CANCELLED']:
+        newStatus = WorkSpec.ST_cancelled
+    elif batch_status in ['CONFIGURING', 'PENDING']:
+        newStatus = WorkSpec.ST_submitted
+    else:
+        newStatus = WorkSpec.ST_failed
+    return newStatus
+
 
 # monitor for SLURM batch system
 class SlurmMonitor(PluginBase):
     # constructor
     def __init__(self, **kwarg):
         PluginBase.__init__(self, **kwarg)
+        # lifetime of cached batch job status in sec
+        try:
+            self.cacheRefreshInterval
+        except AttributeError:
+            self.cacheRefreshInterval = 30
+        # max number of batch jobs in one sacct
+        try:
+            self.maxJobsPerQuery
+        except AttributeError:
+            self.maxJobsPerQuery = 500
+
+    # get status of batch jobs with sacct in bulk, using cache
+    def get_batch_status(self, batchid_list, tmp_log):
+        retMap = dict()
+        timeNow = time.time()
+        # look up cache
+        batchIDsToQuery = []
+        with _status_cache_lock:
+            for batchID in set(batchid_list):
+                if batchID in _status_cache and timeNow - _status_cache[batchID][1] < self.cacheRefreshInterval:
+                    retMap[batchID] = _status_cache[batchID][0]
+                else:
+                    batchIDsToQuery.append(batchID)
+        tmp_log.debug('got {0} jobs from cache, {1} to query'.format(len(retMap), len(batchIDsToQuery)))
+        # query
+        errMap = dict()
+        newStatusMap = dict()
+        for batchIDs in core_utils.create_shards(batchIDsToQuery, self.maxJobsPerQuery):
+            self.query_status(batchIDs, newStatusMap, errMap, tmp_log)
+        # update cache
+        with _status_cache_lock:
+            for batchID, batchStatus in newStatusMap.items():
+                _status_cache[batchID] = (batchStatus, timeNow)
+            # remove expired
+            for batchID in list(_status_cache):
+                if timeNow - _status_cache[batchID][1] >= self.cacheRefreshInterval:
+                    del _status_cache[batchID]
+        retMap.update(newStatusMap)
+        return retMap, errMap
+
+    # run sacct for batch jobs. Return a dict of batchID: status, and an error message if failed
+    def run_sacct(self, batchid_list, tmp_log):
+        comStr = 'sacct --jobs={0} --parsable2 --noheader --format=JobID,State'.format(','.join(batchid_list))
+        tmp_log.debug('check with {0}'.format(comStr))
+        p = subprocess.Popen(comStr.split(),
+                             shell=False,
+                             universal_newlines=True,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        stdOut, stdErr = p.communicate()
+        retCode = p.returncode
+        tmp_log.debug('retCode={0}'.format(retCode))
+        if retCode != 0:
+            return None, stdOut + ' ' + stdErr
+        # parse
+        statusMap = dict()
+        batchIDSet = set(batchid_list)
+        for tmpLine in stdOut.split('\n'):
+            tmpItems = tmpLine.strip().split('|')
+            if len(tmpItems) < 2:
+                continue
+            batchID, batchStatus = tmpItems[:2]
+            # skip job steps
+            if batchID not in batchIDSet:
+                continue
+            # e.g. "CANCELLED by 1234"
+            statusMap[batchID] = batchStatus.split()[0] if batchStatus else batchStatus
+        return statusMap, None
+
+    # query status of batch jobs and fill status_map and err_map. When sacct fails due to invalid job IDs,
+    # which are not shown in the error message, the jobs are queried again in halves to find the invalid ones
+    def query_status(self, batchid_list, status_map, err_map, tmp_log):
+        statusMap, errStr = self.run_sacct(batchid_list, tmp_log)
+        if errStr is None:
+            status_map.update(statusMap)
+        elif _invalid_job_id_msg in errStr and len(batchid_list) > 1:
+            tmp_log.debug('query {0} jobs again in halves to find invalid job IDs'.format(len(batchid_list)))
+            nHalf = len(batchid_list) // 2
+            self.query_status(batchid_list[:nHalf], status_map, err_map, tmp_log)
+            self.query_status(batchid_list[nHalf:], status_map, err_map, tmp_log)
+        else:
+            # failed only for the jobs
+            tmp_log.error(errStr)
+            for batchID in batchid_list:
+                err_map[batchID] = errStr
 
     # check workers
     def check_workers(self, workspec_list):
+        tmpLog = self.make_logger(baseLogger, method_name='check_workers')
+        tmpLog.debug('start nWorkers={0}'.format(len(workspec_list)))
+        batchStatusMap, errMap = self.get_batch_status([workSpec.batchID for workSpec in workspec_list
+                                                        if workSpec.batchID is not None], tmpLog)
         retList = []
         for workSpec in workspec_list:
-            # make logger
-            tmpLog = self.make_logger(baseLogger, 'workerID={0}'.format(workSpec.workerID),
-                                      method_name='check_workers')
-            # command
-            comStr = "sacct --jobs={0}".format(workSpec.batchID)
-            # check
-            tmpLog.debug('check with {0}'.format(comStr))
-            p = subprocess.Popen(comStr.split(),
-                                 shell=False,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE)
             newStatus = workSpec.status
-            # check return code
-            stdOut, stdErr = p.communicate()
-            retCode = p.returncode
-            tmpLog.debug('retCode={0}'.format(retCode))
-            errStr = ''
-            if retCode == 0:
-                # parse
-                for tmpLine in stdOut.split('\n'):
-                    tmpMatch = re.search('{0} '.format(workSpec.batchID), tmpLine)
-                    if tmpMatch is not None:
-                        errStr = tmpLine
-                        batchStatus = tmpLine.split()[5]
-                        if batchStatus in ['RUNNING', 'COMPLETING', 'STOPPED', 'SUSPENDED']:
-                            newStatus = WorkSpec.ST_running
-                        elif batchStatus in ['COMPLETED', 'PREEMPTED', 'TIMEOUT']:
-                            newStatus = WorkSpec.ST_finished
-                        elif batchStatus in ['CANCELLED']:
-                            newStatus = WorkSpec.ST_cancelled
-                        elif batchStatus in ['CONFIGURING', 'PENDING']:
-                            newStatus = WorkSpec.ST_submitted
-                        else:
-                            newStatus = WorkSpec.ST_failed
-                        tmpLog.debug('batchStatus {0} -> workerStatus {1}'.format(batchStatus,
-                                                                                  newStatus))
-                        break
-                retList.append((newStatus, errStr))
+            if workSpec.batchID in batchStatusMap:
+                batchStatus = batchStatusMap[workSpec.batchID]
+                newStatus = _get_worker_status(batchStatus)
+                tmpLog.debug('workerID={0} batchStatus {1} -> workerStatus {2}'.format(workSpec.workerID,
+                                                                                       batchStatus,
+                                                                                       newStatus))
+                retList.append((newStatus, '{0} {1}'.format(workSpec.batchID, batchStatus)))
             else:
-                # failed
-                errStr = stdOut + ' ' + stdErr
-                tmpLog.error(errStr)
-                if 'slurm_load_jobs error: Invalid job id specified' in errStr:
+                # not found in accounting yet or failed to query
+                errStr = errMap.get(workSpec.batchID, '')
+                if _invalid_job_id_msg in errStr:
                     newStatus = WorkSpec.ST_failed
                 retList.append((newStatus, errStr))
+        tmpLog.debug('done')
         return True, retList
@@ -54,6 +54,8 @@ def dump(obj):
 # Globus plugin for stager with bulk transfers. For JobSpec and DBInterface methods, see
 # https://github.com/PanDAWMS/panda-harvester/wiki/Utilities#file-grouping-for-file-transfers
 class GlobusBulkPreparator(PluginBase):
+    # the transfer ID and the source are kept per job
+    reentrant = False
     next_id = 0
     # constructor
     def __init__(self, **kwarg):
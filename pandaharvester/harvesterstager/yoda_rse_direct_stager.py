@@ -42,6 +42,9 @@ class ExecError(EnvironmentError):
 class YodaRseDirectStager(BaseStager):
     """In the workflow for RseDirectStager, workers directly upload output files to RSE
     and thus there is no data motion in Harvester."""
+    # Yodajob and the object store are kept per job
+    reentrant = False
+
     # constructor
     def __init__(self, **kwarg):
         BaseStager.__init__(self, **kwarg)
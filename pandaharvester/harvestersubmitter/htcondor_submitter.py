@@ -17,12 +17,16 @@ from pandaharvester.harvesterconfig import harvester_config
 from pandaharvester.harvestercore.queue_config_mapper import QueueConfigMapper
 from pandaharvester.harvestercore import core_utils
 from pandaharvester.harvestercore.plugin_base import PluginBase
-from pandaharvester.harvestermisc.info_utils import PandaQueuesDict
+from pandaharvester.harvestermisc.info_utils import get_panda_queues_dict
 
 
 # logger
 baseLogger = core_utils.setup_logger('htcondor_submitter')
 
+# cache of parsed SDF templates with modification time of the files
+_sdf_template_cache = dict()
+_sdf_template_cache_lock = threading.Lock()
+
 
 # Integer division round up
 def _div_round_up(a, b):
@@ -163,18 +167,61 @@ def _get_ce_stats_weighting_display(ce_list, worker_ce_all_tuple, ce_weighting):
     return stats_weighting_display_str
 
 
+# queue statement in SDF template
+_re_queue_statement = re.compile(r'^[ \t]*queue\b.*$', re.MULTILINE | re.IGNORECASE)
+
+# values not allowed in itemdata
+_re_unsafe_item = re.compile(r'^$|[\s,"\'()]')
+
+
 # Replace condor Marco from SDF file, return string
 def _condor_macro_replace(string, **kwarg):
     new_string = string
     macro_map = {
                 '\$\(Cluster\)': str(kwarg['ClusterId']),
-                '\$\(Process\)': '0',
+                '\$\(Process\)': str(kwarg.get('ProcId', 0)),
                 }
     for k, v in macro_map.items():
         new_string = re.sub(k, v, new_string)
     return new_string
 
 
+# Read and parse SDF template file, return tuple(template, log value, stdout value, stderr value)
+def _parse_sdf_template_file(template_file):
+    mtime = os.path.getmtime(template_file)
+    with _sdf_template_cache_lock:
+        if template_file in _sdf_template_cache and _sdf_template_cache[template_file][0] == mtime:
+            return _sdf_template_cache[template_file][1]
+    with open(template_file) as tmpFile:
+        sdf_template_raw = tmpFile.read()
+    # get batch_log, stdout, stderr filename, and remove commented lines
+    batch_log_value = None
+    stdout_value = None
+    stderr_value = None
+    sdf_template_str_list = []
+    for _line in sdf_template_raw.split('\n'):
+        if _line.startswith('#'):
+            continue
+        sdf_template_str_list.append(_line)
+        _match_batch_log = re.match('log = (.+)', _line)
+        _match_stdout = re.match('output = (.+)', _line)
+        _match_stderr = re.match('error = (.+)', _line)
+        if _match_batch_log:
+            batch_log_value = _match_batch_log.group(1)
+            continue
+        if _match_stdout:
+            stdout_value = _match_stdout.group(1)
+            continue
+        if _match_stderr:
+            stderr_value = _match_stderr.group(1)
+            continue
+    sdf_template = '\n'.join(sdf_template_str_list)
+    retVal = (sdf_template, batch_log_value, stdout_value, stderr_value)
+    with _sdf_template_cache_lock:
+        _sdf_template_cache[template_file] = (mtime, retVal)
+    return retVal
+
+
 # Parse resource type from string for Unified PanDA Queue
 def _get_resource_type(string, is_unified_queue, is_pilot_option=False):
     string = str(string)
@@ -263,31 +310,7 @@ def submit_a_worker(data):
             if job_id_match:
                 break
         if job_id_match is not None:
-            workspec.batchID = job_id_match.group(2)
-            # set submissionHost
-            if not condor_schedd and not condor_pool:
-                workspec.submissionHost = 'LOCAL'
-            else:
-                workspec.submissionHost = '{0},{1}'.format(condor_schedd, condor_pool)
-
-            tmpLog.debug('submissionHost={0} batchID={1}'.format(workspec.submissionHost, workspec.batchID))
-            # set computingElement
-            workspec.computingElement = ce_info_dict.get('ce_endpoint', '')
-            # set log
-            batch_log = _condor_macro_replace(batch_log_dict['batch_log'], ClusterId=workspec.batchID)
-            batch_stdout = _condor_macro_replace(batch_log_dict['batch_stdout'], ClusterId=workspec.batchID)
-            batch_stderr = _condor_macro_replace(batch_log_dict['batch_stderr'], ClusterId=workspec.batchID)
-            workspec.set_log_file('batch_log', batch_log)
-            workspec.set_log_file('stdout', batch_stdout)
-            workspec.set_log_file('stderr', batch_stderr)
-            if not workspec.get_jobspec_list():
-                tmpLog.debug('No jobspec associated in the worker of workerID={0}'.format(workspec.workerID))
-            else:
-                for jobSpec in workspec.get_jobspec_list():
-                    # using batchLog and stdOut URL as pilotID and pilotLog
-                    jobSpec.set_one_attribute('pilotID', workspec.workAttributes['stdOut'])
-                    jobSpec.set_one_attribute('pilotLog', workspec.workAttributes['batchLog'])
-            tmpLog.debug('Done set_log_file after submission')
+            _set_submitted_worker(workspec, job_id_match.group(2), None, data, tmpLog)
             tmpRetVal = (True, '')
 
         else:
@@ -302,14 +325,169 @@ def submit_a_worker(data):
     return tmpRetVal, workspec.get_changed_attributes()
 
 
+# set attributes of a worker after successful submission. proc_id is None unless submitted in bulk
+def _set_submitted_worker(workspec, cluster_id, proc_id, data, tmpLog):
+    ce_info_dict = data['ce_info_dict']
+    batch_log_dict = data['batch_log_dict']
+    condor_schedd = data['condor_schedd']
+    condor_pool = data['condor_pool']
+    if proc_id is None:
+        workspec.batchID = cluster_id
+    else:
+        workspec.batchID = '{0}.{1}'.format(cluster_id, proc_id)
+    # set submissionHost
+    if not condor_schedd and not condor_pool:
+        workspec.submissionHost = 'LOCAL'
+    else:
+        workspec.submissionHost = '{0},{1}'.format(condor_schedd, condor_pool)
+
+    tmpLog.debug('submissionHost={0} batchID={1}'.format(workspec.submissionHost, workspec.batchID))
+    # set computingElement
+    workspec.computingElement = ce_info_dict.get('ce_endpoint', '')
+    # set log
+    batch_log = _condor_macro_replace(batch_log_dict['batch_log'], ClusterId=cluster_id, ProcId=proc_id or 0)
+    batch_stdout = _condor_macro_replace(batch_log_dict['batch_stdout'], ClusterId=cluster_id, ProcId=proc_id or 0)
+    batch_stderr = _condor_macro_replace(batch_log_dict['batch_stderr'], ClusterId=cluster_id, ProcId=proc_id or 0)
+    workspec.set_log_file('batch_log', batch_log)
+    workspec.set_log_file('stdout', batch_stdout)
+    workspec.set_log_file('stderr', batch_stderr)
+    if not workspec.get_jobspec_list():
+        tmpLog.debug('No jobspec associated in the worker of workerID={0}'.format(workspec.workerID))
+    else:
+        for jobSpec in workspec.get_jobspec_list():
+            # using batchLog and stdOut URL as pilotID and pilotLog
+            jobSpec.set_one_attribute('pilotID', workspec.workAttributes['stdOut'])
+            jobSpec.set_one_attribute('pilotLog', workspec.workAttributes['batchLog'])
+    tmpLog.debug('Done set_log_file after submission')
+
+
+# submit workers sharing schedd, pool, CE and template with one condor_submit using itemdata
+def submit_bulk_workers(data_list):
+    # make logger
+    tmpLog = core_utils.make_logger(baseLogger, 'workerIDs={0}'.format(','.join(str(data['workspec'].workerID)
+                                                                                for data in data_list)),
+                                    method_name='submit_bulk_workers')
+    workspec_list = [data['workspec'] for data in data_list]
+    template = data_list[0]['template']
+    condor_schedd = data_list[0]['condor_schedd']
+    condor_pool = data_list[0]['condor_pool']
+    use_spool = data_list[0]['use_spool']
+    for workspec in workspec_list:
+        workspec.reset_changed_list()
+    # the template must end with a single "queue 1" statement to be replaced with itemdata
+    queue_list = _re_queue_statement.findall(template)
+    template_body = template.rstrip()
+    if len(queue_list) != 1 or not template_body.endswith(queue_list[0]) \
+            or queue_list[0].split()[1:] not in ([], ['1']):
+        tmpLog.debug('template does not end with a single queue statement. Submit one by one')
+        return [submit_a_worker(data) for data in data_list]
+    template_body = template_body[:-len(queue_list[0])].rstrip() + '\n'
+    # values to fill in the template
+    format_dict_list = [get_sdf_format_dict(sdf_path=None, **data) for data in data_list]
+    # values varying among workers are passed as itemdata
+    var_key_list = [key for key in sorted(format_dict_list[0])
+                    if len(set(str(format_dict[key]) for format_dict in format_dict_list)) > 1]
+    # split the group if varying values cannot be itemdata, e.g. containing spaces or commas
+    unsafe_key_list = [key for key in var_key_list
+                       if any(_re_unsafe_item.search(str(format_dict[key])) for format_dict in format_dict_list)]
+    if unsafe_key_list:
+        sub_group_dict = dict()
+        for data, format_dict in zip(data_list, format_dict_list):
+            sub_group_key = tuple(str(format_dict[key]) for key in unsafe_key_list)
+            sub_group_dict.setdefault(sub_group_key, [])
+            sub_group_dict[sub_group_key].append(data)
+        tmpLog.debug('split into {0} groups due to {1}'.format(len(sub_group_dict), ','.join(unsafe_key_list)))
+        retMap = dict()
+        for sub_data_list in sub_group_dict.values():
+            for data, tmpRet in zip(sub_data_list, submit_bulk_workers(sub_data_list)):
+                retMap[data['workspec'].workerID] = tmpRet
+        return [retMap[workspec.workerID] for workspec in workspec_list]
+    tmpFile = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='_submit.sdf',
+                                          dir=workspec_list[0].get_access_point())
+    format_dict = dict(format_dict_list[0])
+    format_dict['sdfPath'] = tmpFile.name
+    for key in var_key_list:
+        format_dict[key] = '$(harvester_{0})'.format(key)
+    sdf_str = template_body.format(**format_dict)
+    if var_key_list:
+        sdf_str += 'queue {0} from (\n'.format(','.join('harvester_{0}'.format(key) for key in var_key_list))
+        for tmp_format_dict in format_dict_list:
+            sdf_str += ','.join(str(tmp_format_dict[key]) for key in var_key_list) + '\n'
+        sdf_str += ')\n'
+    else:
+        sdf_str += 'queue {0}\n'.format(len(data_list))
+    tmpFile.write(sdf_str)
+    tmpFile.close()
+    # make condor remote options
+    name_opt = '-name {0}'.format(condor_schedd) if condor_schedd else ''
+    pool_opt = '-pool {0}'.format(condor_pool) if condor_pool else ''
+    spool_opt = '-remote -spool' if use_spool and condor_schedd else ''
+    # command
+    comStr = 'condor_submit {spool_opt} {name_opt} {pool_opt} {sdf_file}'.format(sdf_file=tmpFile.name,
+                                                                        name_opt=name_opt,
+                                                                        pool_opt=pool_opt,
+                                                                        spool_opt=spool_opt)
+    # submit
+    tmpLog.debug('submit {0} workers with command: {1}'.format(len(data_list), comStr))
+    try:
+        p = subprocess.Popen(comStr.split(),
+                             shell=False,
+                             universal_newlines=True,
+                             stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE)
+        # check return code
+        stdOut, stdErr = p.communicate()
+        retCode = p.returncode
+    except Exception:
+        stdOut = ''
+        stdErr = core_utils.dump_error_message(tmpLog, no_message=True)
+        retCode = 1
+    tmpLog.debug('retCode={0}'.format(retCode))
+    retList = []
+    if retCode == 0:
+        # extract ClusterId. ProcIds are assigned in order of itemdata
+        job_id_match = None
+        for tmp_line_str in stdOut.split('\n'):
+            job_id_match = re.search('^(\d+) job[(]s[)] submitted to cluster (\d+)\.$', tmp_line_str)
+            if job_id_match:
+                break
+        if job_id_match is not None and int(job_id_match.group(1)) == len(data_list):
+            cluster_id = job_id_match.group(2)
+            for proc_id, data in enumerate(data_list):
+                workspec = data['workspec']
+                _set_submitted_worker(workspec, cluster_id, proc_id, data, tmpLog)
+                retList.append(((True, ''), workspec.get_changed_attributes()))
+            return retList
+        errStr = 'batchID cannot be found or number of jobs mismatched'
+    else:
+        # failed
+        errStr = '{0} \n {1}'.format(stdOut, stdErr)
+    tmpLog.error(errStr)
+    for workspec in workspec_list:
+        retList.append(((None, errStr), workspec.get_changed_attributes()))
+    return retList
+
+
 # make batch script
-def make_batch_script(workspec, template, n_core_per_node, log_dir, panda_queue_name, executable_file,
-                        x509_user_proxy, log_subdir=None, ce_info_dict=dict(), batch_log_dict=dict(),
-                        special_par='', harvester_queue_config=None, is_unified_queue=False, **kwarg):
+def make_batch_script(workspec, template, **kwarg):
     # make logger
     tmpLog = core_utils.make_logger(baseLogger, 'workerID={0}'.format(workspec.workerID),
                                     method_name='make_batch_script')
     tmpFile = tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='_submit.sdf', dir=workspec.get_access_point())
+    # fill in template
+    tmpFile.write(template.format(**get_sdf_format_dict(workspec, sdf_path=tmpFile.name, **kwarg)))
+    tmpFile.close()
+    tmpLog.debug('done')
+    return tmpFile.name
+
+
+# get values to fill in SDF template of a worker
+def get_sdf_format_dict(workspec, sdf_path, n_core_per_node, log_dir, panda_queue_name, executable_file,
+                        x509_user_proxy, log_subdir=None, ce_info_dict=dict(), batch_log_dict=dict(),
+                        special_par='', harvester_queue_config=None, is_unified_queue=False, **kwarg):
+    # make logger
+    tmpLog = core_utils.make_logger(baseLogger, 'workerID={0}'.format(workspec.workerID),
+                                    method_name='get_sdf_format_dict')
 
     # Note: In workspec, unit of minRamCount and of maxDiskCount are both MB.
     #       In HTCondor SDF, unit of request_memory is MB, and request_disk is KB.
@@ -349,9 +527,9 @@ def make_batch_script(workspec, template, n_core_per_node, log_dir, panda_queue_
     if prod_source_label is None:
         prod_source_label = harvester_queue_config.get_source_label()
 
-    # fill in template
-    tmpFile.write(template.format(
-        sdfPath=tmpFile.name,
+    # values to fill in template
+    return dict(
+        sdfPath=sdf_path,
         executableFile=executable_file,
         nCorePerNode=n_core_per_node,
         nCoreTotal=n_core_total,
@@ -384,10 +562,6 @@ def make_batch_script(workspec, template, n_core_per_node, log_dir, panda_queue_
         ioIntensity=io_intensity,
         pilotType=workspec.pilotType,
         )
-    )
-    tmpFile.close()
-    tmpLog.debug('done')
-    return tmpFile.name
 
 
 # parse log, stdout, stderr filename
@@ -466,6 +640,11 @@ class HTCondorSubmitter(PluginBase):
             self.useSpool
         except AttributeError:
             self.useSpool = True
+        # submit workers in bulk with one condor_submit per schedd, pool, CE and template
+        try:
+            self.useBulkSubmit = bool(self.useBulkSubmit)
+        except AttributeError:
+            self.useBulkSubmit = False
         # record of information of CE statistics
         self.ceStatsLock = threading.Lock()
         self.ceStats = dict()
@@ -512,7 +691,7 @@ class HTCondorSubmitter(PluginBase):
 
         # get queue info from AGIS by cacher in db
         if self.useAtlasAGIS:
-            panda_queues_dict = PandaQueuesDict()
+            panda_queues_dict = get_panda_queues_dict()
             panda_queue_name = panda_queues_dict.get_panda_queue_name(self.queueName)
             this_panda_queue_dict = panda_queues_dict.get(self.queueName, dict())
             # tmpLog.debug('panda_queues_name and queue_info: {0}, {1}'.format(self.queueName, panda_queues_dict[self.queueName]))
@@ -574,6 +753,7 @@ class HTCondorSubmitter(PluginBase):
                                             method_name='_handle_one_worker')
             ce_info_dict = dict()
             batch_log_dict = dict()
+            template_file = getattr(self, 'templateFile', None)
             data = {'workspec': workspec,
                     'to_submit': to_submit,}
             if to_submit:
@@ -604,7 +784,7 @@ class HTCondorSubmitter(PluginBase):
                     tmpLog.debug('For site {0} got CE endpoint: "{1}", flavour: "{2}"'.format(self.queueName, ce_endpoint_from_queue, ce_flavour_str))
                     if os.path.isdir(self.CEtemplateDir) and ce_flavour_str:
                         sdf_template_filename = '{ce_flavour_str}.sdf'.format(ce_flavour_str=ce_flavour_str)
-                        self.templateFile = os.path.join(self.CEtemplateDir, sdf_template_filename)
+                        template_file = os.path.join(self.CEtemplateDir, sdf_template_filename)
                 else:
                     try:
                         # Manually define site condor schedd as ceHostname and central manager as ceEndpoint
@@ -620,34 +800,13 @@ class HTCondorSubmitter(PluginBase):
                     except AttributeError:
                         pass
                 # template for batch script
-                try:
-                    tmpFile = open(self.templateFile)
-                    sdf_template_raw = tmpFile.read()
-                    tmpFile.close()
-                except AttributeError:
+                if template_file is None:
                     tmpLog.error('No valid templateFile found. Maybe templateFile, CEtemplateDir invalid, or no valid CE found')
                     to_submit = False
                     return data
                 else:
-                    # get batch_log, stdout, stderr filename, and remobe commented liness
-                    sdf_template_str_list = []
-                    for _line in sdf_template_raw.split('\n'):
-                        if _line.startswith('#'):
-                            continue
-                        sdf_template_str_list.append(_line)
-                        _match_batch_log = re.match('log = (.+)', _line)
-                        _match_stdout = re.match('output = (.+)', _line)
-                        _match_stderr = re.match('error = (.+)', _line)
-                        if _match_batch_log:
-                            batch_log_value = _match_batch_log.group(1)
-                            continue
-                        if _match_stdout:
-                            stdout_value = _match_stdout.group(1)
-                            continue
-                        if _match_stderr:
-                            stderr_value = _match_stderr.group(1)
-                            continue
-                    sdf_template = '\n'.join(sdf_template_str_list)
+                    sdf_template, batch_log_value, stdout_value, stderr_value = \
+                        _parse_sdf_template_file(template_file)
                     # Choose from Condor schedd and central managers
                     if isinstance(self.condorSchedd, list) and len(self.condorSchedd) > 0:
                         if isinstance(self.condorPool, list) and len(self.condorPool) > 0:
@@ -694,6 +853,7 @@ class HTCondorSubmitter(PluginBase):
                         'workspec': workspec,
                         'to_submit': to_submit,
                         'template': sdf_template,
+                        'template_file': template_file,
                         'executable_file': self.executableFile,
                         'log_dir': self.logDir,
                         'log_subdir': log_subdir,
@@ -727,9 +887,31 @@ class HTCondorSubmitter(PluginBase):
             dataIterator = thread_pool.map(_handle_one_worker, workspec_list)
         tmpLog.debug('{0} workers handled'.format(nWorkers))
 
-        # exec with mcore
-        with ThreadPoolExecutor(self.nProcesses) as thread_pool:
-            retValList = thread_pool.map(submit_a_worker, dataIterator)
+        if self.useBulkSubmit:
+            # group workers to submit in bulk
+            dataList = list(dataIterator)
+            groupDict = dict()
+            retValMap = dict()
+            for data in dataList:
+                if not data['to_submit'] or 'condor_schedd' not in data:
+                    retValMap[data['workspec'].workerID] = submit_a_worker(data)
+                    continue
+                groupKey = (data['condor_schedd'], data['condor_pool'], data['ce_info_dict'].get('ce_endpoint'),
+                            data['ce_info_dict'].get('ce_queue_name'), data['template_file'])
+                groupDict.setdefault(groupKey, [])
+                groupDict[groupKey].append(data)
+            tmpLog.debug('{0} workers grouped into {1} bulk submissions'.format(nWorkers, len(groupDict)))
+            # exec with mcore
+            with ThreadPoolExecutor(self.nProcesses) as thread_pool:
+                for groupDataList, groupRetValList in zip(groupDict.values(),
+                                                          thread_pool.map(submit_bulk_workers, groupDict.values())):
+                    for data, retVal in zip(groupDataList, groupRetValList):
+                        retValMap[data['workspec'].workerID] = retVal
+            retValList = [retValMap[workspec.workerID] for workspec in workspec_list]
+        else:
+            # exec with mcore
+            with ThreadPoolExecutor(self.nProcesses) as thread_pool:
+                retValList = thread_pool.map(submit_a_worker, dataIterator)
         tmpLog.debug('{0} workers submitted'.format(nWorkers))
 
         # propagate changed attributes
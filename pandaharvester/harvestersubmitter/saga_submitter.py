@@ -12,6 +12,8 @@ baseLogger = core_utils.setup_logger('saga_submitter')
 
 # SAGA submitter
 class SAGASubmitter (PluginBase):
+    # the worker being submitted is kept for status callbacks
+    reentrant = False
 
     # constructor
     # constructor define job service with particular adaptor (can be extended to support remote execution)
@@ -49,6 +49,49 @@ class ACTSweeper(PluginBase):
         tmpLog.info('Job {0} cancelled in aCT'.format(workspec.batchID))
         return True, ''
 
+    # kill workers
+    def kill_workers(self, workspec_list):
+        """ Mark aCT jobs as tobekilled in one statement per chunk.
+
+        :param workspec_list: list of worker specifications
+        :type workspec_list: [WorkSpec]
+        :return: A list of tuples of return code (True for success, False otherwise) and error dialog
+        :rtype: [(bool, string)]
+        """
+        # make logger
+        tmpLog = core_utils.make_logger(baseLogger, method_name='kill_workers')
+        retMap = dict()
+        batchIDs = set()
+        for workspec in workspec_list:
+            if workspec.batchID is None:
+                tmpLog.info('workerID={0} has no batch ID so assume was not submitted - skipped'.format(
+                            workspec.workerID))
+                retMap[workspec.workerID] = (True, '')
+                continue
+            try:
+                batchIDs.add(int(workspec.batchID))
+            except ValueError:
+                retMap[workspec.workerID] = (False, 'invalid batch ID {0}'.format(workspec.batchID))
+        errMap = dict()
+        for tmpBatchIDs in core_utils.create_shards(sorted(batchIDs), 1000):
+            try:
+                self.actDB.updateJobs('id IN ({0})'.format(','.join([str(i) for i in tmpBatchIDs])),
+                                      {'actpandastatus': 'tobekilled', 'pandastatus': None})
+            except Exception as e:
+                tmpLog.error('Failed to cancel {0} jobs in aCT: {1}'.format(len(tmpBatchIDs), str(e)))
+                for batchID in tmpBatchIDs:
+                    errMap[batchID] = str(e)
+        for workspec in workspec_list:
+            if workspec.workerID in retMap:
+                continue
+            batchID = int(workspec.batchID)
+            if batchID in errMap:
+                retMap[workspec.workerID] = (False, errMap[batchID])
+            else:
+                tmpLog.info('Job {0} cancelled in aCT'.format(workspec.batchID))
+                retMap[workspec.workerID] = (True, '')
+        return [retMap[workspec.workerID] for workspec in workspec_list]
+
 
     # cleanup for a worker
     def sweep_worker(self, workspec):
@@ -76,7 +76,7 @@ class HTCondorSweeper(BaseSweeper):
                                                                         pool_opt=pool_opt,
                                                                         batchID=workspec.batchID)
             (retCode, stdOut, stdErr) = _runShell(comStr)
-            if ('ClusterId = {0}'.format(workspec.batchID) in str(stdOut) \
+            if ('ClusterId = {0}'.format(workspec.batchID.split('.')[0]) in str(stdOut) \
                 and 'JobStatus = 3' not in str(stdOut)) or retCode != 0:
                 ## Force to cancel if batch job not terminated first time
                 comStr = 'condor_rm -forcex {name_opt} {pool_opt} {batchID}'.format(name_opt=name_opt,
@@ -135,7 +135,7 @@ class HTCondorSweeper(BaseSweeper):
                                                                             pool_opt=pool_opt,
                                                                             batchID=workspec.batchID)
                 (retCode, stdOut, stdErr) = _runShell(comStr)
-                if ('ClusterId = {0}'.format(workspec.batchID) in str(stdOut) \
+                if ('ClusterId = {0}'.format(workspec.batchID.split('.')[0]) in str(stdOut) \
                     and 'JobStatus = 3' not in str(stdOut)) or retCode != 0:
                     ## Force to cancel if batch job not terminated first time
                     comStr = 'condor_rm -forcex {name_opt} {pool_opt} {batchID}'.format(name_opt=name_opt,
@@ -17,7 +17,11 @@ class K8sSweeper(BaseSweeper):
 
         self.k8s_client = k8s_Client(namespace=self.k8s_namespace, config_file=self.k8s_config_file)
 
-        self._all_pods_list = []
+        # number of threads for API calls which cannot be combined
+        try:
+            self.nProcesses
+        except AttributeError:
+            self.nProcesses = 4
 
     # # kill a worker
     # def kill_worker(self, workspec):
@@ -59,41 +63,69 @@ class K8sSweeper(BaseSweeper):
     def kill_workers(self, workspec_list):
         tmpLog = self.make_logger(baseLogger, method_name='kill_workers')
 
-        self._all_pods_list = self.k8s_client.get_pods_info()
-
-        retList = []
+        # workers without batchID were not submitted
+        retMap = dict()
         for workspec in workspec_list:
-            tmpRetVal = (None, 'Nothing done')
-
+            if workspec.batchID is None:
+                tmpLog.info('Found workerID={0} without batchID. Skipped'.format(workspec.workerID))
+                retMap[workspec.workerID] = (True, '')
+        submitted_workspec_list = [workspec for workspec in workspec_list if workspec.workerID not in retMap]
+        if not submitted_workspec_list:
+            return [retMap[workspec.workerID] for workspec in workspec_list]
+
+        # jobs submitted before jobs were labelled are deleted one by one
+        try:
+            unlabelled_job_names = self.k8s_client.get_unlabelled_job_names()
+        except Exception as _e:
+            tmpLog.error('Failed to list unlabelled JOBs ; {0}'.format(_e))
+            unlabelled_job_names = set()
+        errMap = dict()
+        labelled_worker_ids = []
+        for workspec in submitted_workspec_list:
+            job_id = workspec.batchID
+            if job_id in unlabelled_job_names:
+                try:
+                    self.k8s_client.delete_job(job_id)
+                except Exception as _e:
+                    errMap[workspec.workerID] = 'Failed to delete a JOB with id={0} ; {1}'.format(job_id, _e)
+            else:
+                labelled_worker_ids.append(workspec.workerID)
+
+        # delete labelled jobs with label selectors
+        try:
+            jobErrMap = self.k8s_client.delete_jobs_by_worker_id(labelled_worker_ids, n_threads=self.nProcesses)
+        except Exception as _e:
+            jobErrMap = dict([(worker_id, str(_e)) for worker_id in labelled_worker_ids])
+        for workspec in submitted_workspec_list:
+            if jobErrMap.get(workspec.workerID):
+                errMap[workspec.workerID] = 'Failed to delete a JOB with id={0} ; {1}'.format(
+                    workspec.batchID, jobErrMap[workspec.workerID])
+
+        # delete pods of the jobs including ones left after jobs are gone
+        try:
+            podErrMap = self.k8s_client.delete_pods_by_job_name([workspec.batchID
+                                                                 for workspec in submitted_workspec_list],
+                                                                n_threads=self.nProcesses)
+        except Exception as _e:
+            podErrMap = dict([(workspec.batchID, str(_e)) for workspec in submitted_workspec_list])
+
+        for workspec in submitted_workspec_list:
             job_id = workspec.batchID
-            try:
-                self.k8s_client.delete_job(job_id)
-            except Exception as _e:
-                errStr = 'Failed to delete a JOB with id={0} ; {1}'.format(job_id, _e)
-                tmpLog.error(errStr)
-                tmpRetVal = (False, errStr)
-
-            pods_list = self.k8s_client.filter_pods_info(self._all_pods_list, job_name=job_id)
-            pods_name = [ pods_info['name'] for pods_info in pods_list ]
-            job_info = self.k8s_client.get_jobs_info(job_id)
-
-            if not job_info:
-                retList = self.k8s_client.delete_pods(pods_name)
-                if all(item['errMsg'] == '' for item in retList):
-                    tmpLog.info('Deleted a JOB & POD with id={0}'.format(job_id))
-                    tmpRetVal = (True, '')
-                else:
-                    errStrList = list()
-                    for item in retList:
-                        if item['errMsg']:
-                            errStr = 'Failed to delete a POD with id={0} ; {1}'.format(item['name'], item['errMsg'])
-                            tmpLog.error(errStr)
-                            errStrList.append(errStr)
-                    tmpRetVal = (False, ','.join(errStrList))
-
-            retList.append(tmpRetVal)
-
-        return retList
+            errStrList = list()
+            if workspec.workerID in errMap:
+                errStrList.append(errMap[workspec.workerID])
+            if podErrMap.get(job_id):
+                errStrList.append('Failed to delete PODs of JOB id={0} ; {1}'.format(job_id, podErrMap[job_id]))
+            if errStrList:
+                for errStr in errStrList:
+                    tmpLog.error(errStr)
+                tmpRetVal = (False, ','.join(errStrList))
+            else:
+                tmpLog.info('Deleted a JOB & POD with id={0}'.format(job_id))
+                tmpRetVal = (True, '')
+            retMap[workspec.workerID] = tmpRetVal
+
+        return [retMap[workspec.workerID] for workspec in workspec_list]
 
 
     # cleanup for a worker
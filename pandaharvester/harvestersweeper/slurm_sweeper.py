@@ -1,4 +1,5 @@
 import os
+import re
 import shutil
 try:
     import subprocess32 as subprocess
@@ -46,6 +47,50 @@ class SlurmSweeper(PluginBase):
         # return
         return True, ''
 
+    # kill workers
+    def kill_workers(self, workspec_list):
+        # make logger
+        tmpLog = self.make_logger(baseLogger, method_name='kill_workers')
+        retMap = dict()
+        batchIDs = []
+        for workspec in workspec_list:
+            if workspec.batchID is None:
+                tmpLog.info('Found workerID={0} without batchID. Skipped'.format(workspec.workerID))
+                retMap[workspec.workerID] = (True, '')
+            else:
+                batchIDs.append(workspec.batchID)
+        # kill command in bulk
+        errMap = dict()
+        for tmpBatchIDs in core_utils.create_shards(sorted(set(batchIDs)), 500):
+            comStr = 'scancel {0}'.format(' '.join(tmpBatchIDs))
+            p = subprocess.Popen(comStr.split(), shell=False, universal_newlines=True,
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdOut, stdErr = p.communicate()
+            retCode = p.returncode
+            if retCode != 0:
+                # failed for some jobs
+                errStr = 'command "{0}" failed, retCode={1}, error: {2} {3}'.format(comStr, retCode, stdOut, stdErr)
+                tmpLog.error(errStr)
+                foundErr = False
+                for tmpLine in stdErr.split('\n'):
+                    tmpMatch = re.search('job id ([^:\s]+)', tmpLine)
+                    if tmpMatch is not None:
+                        errMap[tmpMatch.group(1)] = tmpLine
+                        foundErr = True
+                # failed for all jobs when job-wise errors are unknown
+                if not foundErr:
+                    for batchID in tmpBatchIDs:
+                        errMap[batchID] = errStr
+        for workspec in workspec_list:
+            if workspec.workerID in retMap:
+                continue
+            if workspec.batchID in errMap:
+                retMap[workspec.workerID] = (False, errMap[workspec.batchID])
+            else:
+                tmpLog.info('Succeeded to kill workerID={0} batchID={1}'.format(workspec.workerID, workspec.batchID))
+                retMap[workspec.workerID] = (True, '')
+        return [retMap[workspec.workerID] for workspec in workspec_list]
+
     # cleanup for a worker
     def sweep_worker(self, workspec):
         """Perform cleanup procedures for a worker, such as deletion of work directory.
@@ -0,0 +1,101 @@
+import sys
+import time
+import types
+import sqlite3
+
+from pandaharvester.harvestercore.work_spec import WorkSpec
+
+# test of ACTMonitor.check_workers and ACTSweeper.kill_workers with a fake aCT DB in sqlite
+# usage: python actBulkTest.py [nWorkers]
+
+try:
+    nWorkers = int(sys.argv[1])
+except Exception:
+    nWorkers = 5000
+
+
+# test double of aCTDBPanda. select strings are used as WHERE clauses like the real one
+class FakeACTDBPanda(object):
+    def __init__(self, log=None):
+        self.conn = sqlite3.connect(':memory:', check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('CREATE TABLE pandajobs (id INTEGER PRIMARY KEY, actpandastatus TEXT, '
+                          'pandastatus TEXT, computingElement TEXT)')
+        self.nQueries = 0
+
+    def insertJob(self, job_id, act_status, computing_element=None):
+        self.conn.execute('INSERT INTO pandajobs VALUES (?,?,?,?)',
+                          (job_id, act_status, 'running', computing_element))
+
+    def getJobs(self, select, columns=[]):
+        self.nQueries += 1
+        cur = self.conn.execute('SELECT {0} FROM pandajobs WHERE {1}'.format(','.join(columns), select))
+        return [dict(row) for row in cur.fetchall()]
+
+    def updateJobs(self, select, desc):
+        self.nQueries += 1
+        setStr = ','.join(['{0}=?'.format(key) for key in desc])
+        self.conn.execute('UPDATE pandajobs SET {0} WHERE {1}'.format(setStr, select), list(desc.values()))
+
+
+# use the fake unless aCT is installed
+try:
+    import act.atlas.aCTDBPanda
+except ImportError:
+    for modName in ['act', 'act.common', 'act.common.aCTConfig', 'act.atlas', 'act.atlas.aCTDBPanda']:
+        sys.modules[modName] = types.ModuleType(modName)
+    sys.modules['act.common.aCTConfig'].aCTConfigARC = object
+    sys.modules['act.atlas.aCTDBPanda'].aCTDBPanda = FakeACTDBPanda
+
+from pandaharvester.harvestermonitor.act_monitor import ACTMonitor
+from pandaharvester.harvestersweeper.act_sweeper import ACTSweeper
+
+monitor = ACTMonitor(maxJobsPerQuery=1000)
+sweeper = ACTSweeper()
+if not isinstance(monitor.actDB, FakeACTDBPanda):
+    print('aCT is installed. Use the fake DB')
+    monitor.actDB = FakeACTDBPanda()
+actDB = sweeper.actDB = monitor.actDB
+
+actStatusList = ['sent', 'running', 'done', 'donefailed', 'donecancelled']
+workSpecs = []
+for workerID in range(1, nWorkers + 1):
+    workSpec = WorkSpec()
+    workSpec.workerID = workerID
+    workSpec.status = WorkSpec.ST_submitted
+    # every 10th job is missing in aCT
+    workSpec.batchID = str(workerID + 100)
+    if workerID % 10 != 0:
+        actDB.insertJob(workerID + 100, actStatusList[workerID % len(actStatusList)], 'ce{0}'.format(workerID % 3))
+    workSpecs.append(workSpec)
+workSpec = WorkSpec()
+workSpec.workerID = nWorkers + 1
+workSpec.status = WorkSpec.ST_submitted
+workSpecs.append(workSpec)
+
+# monitor
+timeStart = time.time()
+tmpStat, retList = monitor.check_workers(workSpecs)
+print('check_workers of {0} workers: {1:.3f} sec with {2} queries'.format(len(workSpecs), time.time() - timeStart,
+                                                                          actDB.nQueries))
+expected = {'sent': WorkSpec.ST_submitted, 'running': WorkSpec.ST_running, 'done': WorkSpec.ST_finished,
+            'donefailed': WorkSpec.ST_failed, 'donecancelled': WorkSpec.ST_cancelled}
+for workSpec, (newStatus, diagMessage) in zip(workSpecs, retList):
+    if workSpec.batchID is None:
+        assert newStatus == WorkSpec.ST_submitted
+    elif workSpec.workerID % 10 == 0:
+        assert (newStatus, diagMessage) == (WorkSpec.ST_failed, 'Job not found in aCT')
+    else:
+        assert newStatus == expected[actStatusList[workSpec.workerID % len(actStatusList)]]
+        assert workSpec.computingElement == 'ce{0}'.format(workSpec.workerID % 3)
+assert len(retList) == len(workSpecs)
+
+# sweeper
+actDB.nQueries = 0
+timeStart = time.time()
+retList = sweeper.kill_workers(workSpecs)
+print('kill_workers of {0} workers: {1:.3f} sec with {2} queries'.format(len(workSpecs), time.time() - timeStart,
+                                                                         actDB.nQueries))
+assert all([tmpStat for tmpStat, tmpOut in retList])
+assert len(actDB.getJobs("actpandastatus='tobekilled'", ['id'])) == nWorkers - nWorkers // 10
+print('OK')
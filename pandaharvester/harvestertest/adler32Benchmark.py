@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+from pandaharvester.harvestercore import core_utils
+
+# benchmark of core_utils.calc_adler32 and core_utils.calc_adler32_bulk on synthetic files
+# usage: python adler32Benchmark.py [nFiles] [fileSizeMB]
+
+
+# the main module is imported by the process pool
+def main():
+    try:
+        nFiles = int(sys.argv[1])
+    except Exception:
+        nFiles = 8
+    try:
+        fileSizeMB = int(sys.argv[2])
+    except Exception:
+        fileSizeMB = 256
+
+    # make files
+    tmpDir = tempfile.mkdtemp()
+    fileNames = []
+    block = os.urandom(1024 * 1024)
+    for i in range(nFiles):
+        fileName = os.path.join(tmpDir, 'file{0}.root'.format(i))
+        with open(fileName, 'wb') as f:
+            for j in range(fileSizeMB):
+                f.write(block)
+        fileNames.append(fileName)
+    print('{0} files of {1} MB in {2}'.format(nFiles, fileSizeMB, tmpDir))
+
+    try:
+        # sequential without cache as before
+        time_point = time.time()
+        refMap = dict()
+        for fileName in fileNames:
+            refMap[fileName] = core_utils._calc_adler32(fileName)
+        print('sequential          : {0:.3f} sec'.format(time.time() - time_point))
+
+        # in parallel
+        time_point = time.time()
+        retMap = core_utils.calc_adler32_bulk(fileNames)
+        print('bulk                : {0:.3f} sec'.format(time.time() - time_point))
+        assert retMap == refMap
+
+        # cached
+        time_point = time.time()
+        for fileName in fileNames:
+            assert core_utils.calc_adler32(fileName) == refMap[fileName]
+        print('cached              : {0:.3f} sec'.format(time.time() - time_point))
+
+        # cache is invalidated when files are modified
+        with open(fileNames[0], 'ab') as f:
+            f.write(b'x')
+        assert core_utils.calc_adler32(fileNames[0]) == core_utils._calc_adler32(fileNames[0])
+        print('cache invalidation  : OK')
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+if __name__ == '__main__':
+    main()
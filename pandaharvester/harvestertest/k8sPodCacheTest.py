@@ -0,0 +1,103 @@
+import sys
+import time
+import threading
+
+from pandaharvester.harvestermisc.k8s_pod_cache import PodCache
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
+
+# test of PodCache with a fake client emitting synthetic watch events
+# usage: python k8sPodCacheTest.py [nPods]
+
+try:
+    nPods = int(sys.argv[1])
+except Exception:
+    nPods = 10000
+
+
+class FakeObject(object):
+    def __init__(self, **kwarg):
+        self.__dict__.update(kwarg)
+
+
+def make_pod(name, job_name, phase, resource_version):
+    return FakeObject(metadata=FakeObject(name=name, labels={'job-name': job_name},
+                                          resource_version=str(resource_version)),
+                      status=FakeObject(start_time=None, phase=phase, conditions=None))
+
+
+class FakeCoreV1(object):
+    def __init__(self, n_pods):
+        self.pods = [make_pod('pod-{0}'.format(i), 'job-{0}'.format(i), 'Pending', i) for i in range(n_pods)]
+        self.nList = 0
+
+    def list_namespaced_pod(self, namespace, **kwarg):
+        self.nList += 1
+        return FakeObject(items=self.pods, metadata=FakeObject(resource_version=str(len(self.pods))))
+
+
+# watch stream fed from a queue. Stops when timed out like the real one
+class FakeWatch(object):
+    def __init__(self):
+        self.queue = Queue()
+
+    def stream(self, func, **kwarg):
+        while True:
+            try:
+                event = self.queue.get(timeout=kwarg['timeout_seconds'])
+            except Empty:
+                return
+            yield event
+
+
+def wait_for(func, timeout=5):
+    timeLimit = time.time() + timeout
+    while time.time() < timeLimit:
+        if func():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+corev1 = FakeCoreV1(nPods)
+fakeWatch = FakeWatch()
+podCache = PodCache(corev1, 'default', watch_stream=fakeWatch.stream, watch_timeout=1, retry_interval=0.1)
+
+# initial list
+tmpMap = podCache.get_pods_info_by_job_name(['job-0', 'job-1', 'no-job'])
+assert [p['status'] for p in tmpMap['job-0']] == ['Pending'], tmpMap
+assert tmpMap['no-job'] == []
+print('listed {0} pods'.format(len(podCache.pod_map)))
+
+# events
+fakeWatch.queue.put({'type': 'MODIFIED', 'object': make_pod('pod-0', 'job-0', 'Running', nPods + 1)})
+fakeWatch.queue.put({'type': 'ADDED', 'object': make_pod('pod-0b', 'job-0', 'Pending', nPods + 2)})
+fakeWatch.queue.put({'type': 'DELETED', 'object': make_pod('pod-1', 'job-1', 'Succeeded', nPods + 3)})
+assert wait_for(lambda: podCache.resource_version == str(nPods + 3))
+tmpMap = podCache.get_pods_info_by_job_name(['job-0', 'job-1'])
+assert sorted([p['status'] for p in tmpMap['job-0']]) == ['Pending', 'Running'], tmpMap
+assert tmpMap['job-1'] == [], tmpMap
+print('ADDED/MODIFIED/DELETED applied')
+
+# error like 410 Gone makes the cache list pods again
+fakeWatch.queue.put({'type': 'ERROR', 'object': {'code': 410, 'reason': 'Gone'}})
+assert wait_for(lambda: corev1.nList == 2)
+assert wait_for(lambda: podCache.synced.is_set())
+tmpMap = podCache.get_pods_info_by_job_name(['job-0', 'job-1'])
+assert [p['status'] for p in tmpMap['job-0']] == ['Pending'], tmpMap
+assert len(tmpMap['job-1']) == 1, tmpMap
+print('listed again after ERROR')
+
+# look-up time
+jobNames = ['job-{0}'.format(i) for i in range(nPods)]
+timeStart = time.time()
+tmpMap = podCache.get_pods_info_by_job_name(jobNames)
+print('look-up of {0} jobs in cache  : {1:.3f} sec'.format(nPods, time.time() - timeStart))
+timeStart = time.time()
+for jobName in jobNames[:1000]:
+    [p for p in corev1.pods if p.metadata.labels['job-name'] == jobName]
+print('linear scan of 1000 jobs      : {0:.3f} sec'.format(time.time() - timeStart))
+print('OK')
@@ -0,0 +1,114 @@
+import sys
+import json
+import time
+import timeit
+import pickle
+import datetime
+
+from pandaharvester.harvestercore.job_spec import JobSpec
+from pandaharvester.harvestercore.work_spec import WorkSpec
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# micro benchmark of SpecBase.pack, values_map, pickle, and memory usage
+# usage: python specBenchmark.py [nRows] [nParams]
+
+try:
+    nRows = int(sys.argv[1])
+except Exception:
+    nRows = 10000
+try:
+    nParams = int(sys.argv[2])
+except Exception:
+    nParams = 1000
+
+# make rows as they come from the DB
+jobParams = {'jobPars': ' '.join(['--arg{0}=value{0}'.format(i) for i in range(nParams)]),
+             'inFiles': ','.join(['EVNT.{0:08d}.pool.root.1'.format(i) for i in range(nParams)]),
+             'maxCpuCount': 86400}
+tmpSpec = JobSpec()
+tmpSpec.jobParams = jobParams
+tmpSpec.jobAttributes = {'coreCount': 8}
+columns = JobSpec.column_names().split(',')
+rows = []
+for pandaID in range(nRows):
+    tmpSpec.PandaID = pandaID
+    rows.append(dict(zip(columns, tmpSpec.values_list())))
+print('{0} rows with jobParams of {1} bytes'.format(nRows, len(json.dumps(jobParams))))
+
+
+def pack_rows():
+    jobSpecs = []
+    for row in rows:
+        jobSpec = JobSpec()
+        jobSpec.pack(row)
+        jobSpecs.append(jobSpec)
+    return jobSpecs
+
+
+# pack
+time_point = time.time()
+jobSpecs = pack_rows()
+print('pack                          : {0:.3f} sec'.format(time.time() - time_point))
+
+# values_map without accessing blobs
+time_point = time.time()
+for jobSpec in jobSpecs:
+    jobSpec.values_map()
+print('values_map (blobs untouched)  : {0:.3f} sec'.format(time.time() - time_point))
+
+# values_map with only changed attributes
+time_point = time.time()
+for jobSpec in jobSpecs:
+    jobSpec.status = 'running'
+    jobSpec.values_map(only_changed=True)
+print('values_map (only changed)     : {0:.3f} sec'.format(time.time() - time_point))
+
+# access blobs
+time_point = time.time()
+for jobSpec in jobSpecs:
+    jobSpec.jobParams['maxCpuCount']
+print('decode jobParams              : {0:.3f} sec'.format(time.time() - time_point))
+
+# values_map after decoding blobs
+time_point = time.time()
+for jobSpec in jobSpecs:
+    jobSpec.values_map()
+print('values_map (blobs decoded)    : {0:.3f} sec'.format(time.time() - time_point))
+
+# attribute assignment
+jobSpec = jobSpecs[0]
+print('setattr x 1M                  : {0:.3f} sec'.format(
+    timeit.timeit(lambda: setattr(jobSpec, 'status', 'running'), number=1000000)))
+
+# pickle size of WorkSpec
+def make_workspec(workerID):
+    workSpec = WorkSpec()
+    workSpec.workerID = workerID
+    workSpec.batchID = '{0}.0'.format(workerID)
+    workSpec.status = WorkSpec.ST_running
+    workSpec.computingSite = 'CERN-PROD'
+    workSpec.resourceType = 'SCORE'
+    workSpec.accessPoint = '/data/harvester/{0}'.format(workerID)
+    workSpec.creationTime = datetime.datetime.utcnow()
+    workSpec.workAttributes = {'stdOut': '/data/harvester/{0}/out.txt'.format(workerID)}
+    workSpec.pandaid_list = [workerID]
+    return workSpec
+
+
+workSpecs = [make_workspec(i) for i in range(500)]
+print('pickled WorkSpec              : {0} bytes'.format(len(pickle.dumps(workSpecs[0], pickle.HIGHEST_PROTOCOL))))
+print('pickled chunk of 500 WorkSpecs: {0:.0f} bytes per WorkSpec'.format(
+    len(pickle.dumps(('CERN-PROD', [workSpecs]), pickle.HIGHEST_PROTOCOL)) / 500.))
+
+# resident memory of WorkSpec
+if tracemalloc is not None:
+    tracemalloc.start()
+    snapshot = tracemalloc.take_snapshot()
+    workSpecs = [make_workspec(i) for i in range(nRows)]
+    tmpStat = tracemalloc.take_snapshot().compare_to(snapshot, 'filename')
+    print('memory of WorkSpec            : {0:.0f} bytes'.format(sum(s.size_diff for s in tmpStat) / float(nRows)))
+    tracemalloc.stop()
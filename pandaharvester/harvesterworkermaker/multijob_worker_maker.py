@@ -9,6 +9,9 @@ baseLogger = core_utils.setup_logger('multijob_workermaker')
 
 
 class MultiJobWorkerMaker(BaseWorkerMaker):
+    # nJobsPerWorker is set per worker
+    reentrant = False
+
     # constructor
     def __init__(self, **kwarg):
         BaseWorkerMaker.__init__(self, **kwarg)
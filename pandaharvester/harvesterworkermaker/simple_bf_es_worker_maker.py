@@ -9,7 +9,7 @@ except Exception:
 from pandaharvester.harvestercore.work_spec import WorkSpec
 from .base_worker_maker import BaseWorkerMaker
 from pandaharvester.harvestercore import core_utils
-from pandaharvester.harvestermisc.info_utils import PandaQueuesDict
+from pandaharvester.harvestermisc.info_utils import get_panda_queues_dict
 
 
 # simple backfill eventservice maker
@@ -19,6 +19,9 @@ _logger = core_utils.setup_logger('simple_bf_worker_maker')
 
 
 class SimpleBackfillESWorkerMaker(BaseWorkerMaker):
+    # resources found by num_ready_resources are consumed by make_worker in the same cycle
+    reentrant = False
+
     # constructor
     def __init__(self, **kwarg):
         self.jobAttributesToUse = ['nCore', 'minRamCount', 'maxDiskCount', 'maxWalltime']
@@ -38,7 +41,7 @@ class SimpleBackfillESWorkerMaker(BaseWorkerMaker):
         workSpec.creationTime = datetime.datetime.utcnow()
 
         # get the queue configuration from the DB
-        panda_queues_dict = PandaQueuesDict()
+        panda_queues_dict = get_panda_queues_dict()
         queue_dict = panda_queues_dict.get(queue_config.queueName, {})
         workSpec.minRamCount = queue_dict.get('maxrss', 1) or 1
         workSpec.maxWalltime = queue_dict.get('maxtime', 1)
@@ -78,7 +81,8 @@ class SimpleBackfillESWorkerMaker(BaseWorkerMaker):
         # make logger
         tmpLog = self.make_logger(_logger, 'simple_bf_es_maker',
                                   method_name='num_ready_resources')
-
+        # drop resources of the previous check
+        self.dyn_resources = None
         try:
             resources = self.get_bf_resources()
             if resources:
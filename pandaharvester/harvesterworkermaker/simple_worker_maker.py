@@ -2,7 +2,7 @@ import random
 
 from pandaharvester.harvestercore.work_spec import WorkSpec
 from pandaharvester.harvestercore import core_utils
-from pandaharvester.harvestermisc.info_utils import PandaQueuesDict
+from pandaharvester.harvestermisc.info_utils import get_panda_queues_dict
 from pandaharvester.harvestercore.resource_type_mapper import ResourceTypeMapper
 from .base_worker_maker import BaseWorkerMaker
 import datetime
@@ -67,7 +67,7 @@ class SimpleWorkerMaker(BaseWorkerMaker):
         workSpec.creationTime = datetime.datetime.utcnow()
 
         # get the queue configuration from the DB
-        panda_queues_dict = PandaQueuesDict()
+        panda_queues_dict = get_panda_queues_dict()
         queue_dict = panda_queues_dict.get(queue_config.queueName, {})
 
         unified_queue = queue_dict.get('capability', '') == 'ucore'
@@ -33,6 +33,7 @@ setup(
                       'panda-common-s >= 0.0.11',
                       'pyjwt',
                       'subprocess32; python_version == "2.*"',
+                      'scandir; python_version == "2.*"',
                       'rpyc',
                       'paramiko',
                       'pexpect',